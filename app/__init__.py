@@ -9,6 +9,8 @@ from dmutils.flask_init import init_app, api_error_handlers
 from dmutils.flask import DMGzipMiddleware
 
 from config import configs
+from .json_decoder import get_json_decoder
+from .json_encoder import get_json_encoder
 
 
 db = SQLAlchemy(metadata=MetaData(naming_convention={
@@ -36,6 +38,15 @@ def create_app(config_name):
     if not application.config['DM_API_AUTH_TOKENS']:
         raise Exception("No DM_API_AUTH_TOKENS provided")
 
+    application.json_encoder = get_json_encoder(
+        application.config['DM_API_JSON_ENCODER'], application.json_encoder,
+    )
+    # read when the engine is first used
+    application.config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(
+        application.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {},
+        json_deserializer=get_json_decoder(application.config['DM_API_JSON_DECODER']),
+    )
+
     if application.config['VCAP_SERVICES']:
         cf_services = json.loads(application.config['VCAP_SERVICES'])
         application.config['SQLALCHEMY_DATABASE_URI'] = cf_services['postgres'][0]['credentials']['uri']
@@ -44,12 +55,15 @@ def create_app(config_name):
     from .main import main as main_blueprint
     from .status import status as status_blueprint
     from .callbacks import callbacks as callbacks_blueprint
+    from .commands import audit_events_cli
 
     application.register_blueprint(metrics_blueprint)
     application.register_blueprint(main_blueprint)
     application.register_blueprint(callbacks_blueprint, url_prefix='/callbacks')
     application.register_blueprint(status_blueprint)
 
+    application.cli.add_command(audit_events_cli)
+
     gds_metrics.init_app(application)
 
     DMGzipMiddleware(application, compress_by_default=False)
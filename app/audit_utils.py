@@ -0,0 +1,177 @@
+"""
+Monthly partitioning of `audit_events`, and waiting for new audit events.
+
+New audit events are always written to `audit_events` itself. `partition_audit_events` moves the events of each month
+that has ended into a partition inheriting from `audit_events` (named like `audit_events_y2020m01`) with a CHECK
+constraint on `created_at`, so that postgres' constraint exclusion can skip the partitions outside an `audit-date`
+filter. Queries, acknowledgements and deletes against `audit_events` see the rows in its partitions too.
+
+Once none of a partition's `update_service` events are waiting to be acknowledged, `archive_audit_event_partitions`
+moves it from `audit_events` to `archived_audit_events`, which is only queried when asked for (see
+`AuditEvent.query.including_archived`), and drops all but its primary key index.
+
+Inserting audit events sends a notification on the `audit_events` channel, which `wait_for_audit_events` listens on,
+and records the inserting transaction's id in their `txid` (which isn't mapped by `AuditEvent`).
+"""
+from datetime import datetime
+import select
+import time
+
+from sqlalchemy import text
+
+from . import db
+
+PARTITION_NAME_FORMAT = "audit_events_y%Ym%m"
+
+HELD_BACK_POLL_INTERVAL = 0.5
+
+
+def _month_start(date):
+    return datetime(date.year, date.month, 1)
+
+
+def _next_month_start(date):
+    return datetime(date.year + date.month // 12, date.month % 12 + 1, 1)
+
+
+def get_audit_event_partitions(parent_table_name="audit_events"):
+    """:return: dict of the start of the month held by each partition of `parent_table_name`, keyed on its name"""
+    partition_names = db.session.execute(text("""
+        SELECT pg_class.relname
+        FROM pg_inherits
+        JOIN pg_class ON pg_class.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = CAST(:parent_table_name AS regclass)
+    """), {"parent_table_name": parent_table_name}).fetchall()
+    return {
+        partition_name: datetime.strptime(partition_name, PARTITION_NAME_FORMAT)
+        for (partition_name,) in partition_names
+    }
+
+
+def partition_audit_events(before):
+    """
+    Move the audit events created before the start of `before`'s month out of `audit_events` itself and into the
+    partitions for their months, creating the partitions as needed (unless they have been archived).
+
+    Each month is moved in a transaction of its own, committed before the next is started. Writes to `audit_events`
+    wait for the month being moved, so no acknowledgement of an event can be lost as it moves, but only for as long as
+    that month takes.
+
+    :return: list of the names of the partitions events were moved into
+    """
+    months = [month for (month,) in db.session.execute(text("""
+        SELECT DISTINCT date_trunc('month', created_at) FROM ONLY audit_events WHERE created_at < :before
+    """), {"before": _month_start(before)})]
+    archived_partitions = get_audit_event_partitions("archived_audit_events")
+    db.session.commit()
+
+    partition_names = []
+    for month in sorted(months):
+        partition_name = month.strftime(PARTITION_NAME_FORMAT)
+        bounds = {"start": month, "end": _next_month_start(month)}
+
+        if partition_name in archived_partitions:
+            # events backdated to a month that has already been archived stay where they can be acknowledged
+            continue
+
+        db.session.execute(text("LOCK TABLE ONLY audit_events IN EXCLUSIVE MODE"))
+        if partition_name not in get_audit_event_partitions():
+            db.session.execute(text("""
+                CREATE TABLE {0} (
+                    LIKE audit_events INCLUDING ALL,
+                    CONSTRAINT {0}_created_at_check CHECK (
+                        created_at >= '{start:%Y-%m-%d}' AND created_at < '{end:%Y-%m-%d}'
+                    )
+                )
+            """.format(partition_name, **bounds)))
+            db.session.execute(text("ALTER TABLE {} INHERIT audit_events".format(partition_name)))
+
+        db.session.execute(text("""
+            WITH moved AS (
+                DELETE FROM ONLY audit_events WHERE created_at >= :start AND created_at < :end RETURNING *
+            )
+            INSERT INTO {} SELECT * FROM moved
+        """.format(partition_name)), bounds)
+        db.session.commit()
+        partition_names.append(partition_name)
+
+    return partition_names
+
+
+def archive_audit_event_partitions(before):
+    """
+    Archive the partitions of `audit_events` for months ending on or before `before` that have no unacknowledged
+    `update_service` events. Archived partitions keep only their primary key index, and are rewritten in its order to
+    reclaim the space left by the moved and updated rows.
+
+    :return: list of the names of the partitions archived
+    """
+    partition_names = []
+    for partition_name, month in sorted(get_audit_event_partitions().items(), key=lambda partition: partition[1]):
+        if _next_month_start(month) > before:
+            continue
+
+        db.session.execute(text("LOCK TABLE {} IN ACCESS EXCLUSIVE MODE".format(partition_name)))
+        has_unacknowledged_events = db.session.execute(text("""
+            SELECT EXISTS (SELECT 1 FROM {} WHERE type = 'update_service' AND NOT acknowledged)
+        """.format(partition_name))).scalar()
+        if has_unacknowledged_events:
+            continue
+
+        db.session.execute(text("ALTER TABLE {} NO INHERIT audit_events".format(partition_name)))
+        db.session.execute(text("ALTER TABLE {} INHERIT archived_audit_events".format(partition_name)))
+
+        index_names = db.session.execute(text("""
+            SELECT CAST(indexrelid AS regclass) FROM pg_index
+            WHERE indrelid = CAST(:partition_name AS regclass) AND NOT indisprimary
+        """), {"partition_name": partition_name}).fetchall()
+        for (index_name,) in index_names:
+            db.session.execute(text("DROP INDEX {}".format(index_name)))
+        db.session.execute(text("CLUSTER {0} USING {0}_pkey".format(partition_name)))
+
+        partition_names.append(partition_name)
+
+    return partition_names
+
+
+def wait_for_audit_events(query, limit, timeout):
+    """
+    Run `query` (for audit events, ordered but not yet limited) until it finds any or `timeout` seconds have passed,
+    rerunning it only when postgres notifies us that audit events have been inserted (see migration 1530). The
+    session's transaction is ended before each wait, so no snapshot or connection is held on to but the one listening.
+
+    Only events inserted by transactions that finished before every transaction still running are found, so no event
+    committed later can come before them in `txid` order. Events held back by a running transaction are looked for
+    again every `HELD_BACK_POLL_INTERVAL` seconds, as it may finish without inserting any events to notify us of.
+
+    :return: list of up to `limit` of the results of `query`, empty if none were found in time
+    """
+    deadline = time.monotonic() + timeout
+    connection = db.engine.raw_connection()
+    cursor = connection.cursor()
+    try:
+        # listening before the first query means no events can be inserted unnoticed between it and the wait
+        cursor.execute("LISTEN audit_events")
+        connection.commit()
+
+        while True:
+            audit_events = query.filter(text(
+                "audit_events.txid < txid_snapshot_xmin(txid_current_snapshot())"
+            )).limit(limit).all()
+            if audit_events:
+                return audit_events
+            held_back = db.session.query(query.exists()).scalar()
+            db.session.rollback()
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            if held_back:
+                remaining = min(remaining, HELD_BACK_POLL_INTERVAL)
+            if select.select([connection.connection], [], [], remaining)[0]:
+                connection.connection.poll()
+                del connection.connection.notifies[:]
+    finally:
+        cursor.execute("UNLISTEN audit_events")
+        connection.commit()
+        connection.close()
@@ -0,0 +1,73 @@
+"""
+An incremental feed of the services, briefs and suppliers written since a cursor.
+
+Every insert into or update of `services`, `briefs` or `suppliers` sets the row's `change_txid` to the id of the writing
+transaction and its `change_sequence` to the next value of the `change_sequence` sequence (see migration 1540). Rows are
+listed in (`change_txid`, `change_sequence`) order, and only once every transaction with a lower id has finished, so a
+row can't commit behind a cursor that has already passed it. A long-running transaction holds the feed back until it
+finishes. Deleted rows aren't listed.
+"""
+import re
+
+from sqlalchemy import text
+
+from . import db
+from .models import Brief, Service, Supplier
+
+# the model and external id of each type of object in the feed, keyed on the name of its table
+CHANGE_FEED_TYPES = {
+    "briefs": (Brief, Brief.id),
+    "services": (Service, Service.service_id),
+    "suppliers": (Supplier, Supplier.supplier_id),
+}
+
+CURSOR_REGEX = re.compile(r'^(\d+)\.(\d+)$')
+INITIAL_CURSOR = "0.0"
+
+
+def parse_change_feed_cursor(cursor):
+    """:return: (change_txid, change_sequence) tuple, or None if `cursor` isn't valid"""
+    match = CURSOR_REGEX.match(cursor)
+    return match and (int(match.group(1)), int(match.group(2)))
+
+
+def format_change_feed_cursor(change_txid, change_sequence):
+    return "{}.{}".format(change_txid, change_sequence)
+
+
+def get_changes(cursor, types, limit):
+    """
+    :param cursor: (change_txid, change_sequence) tuple after which to list changes
+    :param types: table names (keys of `CHANGE_FEED_TYPES`) to list changes of
+    :return: list of up to `limit` (table name, object, change_txid, change_sequence) tuples, in change order
+    """
+    changed_rows = db.session.execute(text(" UNION ALL ".join(
+        """
+            (
+                SELECT '{0}' AS table_name, id, change_txid, change_sequence FROM {0}
+                WHERE (change_txid, change_sequence) > (:change_txid, :change_sequence)
+                AND change_txid < txid_snapshot_xmin(txid_current_snapshot())
+                ORDER BY change_txid, change_sequence
+                LIMIT :limit
+            )
+        """.format(table_name)
+        for table_name in sorted(types)
+    ) + " ORDER BY change_txid, change_sequence LIMIT :limit"), {
+        "change_txid": cursor[0],
+        "change_sequence": cursor[1],
+        "limit": limit,
+    }).fetchall()
+
+    objects = {}
+    for table_name in types:
+        model = CHANGE_FEED_TYPES[table_name][0]
+        ids = [row.id for row in changed_rows if row.table_name == table_name]
+        if ids:
+            objects[table_name] = {obj.id: obj for obj in model.query.filter(model.id.in_(ids))}
+
+    return [
+        (row.table_name, objects[row.table_name][row.id], row.change_txid, row.change_sequence)
+        for row in changed_rows
+        # (unless deleted since)
+        if row.id in objects[row.table_name]
+    ]
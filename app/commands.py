@@ -0,0 +1,29 @@
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+
+from . import db
+from .audit_utils import archive_audit_event_partitions, partition_audit_events
+
+audit_events_cli = AppGroup('audit-events', help="Maintain the monthly partitions of audit_events.")
+
+
+@audit_events_cli.command('partition')
+def partition_audit_events_command():
+    """Move the audit events of each month that has ended into that month's partition."""
+    partition_names = partition_audit_events(datetime.utcnow())
+    for partition_name in partition_names:
+        click.echo("Moved audit events into {}".format(partition_name))
+
+
+@audit_events_cli.command('archive')
+@click.option('--keep-months', default=12, show_default=True, help="Number of whole months to keep unarchived.")
+def archive_audit_event_partitions_command(keep_months):
+    """Archive the partitions of months before the last KEEP_MONTHS with no unacknowledged service updates."""
+    now = datetime.utcnow()
+    months = now.year * 12 + now.month - 1 - keep_months
+    partition_names = archive_audit_event_partitions(datetime(months // 12, months % 12 + 1, 1))
+    db.session.commit()
+    for partition_name in partition_names:
+        click.echo("Archived {}".format(partition_name))
@@ -1,3 +1,7 @@
+from sqlalchemy import String, func
+from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy.sql.expression import cast as sql_cast, literal_column, select as sql_select
+
 from .utils import get_json_from_request, json_has_required_keys, \
     json_has_matching_id
 
@@ -29,3 +33,26 @@ def get_copiable_service_data(service, *, questions_to_exclude=None, questions_t
     if questions_to_copy:
         return {key: value for key, value in service.data.items() if key in questions_to_copy}
     return service.data
+
+
+def copiable_service_data_expression(data_column, *, questions_to_exclude=None, questions_to_copy=None):
+    """
+    SQL counterpart of `get_copiable_service_data`, for copying services in bulk without loading them. Returns a
+    correlated scalar subquery that rebuilds `data_column` (a JSON column expression) keeping only the keys that
+    `get_copiable_service_data` would keep, with the same precedence between the two lists.
+    """
+    if not (questions_to_exclude or questions_to_copy):
+        return data_column
+
+    data_items = func.json_each(data_column).alias("data_items")
+    data_item_key = literal_column("data_items.key", String)
+    data_item_value = literal_column("data_items.value", JSON)
+    if questions_to_exclude:
+        key_filter = data_item_key.notin_(questions_to_exclude)
+    else:
+        key_filter = data_item_key.in_(questions_to_copy)
+
+    return sql_select([
+        # json_object_agg gives NULL over no rows, whereas the python version would give an empty dict
+        func.coalesce(func.json_object_agg(data_item_key, data_item_value), sql_cast("{}", JSON)),
+    ]).select_from(data_items).where(key_filter).as_scalar()
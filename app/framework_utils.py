@@ -1,6 +1,9 @@
 import re
 
 from flask import abort
+from sqlalchemy import text
+
+from . import db
 from .validation import get_validation_errors
 
 
@@ -28,3 +31,38 @@ def format_framework_integrity_error_message(error, json_framework):
         error_message = format(error)
 
     return error_message
+
+
+def reconcile_framework_stats():
+    """
+    Recompute all of the framework stats counters from the tables they count, in the caller's transaction.
+
+    Locking the counters in EXCLUSIVE mode holds off the triggers maintaining them (and so writes to the tables they
+    count) until this transaction commits, so concurrent writes are neither lost nor counted twice, while the stats
+    can still be read throughout. Truncating them instead would block those reads too.
+    """
+    db.session.execute(text(
+        "LOCK TABLE framework_supplier_declaration_statuses, framework_draft_service_counts, supplier_user_logins "
+        "IN EXCLUSIVE MODE"
+    ))
+    db.session.execute(text("DELETE FROM framework_supplier_declaration_statuses"))
+    db.session.execute(text("DELETE FROM framework_draft_service_counts"))
+    db.session.execute(text("DELETE FROM supplier_user_logins"))
+    db.session.execute(text("""
+        INSERT INTO framework_supplier_declaration_statuses
+            (framework_id, supplier_id, has_declaration, declaration_status)
+        SELECT framework_id, supplier_id, declaration IS NOT NULL, declaration->>'status'
+        FROM supplier_frameworks
+    """))
+    db.session.execute(text("""
+        INSERT INTO framework_draft_service_counts (framework_id, supplier_id, lot_id, status, count)
+        SELECT framework_id, supplier_id, lot_id, status, count(*)
+        FROM draft_services
+        GROUP BY framework_id, supplier_id, lot_id, status
+    """))
+    db.session.execute(text("""
+        INSERT INTO supplier_user_logins (user_id, logged_in_at)
+        SELECT id, logged_in_at
+        FROM users
+        WHERE role = 'supplier'
+    """))
@@ -40,7 +40,7 @@ def get_models_for_all_db_tables():
 
 # These fields will eventually link to framework-specific sub schemas
 MODELS_WITH_JSON_FIELDS = {
-    ArchivedService: ["data"],
+    ArchivedService: ["data", "_data", "data_delta"],
     AuditEvent: ["data"],
     Brief: ["data"],
     BriefResponse: ["data", "award_details"],
@@ -56,7 +56,8 @@ MODELS_WITH_JSON_FIELDS = {
 # Model property fields, which are prefixed with an underscore on the model (but not in the DB column name)
 MAPPED_PROPERTY_FIELDS = [
     '_lot_id',
-    '_brief_id'
+    '_brief_id',
+    '_data',
 ]
 
 
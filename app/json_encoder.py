@@ -0,0 +1,72 @@
+"""
+Encoding JSON responses with orjson, which is several times faster than the standard library's encoder.
+
+`jsonify` encodes with the app's `json_encoder` class, so the encoder chosen by `DM_API_JSON_ENCODER` is a subclass of
+the one the app would otherwise use. Compact encodings (what `jsonify` makes outside debug mode) are made by orjson,
+and come out byte for byte the same as the base class' would: everything orjson doesn't encode the same way -
+datetimes, dates, Decimals and other types handled by the encoder's `default` method - is passed to `default`,
+non-ASCII characters are escaped afterwards, and anything orjson can't encode at all (keys other than strings,
+integers beyond 64 bits) is left to the base class. The exceptions are floats below 1e-4 or from 1e16 (and NaN or
+infinity), whose notation differs.
+
+Pretty printed and other non-compact encodings are always made by the base class.
+"""
+import codecs
+
+import orjson
+
+_ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME
+_ESCAPE_ERROR_HANDLER = 'dm_json_escape'
+
+
+def _escape_non_ascii(error):
+    """Codec error handler escaping characters as the standard library's encoder does when `ensure_ascii` is set"""
+    escaped = []
+    for character in error.object[error.start:error.end]:
+        code_point = ord(character)
+        if code_point < 0x10000:
+            escaped.append('\\u{0:04x}'.format(code_point))
+        else:
+            code_point -= 0x10000
+            escaped.append('\\u{0:04x}\\u{1:04x}'.format(0xd800 | (code_point >> 10), 0xdc00 | (code_point & 0x3ff)))
+    return ''.join(escaped), error.end
+
+
+codecs.register_error(_ESCAPE_ERROR_HANDLER, _escape_non_ascii)
+
+
+class OrjsonJSONEncoderMixin:
+    def encode(self, o):
+        if self.indent is not None or (self.item_separator, self.key_separator) != (',', ':') or self.skipkeys:
+            return super().encode(o)
+
+        try:
+            encoded_bytes = orjson.dumps(
+                o,
+                default=self.default,
+                option=_ORJSON_OPTIONS | (orjson.OPT_SORT_KEYS if self.sort_keys else 0),
+            )
+        except orjson.JSONEncodeError:
+            # including when `default` can't encode something, so it is raised as the base class would raise it
+            return super().encode(o)
+
+        encoded = encoded_bytes.decode('utf-8')
+        if self.ensure_ascii:
+            # only characters beyond ASCII take more than one byte
+            is_ascii = len(encoded) == len(encoded_bytes)
+            encoded = encoded.replace('\x7f', '\\u007f')
+            if not is_ascii:
+                encoded = encoded.encode('ascii', _ESCAPE_ERROR_HANDLER).decode('ascii')
+        return encoded
+
+
+def get_json_encoder(name, base_encoder):
+    """
+    :param name: 'orjson', or 'stdlib' for `base_encoder` itself
+    :param base_encoder: the JSON encoder class the app would otherwise use
+    """
+    if name == 'stdlib':
+        return base_encoder
+    elif name == 'orjson':
+        return type('Orjson{}'.format(base_encoder.__name__), (OrjsonJSONEncoderMixin, base_encoder), {})
+    raise ValueError("Unknown DM_API_JSON_ENCODER '{}'".format(name))
@@ -16,9 +16,11 @@ def add_cache_control(response):
 from .views import (
     agreements,
     audits,
+    batch,
     brief_responses,
     briefs,
     buyer_domains,
+    changes,
     direct_award,
     drafts,
     frameworks,
@@ -1,15 +1,20 @@
 from datetime import datetime
+import json
 
 from flask import jsonify, abort, request, current_app
+from sqlalchemy import BigInteger
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.sql.expression import true, false, func
-from sqlalchemy.orm import class_mapper
+from sqlalchemy.sql.expression import true, false, func, literal_column, tuple_
+from sqlalchemy.orm import class_mapper, selectinload
 from dmapiclient.audit import AuditTypes
 from dmutils.config import convert_to_boolean
 
 from .. import main
 from ... import db, models
+from ...audit_utils import wait_for_audit_events
+from ...change_feed import format_change_feed_cursor, parse_change_feed_cursor
 from ...models import AuditEvent
+from ...service_utils import get_archived_service_diff
 from ...validation import is_valid_acknowledged_state
 from ...utils import (
     get_json_from_request,
@@ -44,6 +49,48 @@ AUDIT_OBJECT_ID_FIELDS = {
 }
 
 
+def _audit_events_query(query, include_archived):
+    return query.including_archived() if include_archived else query
+
+
+def _filter_audit_events_by_data(audits):
+    # note in the following that even though the supplier and draft ids *are* integers, we're doing the searches as
+    # strings because of the postgres static type system's awkwardness with json types. we first let args.get normalize
+    # them into actual integers though
+
+    data_supplier_id = request.args.get('data-supplier-id', type=int)
+    if data_supplier_id:
+        # This filter relies on index `idx_audit_events_data_supplier_id`. See `app..models.main` for its definition.
+        audits = audits.filter(
+            func.coalesce(
+                AuditEvent.data['supplierId'].astext,
+                AuditEvent.data['supplier_id'].astext,
+            ) == str(data_supplier_id)
+        )
+
+    data_draft_service_id = request.args.get('data-draft-service-id', type=int)
+    if data_draft_service_id:
+        # This filter relies on index `idx_audit_events_data_draft_id`. See `app..models.main` for its definition.
+        audits = audits.filter(
+            AuditEvent.data['draftId'].astext == str(data_draft_service_id)
+        )
+
+    data_contains = request.args.get('data-contains')
+    if data_contains:
+        try:
+            data_contains = json.loads(data_contains)
+        except ValueError:
+            abort(400, 'invalid data-contains supplied')
+        if not isinstance(data_contains, dict):
+            abort(400, 'data-contains must be a JSON object')
+
+        # This filter relies on index `idx_audit_events_data_path_ops`. Unlike the filters above it is type-sensitive,
+        # so {"draftId": 1} won't match an event with a `draftId` of "1".
+        audits = audits.filter(AuditEvent.data.contains(data_contains))
+
+    return audits
+
+
 @main.route('/audit-events', methods=['GET'])
 def list_audits():
     page = get_valid_page_or_1()
@@ -53,14 +100,16 @@ def list_audits():
         abort(400, 'invalid page size supplied')
 
     earliest_for_each_object = convert_to_boolean(request.args.get('earliest_for_each_object'))
+    # archived partitions of audit_events (see `app.audit_utils`) are only searched when asked for
+    include_archived = convert_to_boolean(request.args.get('include-archived'))
 
     if earliest_for_each_object:
         # the rest of the filters we add will be added against a subquery which we will join back onto the main table
         # to retrieve the rest of the row. this allows the potentially expensive DISTINCT ON pass to be performed
         # against an absolutely minimal subset of rows which can probably be pulled straight from an index
-        audits = db.session.query(AuditEvent.id)
+        audits = _audit_events_query(AuditEvent.query.with_entities(AuditEvent.id), include_archived)
     else:
-        audits = AuditEvent.query
+        audits = _audit_events_query(AuditEvent.query, include_archived)
 
     audit_date = request.args.get('audit-date', None)
     if audit_date:
@@ -86,26 +135,7 @@ def list_audits():
             AuditEvent.user == user
         )
 
-    # note in the following that even though the supplier and draft ids *are* integers, we're doing the searches as
-    # strings because of the postgres static type system's awkwardness with json types. we first let args.get normalize
-    # them into actual integers though
-
-    data_supplier_id = request.args.get('data-supplier-id', type=int)
-    if data_supplier_id:
-        # This filter relies on index `idx_audit_events_data_supplier_id`. See `app..models.main` for its definition.
-        audits = audits.filter(
-            func.coalesce(
-                AuditEvent.data['supplierId'].astext,
-                AuditEvent.data['supplier_id'].astext,
-            ) == str(data_supplier_id)
-        )
-
-    data_draft_service_id = request.args.get('data-draft-service-id', type=int)
-    if data_draft_service_id:
-        # This filter relies on index `idx_audit_events_data_draft_id`. See `app..models.main` for its definition.
-        audits = audits.filter(
-            AuditEvent.data['draftId'].astext == str(data_draft_service_id)
-        )
+    audits = _filter_audit_events_by_data(audits)
 
     acknowledged = request.args.get('acknowledged', None)
     if acknowledged and acknowledged != 'all':
@@ -176,7 +206,9 @@ def list_audits():
             AuditEvent.object_id,
         ).subquery()
 
-        audits = AuditEvent.query.join(audits_subquery, audits_subquery.c.id == AuditEvent.id)
+        audits = _audit_events_query(AuditEvent.query, include_archived).join(
+            audits_subquery, audits_subquery.c.id == AuditEvent.id
+        )
 
     sort_order = db.desc if convert_to_boolean(request.args.get('latest_first')) else db.asc
     audits = audits.order_by(sort_order(AuditEvent.created_at), sort_order(AuditEvent.id))
@@ -316,6 +348,98 @@ def acknowledge_including_previous(
     return jsonify(auditEvents=[{"id": audit_event_id} for (audit_event_id,) in result]), 200
 
 
+@main.route('/audit-events/tail', methods=['GET'])
+def tail_audits():
+    """
+    Wait for audit events written since a cursor, returning them (in the order of their transactions' ids, then in id
+    order) as soon as there are any, or an empty list once `timeout` seconds have passed. Pass the `cursor` of a
+    response as the next request's `since` to tail the audit events.
+
+    Events are only returned once every transaction with a lower id has finished, so none can commit behind a cursor
+    that has already passed it, and a long-running transaction holds the tail back until it finishes.
+
+    :query_param since: cursor, defaults to the events of transactions that are still running or yet to begin
+    :query_param types: comma separated audit types, defaults to all
+    :query_param timeout: seconds, defaults to (and may not exceed) DM_API_AUDIT_EVENTS_TAIL_MAX_TIMEOUT
+    """
+    since = request.args.get('since')
+    if since is None:
+        cursor = (db.session.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())").scalar(), 0)
+    else:
+        cursor = parse_change_feed_cursor(since)
+        if cursor is None:
+            abort(400, "Invalid cursor supplied")
+
+    max_timeout = current_app.config['DM_API_AUDIT_EVENTS_TAIL_MAX_TIMEOUT']
+    try:
+        timeout = float(request.args.get('timeout', max_timeout))
+    except ValueError:
+        abort(400, 'invalid timeout supplied')
+    if not 0 <= timeout <= max_timeout:
+        abort(400, "'timeout' must be between 0 and {} seconds".format(max_timeout))
+
+    txid = literal_column('audit_events.txid', BigInteger)
+    audits = db.session.query(AuditEvent, txid).filter(tuple_(txid, AuditEvent.id) > tuple_(*cursor))
+
+    audit_types = [audit_type for audit_type in request.args.get('types', '').split(',') if audit_type]
+    if audit_types:
+        if not all(AuditTypes.is_valid_audit_type(audit_type) for audit_type in audit_types):
+            abort(400, "Invalid audit type")
+        audits = audits.filter(AuditEvent.type.in_(audit_types))
+
+    audits = wait_for_audit_events(
+        audits.order_by(txid, AuditEvent.id), current_app.config['DM_API_SERVICES_PAGE_SIZE'], timeout,
+    )
+    if audits:
+        cursor = (audits[-1][1], audits[-1][0].id)
+
+    return jsonify(
+        auditEvents=[audit.serialize() for audit, _ in audits],
+        cursor=format_change_feed_cursor(*cursor),
+    ), 200
+
+
+@main.route('/audit-events/service-diffs', methods=['GET'])
+def list_audit_event_service_diffs():
+    """
+    The changes made to the service by each of the `update_service` audit events in `ids` (any other audit events are
+    left out), so a page of them can be reviewed without fetching both versions of every service
+    :query_param ids: comma separated audit event ids
+    """
+    try:
+        audit_ids = [int(audit_id) for audit_id in request.args.get('ids', '').split(',')]
+    except ValueError:
+        abort(400, "'ids' must be a comma separated list of audit event ids")
+
+    audits = AuditEvent.query.filter(
+        AuditEvent.id.in_(audit_ids),
+        AuditEvent.type == AuditTypes.update_service.value,
+    ).all()
+
+    archived_service_ids = {
+        audit.data.get(key) for audit in audits for key in ('oldArchivedServiceId', 'newArchivedServiceId')
+    } - {None}
+    archived_services = {
+        archived_service.id: archived_service
+        for archived_service in models.ArchivedService.query.filter(
+            models.ArchivedService.id.in_(archived_service_ids)
+        ).options(
+            selectinload(models.ArchivedService.snapshot),
+        )
+    } if archived_service_ids else {}
+
+    service_diffs = [
+        dict(get_archived_service_diff(
+            archived_services.get(audit.data.get('oldArchivedServiceId')),
+            archived_services[audit.data['newArchivedServiceId']],
+        ), auditEventId=audit.id)
+        for audit in sorted(audits, key=lambda audit: audit_ids.index(audit.id))
+        if audit.data.get('newArchivedServiceId') in archived_services
+    ]
+
+    return jsonify(serviceDiffs=service_diffs), 200
+
+
 @main.route('/audit-events/<int:audit_id>', methods=['GET'])
 def get_audit_event(audit_id):
     audit_event = AuditEvent.query.get(audit_id)
@@ -0,0 +1,57 @@
+from flask import abort, current_app, jsonify, request
+
+from .. import main
+from ... import db
+from ...utils import get_json_from_request, json_has_required_keys
+
+
+def _dispatch_get(path):
+    """
+    Dispatch a GET of `path` to this app in-process, as though it had been requested alongside this request (with the
+    same authorization), sharing this request's database session.
+
+    :return: (status code, JSON body or None) of the sub-request's response, read before its request context ends in
+        case it is streamed
+    """
+    with current_app.test_request_context(
+        path,
+        base_url=request.url_root,
+        method='GET',
+        headers={'Authorization': request.headers.get('Authorization', '')},
+    ):
+        try:
+            response = current_app.full_dispatch_request()
+        except Exception as e:
+            # as `Flask.wsgi_app` would, leaving the session usable by the rest of the batch
+            db.session.rollback()
+            response = current_app.handle_exception(e)
+        return response.status_code, response.get_json(silent=True)
+
+
+@main.route('/batch', methods=['POST'])
+def batch():
+    """
+    Make several GET requests of this API in one. Each sub-request is authorized and handled exactly as it would be if
+    made on its own, but without the overhead of a round trip each.
+
+    :body_param requests: list of up to `DM_API_BATCH_MAX_REQUESTS` objects with the `path` (including any query
+        string) to GET, e.g. ``{"requests": [{"path": "/suppliers/1"}, {"path": "/users?supplier_id=1"}]}``
+    :return: list of the ``status`` and JSON ``body`` of the response to each sub-request, in the same order
+    """
+    json_payload = get_json_from_request()
+    json_has_required_keys(json_payload, ['requests'])
+    sub_requests = json_payload['requests']
+
+    if not isinstance(sub_requests, list):
+        abort(400, "'requests' must be a list")
+    if len(sub_requests) > current_app.config['DM_API_BATCH_MAX_REQUESTS']:
+        abort(400, "A batch may have at most {} requests".format(current_app.config['DM_API_BATCH_MAX_REQUESTS']))
+    for sub_request in sub_requests:
+        path = isinstance(sub_request, dict) and sub_request.get('path')
+        if not isinstance(path, str) or not path.startswith('/') or path.startswith('//'):
+            abort(400, "Each request must be an object with a 'path' relative to the API root")
+
+    return jsonify(responses=[
+        {'status': status, 'body': body}
+        for status, body in (_dispatch_get(sub_request['path']) for sub_request in sub_requests)
+    ]), 200
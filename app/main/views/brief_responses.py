@@ -11,6 +11,7 @@ from dmutils.config import convert_to_boolean
 from .. import main
 from ...models import db, Brief, BriefResponse, AuditEvent, Framework
 from ...utils import (
+    get_fields_or_400,
     get_int_or_400,
     get_json_from_request,
     get_request_page_questions,
@@ -24,11 +25,22 @@ from ...utils import (
 
 from ...brief_utils import get_supplier_service_eligible_for_brief
 from ...service_utils import validate_and_return_supplier
+from ...sparse_fieldsets import with_fields
 
 COMPLETED_BRIEF_RESPONSE_STATUSES = ['submitted', 'pending-awarded', 'awarded']
 RESOURCE_NAME = "briefResponses"
 
 
+def with_brief_response_list_options(brief_responses):
+    """Load only what listed brief responses serialize"""
+    return brief_responses.options(
+        db.defaultload(BriefResponse.brief).defaultload(Brief.framework).lazyload("*"),
+        db.defaultload(BriefResponse.brief).defaultload(Brief.lot).lazyload("*"),
+        db.defaultload(BriefResponse.brief).defaultload(Brief.awarded_brief_response).lazyload("*"),
+        db.defaultload(BriefResponse.supplier).lazyload("*"),
+    )
+
+
 @main.route('/brief-responses', methods=['POST'])
 def create_brief_response():
     json_payload = get_json_from_request()
@@ -218,6 +230,8 @@ def list_brief_responses():
     supplier_id = get_int_or_400(request.args, 'supplier_id')
     awarded_at = request.args.get('awarded_at')
     with_data = convert_to_boolean(request.args.get("with-data", "true"))
+    # only these keys of each brief response, with only those taken from its data fetched from the database
+    fields = get_fields_or_400(request.args)
 
     if request.args.get('status'):
         statuses = request.args['status'].split(',')
@@ -237,12 +251,7 @@ def list_brief_responses():
         # Inclusive date range filtering
         brief_responses = brief_responses.filter(BriefResponse.awarded_at.between(day_start, day_end))
 
-    brief_responses = brief_responses.options(
-        db.defaultload(BriefResponse.brief).defaultload(Brief.framework).lazyload("*"),
-        db.defaultload(BriefResponse.brief).defaultload(Brief.lot).lazyload("*"),
-        db.defaultload(BriefResponse.brief).defaultload(Brief.awarded_brief_response).lazyload("*"),
-        db.defaultload(BriefResponse.supplier).lazyload("*"),
-    )
+    brief_responses = with_brief_response_list_options(brief_responses)
 
     if request.args.get('framework'):
         brief_responses = brief_responses.join(BriefResponse.brief).join(Brief.framework).filter(
@@ -251,7 +260,11 @@ def list_brief_responses():
             ))
         )
 
-    serialize_kwargs = {"with_data": with_data}
+    if fields is None:
+        serialize_kwargs = {"with_data": with_data}
+    else:
+        brief_responses = with_fields(brief_responses, BriefResponse, fields)
+        serialize_kwargs = {"fields": fields}
 
     if brief_id or supplier_id:
         return list_result_response(RESOURCE_NAME, brief_responses, serialize_kwargs=serialize_kwargs), 200
@@ -1,24 +1,44 @@
 from datetime import datetime
 from flask import jsonify, abort, current_app, request
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql.expression import select as sql_select
 
 from dmapiclient.audit import AuditTypes
+from dmutils.dates import get_publishing_dates
 from .. import main
 from ... import db
-from ...models import User, Brief, BriefResponse, AuditEvent, Framework, Lot, Supplier, Service
+from ...models import (
+    AuditEvent,
+    Brief,
+    BriefClarificationQuestion,
+    BriefResponse,
+    BriefUser,
+    Framework,
+    Lot,
+    Service,
+    Supplier,
+    User,
+)
 from ...utils import (
+    conditional_response_headers,
+    get_fields_or_400,
     get_int_or_400,
     get_json_from_request,
     get_request_page_questions,
     get_valid_page_or_1,
     json_has_required_keys,
     list_result_response,
+    make_etag,
+    not_modified_response_or_none,
     single_result_response,
     paginated_result_response,
     purge_nulls_from_data,
+    row_version,
+    row_versions,
     validate_and_return_updater_request,
 )
 from ...service_utils import validate_and_return_lot, filter_services
+from ...sparse_fieldsets import with_fields
 from ...brief_utils import index_brief, validate_brief_data
 from ...validation import get_validation_errors
 
@@ -115,6 +135,43 @@ def update_brief(brief_id):
 
 @main.route('/briefs/<int:brief_id>', methods=['GET'])
 def get_brief(brief_id):
+    version = db.session.query(
+        Brief.published_at,
+        Brief.data['requirementsLength'].astext,
+        Brief.status,
+        sql_select([BriefResponse.id]).where(
+            db.and_(BriefResponse.brief_id == Brief.id, BriefResponse.awarded_at.isnot(None))
+        ).limit(1).as_scalar(),
+        row_version(Brief.__table__),
+        row_version(Framework.__table__),
+        row_version(Lot.__table__),
+        row_versions(User.__table__, User.id, BriefUser.brief_id == Brief.id, BriefUser.user_id == User.id),
+        row_versions(
+            BriefClarificationQuestion.__table__,
+            BriefClarificationQuestion.id,
+            BriefClarificationQuestion._brief_id == Brief.id,
+        ),
+    ).join(
+        Brief.framework, Brief.lot,
+    ).filter(
+        Brief.id == brief_id
+    ).first_or_404()
+
+    # a brief's status and whether its clarification questions are closed also change with the passing of time
+    published_at, requirements_length = version[:2]
+    clarification_questions_are_closed = None
+    if published_at:
+        publishing_dates = get_publishing_dates({
+            'publishedAt': published_at.replace(hour=23, minute=59, second=59, microsecond=0),
+            'requirementsLength': requirements_length,
+        })
+        clarification_questions_are_closed = datetime.utcnow() > publishing_dates['questions_close']
+
+    etag = make_etag(*version, clarification_questions_are_closed)
+    not_modified = not_modified_response_or_none(etag)
+    if not_modified:
+        return not_modified
+
     brief = Brief.query.filter(
         Brief.id == brief_id
     ).first_or_404()
@@ -123,7 +180,7 @@ def get_brief(brief_id):
         RESOURCE_NAME,
         brief,
         serialize_kwargs={"with_users": True, "with_clarification_questions": True}
-    ), 200
+    ), 200, conditional_response_headers(etag)
 
 
 @main.route('/briefs', methods=['GET'])
@@ -139,6 +196,15 @@ def list_briefs():
 
     with_clarification_questions = request.args.get('with_clarification_questions', 'false').lower() == 'true'
 
+    # only these keys of each brief, with only those taken from its data fetched from the database. Users and
+    # clarification questions are asked for as the 'users' and 'clarificationQuestions' keys.
+    fields = get_fields_or_400(request.args)
+    if fields is None:
+        serialize_kwargs = {"with_users": with_users, "with_clarification_questions": with_clarification_questions}
+    else:
+        serialize_kwargs = {"fields": fields}
+        with_users = 'users' in fields
+
     user_id = get_int_or_400(request.args, 'user_id')
 
     if user_id:
@@ -182,11 +248,14 @@ def list_briefs():
             day_end = datetime(day_value.year, day_value.month, day_value.day, 23, 59, 59, 999999)
             briefs = briefs.has_datetime_field_after("{}_at".format(status), day_end)
 
+    if fields is not None:
+        briefs = with_fields(briefs, Brief, fields)
+
     if user_id:
         return list_result_response(
             RESOURCE_NAME,
             briefs,
-            serialize_kwargs={"with_users": with_users, "with_clarification_questions": with_clarification_questions}
+            serialize_kwargs=serialize_kwargs
         ), 200, response_headers
     else:
         return paginated_result_response(
@@ -196,7 +265,7 @@ def list_briefs():
             per_page=current_app.config['DM_API_BRIEFS_PAGE_SIZE'],
             endpoint='.list_briefs',
             request_args=request.args,
-            serialize_kwargs={"with_users": with_users, "with_clarification_questions": with_clarification_questions}
+            serialize_kwargs=serialize_kwargs
         ), 200, response_headers
 
 
@@ -5,6 +5,7 @@ from flask import abort, current_app, request
 from .. import main
 from ... import db
 from ...models import BuyerEmailDomain, AuditEvent
+from ...response_cache import cached_response
 from ...validation import validate_buyer_email_domain_json_or_400, is_approved_buyer_domain
 from ...utils import (
     get_json_from_request,
@@ -56,6 +57,7 @@ def create_buyer_email_domain():
 
 
 @main.route('/buyer-email-domains', methods=['GET'])
+@cached_response('buyer_email_domains')
 def list_buyer_email_domains():
     page = get_valid_page_or_1()
 
@@ -0,0 +1,49 @@
+from flask import abort, current_app, jsonify, request
+
+from .. import main
+from ...change_feed import (
+    CHANGE_FEED_TYPES,
+    INITIAL_CURSOR,
+    format_change_feed_cursor,
+    get_changes,
+    parse_change_feed_cursor,
+)
+from ...utils import url_for
+
+
+@main.route('/changes', methods=['GET'])
+def list_changes():
+    """
+    The services, briefs and suppliers written since a cursor, in the order they were written. Pass the `cursor` of a
+    response as the next request's `since` to continue from where it left off.
+    :query_param since: cursor, defaults to the beginning
+    :query_param types: comma separated subset of 'briefs', 'services' and 'suppliers', defaults to all
+    """
+    since = request.args.get('since', INITIAL_CURSOR)
+    cursor = parse_change_feed_cursor(since)
+    if cursor is None:
+        abort(400, "Invalid cursor supplied")
+
+    types = request.args.get('types')
+    types = types.split(',') if types else sorted(CHANGE_FEED_TYPES)
+    if not set(types) <= set(CHANGE_FEED_TYPES):
+        abort(400, "'types' must be a comma separated list of {}".format(", ".join(sorted(CHANGE_FEED_TYPES))))
+
+    changes = get_changes(cursor, types, current_app.config['DM_API_SERVICES_PAGE_SIZE'])
+    if changes:
+        since = format_change_feed_cursor(*changes[-1][2:])
+
+    return jsonify(
+        changes=[
+            {
+                'objectType': table_name,
+                'objectId': getattr(obj, CHANGE_FEED_TYPES[table_name][1].key),
+                'object': obj.serialize(),
+            }
+            for table_name, obj, _, _ in changes
+        ],
+        cursor=since,
+        links={
+            'next': url_for('.list_changes', since=since, types=','.join(types)),
+        },
+    ), 200
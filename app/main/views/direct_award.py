@@ -305,7 +305,9 @@ def list_project_services(project_external_id):
     if not search:
         abort(400, 'Project does not have a saved search: {}'.format(project.external_id))
 
-    paginated_archived_services = search.archived_services.paginate(
+    paginated_archived_services = search.archived_services.options(
+        db.selectinload(ArchivedService.snapshot),
+    ).paginate(
         page=page,
         per_page=current_app.config['DM_API_PROJECTS_PAGE_SIZE'],
     )
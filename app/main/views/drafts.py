@@ -2,7 +2,8 @@ from dmapiclient.audit import AuditTypes
 from flask import jsonify, abort, request, current_app
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import lazyload
-from sqlalchemy import asc, desc
+from sqlalchemy import asc, desc, literal
+from sqlalchemy.sql.expression import case as sql_case, select as sql_select
 
 from datetime import datetime
 
@@ -12,6 +13,7 @@ from ...supplier_utils import is_g12_recovery_supplier
 from ...validation import is_valid_service_id_or_400
 from ...models import Service, DraftService, Supplier, AuditEvent, Framework, Lot
 from ...utils import (
+    allocate_sequence_values,
     get_int_or_400,
     get_json_from_request,
     get_request_page_questions,
@@ -31,7 +33,7 @@ from ...service_utils import (
     validate_and_return_related_objects,
     validate_service_data,
 )
-from ...draft_utils import validate_and_return_draft_request
+from ...draft_utils import copiable_service_data_expression, validate_and_return_draft_request
 
 RESOURCE_NAME = "services"
 
@@ -156,54 +158,83 @@ def copy_published_from_framework(framework_slug, lot_slug):
     if target_framework.status != 'open':
         abort(400, "Target framework is not open")
 
-    source_services = Service.query.filter(
-        Service.supplier_id == supplier_id,
-        Service.framework.has(
-            Framework.slug == source_framework_slug
-        ),
-        Service.lot.has(
-            Lot.slug == lot_slug
-        ),
-        Service.status == 'published',
-        Service.copied_to_following_framework == False,  # NOQA
-    ).with_for_update(
-        of=Service
-    ).order_by(
+    # Claim the source services by flipping their copied_to_following_framework flag in one statement. This takes the
+    # place of a SELECT ... FOR UPDATE: a concurrent copy will block on these rows and then find nothing left to claim.
+    claimed_service_ids = [
+        service_id for (service_id,) in db.session.execute(Service.__table__.update().returning(
+            Service.id
+        ).where(db.and_(
+            Service.supplier_id == supplier_id,
+            Service.framework.has(
+                Framework.slug == source_framework_slug
+            ),
+            Service.lot.has(
+                Lot.slug == lot_slug
+            ),
+            Service.status == 'published',
+            Service.copied_to_following_framework == db.false(),
+        )).values(
+            copied_to_following_framework=True,
+        )).fetchall()
+    ]
+
+    if claimed_service_ids:
         # Descending order so created drafts id's are sequential in reverse alphabetical order. Helps with ordering
         # in the frontend (most recent id first).
-        desc(Service.data['serviceName'].astext)
-    ).all()
-
-    drafts_services = []
-    for service in source_services:
-        draft = DraftService.from_service(
-            service,
-            questions_to_copy=questions_to_copy,
-            questions_to_exclude=questions_to_exclude,
-            target_framework_id=target_framework.id,
-        )
-        drafts_services.append((draft, service))
-
-        service.copied_to_following_framework = True
-        db.session.add(draft, service)
-
-    # Flush so the new drafts are assigned an ID, which is used below in the audit events.
-    db.session.flush()
-
-    for draft, service in drafts_services:
-        audit = AuditEvent(
-            audit_type=AuditTypes.create_draft_service,
-            user=updater_json['updated_by'],
-            data={
-                "draftId": draft.id,
-                "serviceId": service.id,
-                "supplierId": supplier_id,
-            },
-            db_object=draft
+        source_service_ids = [
+            service_id for (service_id,) in db.session.query(Service.id).filter(
+                Service.id.in_(claimed_service_ids)
+            ).order_by(
+                desc(Service.data['serviceName'].astext),
+                Service.id,
+            )
+        ]
+        # Allocate the new drafts' ids up front so each one is explicitly paired with its source service, both for the
+        # INSERT ... SELECT below and for the audit events.
+        draft_ids = allocate_sequence_values('draft_services_id_seq', len(source_service_ids))
+        draft_id_for_service_id = dict(zip(source_service_ids, draft_ids))
+
+        timestamp = datetime.utcnow()
+        db.session.execute(DraftService.__table__.insert().from_select(
+            (
+                'id', 'framework_id', 'lot_id', 'supplier_id', 'data', 'status', 'lot_one_service_limit',
+                'created_at', 'updated_at',
+            ),
+            sql_select([
+                sql_case(draft_id_for_service_id, value=Service.id),
+                literal(target_framework.id),
+                Service.lot_id,
+                Service.supplier_id,
+                copiable_service_data_expression(
+                    Service.data,
+                    questions_to_exclude=questions_to_exclude,
+                    questions_to_copy=questions_to_copy,
+                ),
+                literal('not-submitted'),
+                Lot.one_service_limit,
+                literal(timestamp),
+                literal(timestamp),
+            ]).select_from(
+                Service.__table__.join(Lot.__table__, Service.lot_id == Lot.id)
+            ).where(
+                Service.id.in_(source_service_ids)
+            ),
+        ))
+
+        AuditEvent.bulk_insert(
+            AuditTypes.create_draft_service,
+            updater_json['updated_by'],
+            DraftService,
+            (
+                (draft_id_for_service_id[service_id], {
+                    "draftId": draft_id_for_service_id[service_id],
+                    "serviceId": service_id,
+                    "supplierId": supplier_id,
+                }) for service_id in source_service_ids
+            ),
+            created_at=timestamp,
         )
 
-        db.session.add(audit)
-
     try:
         db.session.commit()
     except IntegrityError as e:
@@ -212,7 +243,7 @@ def copy_published_from_framework(framework_slug, lot_slug):
 
     return jsonify({
         RESOURCE_NAME: {
-            'draftsCreatedCount': len(drafts_services)
+            'draftsCreatedCount': len(claimed_service_ids)
         }
     }), 201
 
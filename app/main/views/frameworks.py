@@ -1,9 +1,9 @@
 import datetime
 
 from flask import jsonify, abort, request
-from sqlalchemy import func, orm, case
+from sqlalchemy import and_, func, orm, case
 from sqlalchemy.exc import IntegrityError, DataError, StatementError
-from sqlalchemy.orm import lazyload, load_only
+from sqlalchemy.orm import lazyload
 from dmapiclient.audit import AuditTypes
 from dmutils.config import convert_to_boolean
 
@@ -11,23 +11,34 @@ from .. import main
 from ...models import (
     AuditEvent,
     db,
-    DraftService,
     Framework,
+    FrameworkDraftServiceCount,
+    FrameworkLot,
+    FrameworkSupplierDeclarationStatus,
     Lot,
-    Supplier,
     SupplierFramework,
-    User,
+    SupplierUserLogin,
     Brief,
 )
 from ...utils import (
+    conditional_response_headers,
     get_json_from_request,
     json_has_required_keys,
     json_only_has_required_keys,
     list_result_response,
+    make_etag,
+    not_modified_response_or_none,
+    row_version,
+    row_versions,
     single_result_response,
     validate_and_return_updater_request,
 )
-from ...framework_utils import validate_framework_agreement_details_data, format_framework_integrity_error_message
+from ...response_cache import cached_response
+from ...framework_utils import (
+    format_framework_integrity_error_message,
+    reconcile_framework_stats,
+    validate_framework_agreement_details_data,
+)
 
 RESOURCE_NAME = "frameworks"
 FRAMEWORK_UPDATE_WHITELISTED_ATTRIBUTES_MAP = {
@@ -47,6 +58,7 @@ FRAMEWORK_UPDATE_WHITELISTED_ATTRIBUTES_MAP = {
 
 
 @main.route('/frameworks', methods=['GET'])
+@cached_response('frameworks', 'framework_lots', 'lots')
 def list_frameworks():
     return list_result_response(RESOURCE_NAME, Framework.query), 200
 
@@ -107,12 +119,25 @@ def create_framework():
 
 
 @main.route('/frameworks/<string:framework_slug>', methods=['GET'])
+@cached_response('frameworks', 'framework_lots', 'lots')
 def get_framework(framework_slug):
+    version = db.session.query(
+        row_version(Framework.__table__),
+        row_versions(Lot.__table__, Lot.id, FrameworkLot.framework_id == Framework.id, FrameworkLot.lot_id == Lot.id),
+    ).filter(
+        Framework.slug == framework_slug
+    ).first_or_404()
+
+    etag = make_etag(*version)
+    not_modified = not_modified_response_or_none(etag)
+    if not_modified:
+        return not_modified
+
     framework = Framework.query.filter(
         Framework.slug == framework_slug
     ).first_or_404()
 
-    return single_result_response(RESOURCE_NAME, framework), 200
+    return single_result_response(RESOURCE_NAME, framework), 200, conditional_response_headers(etag)
 
 
 @main.route('/frameworks/<string:framework_slug>', methods=['POST'])
@@ -183,6 +208,12 @@ def update_framework(framework_slug):
 
 
 @main.route('/frameworks/<string:framework_slug>/stats', methods=['GET'])
+@cached_response(
+    'framework_draft_service_counts', 'framework_supplier_declaration_statuses', 'frameworks', 'lots',
+    'supplier_user_logins',
+    # the recent login counts also change as logins age, so don't reuse a response for more than a minute
+    vary_on=lambda: datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M'),
+)
 def get_framework_stats(framework_slug):
     framework = Framework.query.filter(
         Framework.slug == framework_slug
@@ -191,15 +222,12 @@ def get_framework_stats(framework_slug):
     seven_days_ago = datetime.datetime.utcnow() + datetime.timedelta(-7)
 
     has_completed_drafts_query = db.session.query(
-        DraftService.supplier_id, func.min(DraftService.id)
+        FrameworkDraftServiceCount.supplier_id
     ).filter(
-        DraftService.framework_id == framework.id,
-        DraftService.status == 'submitted'
-    ).group_by(
-        DraftService.supplier_id
-    ).subquery('completed_drafts')
-
-    drafts_alias = orm.aliased(DraftService, has_completed_drafts_query)
+        FrameworkDraftServiceCount.framework_id == framework.id,
+        FrameworkDraftServiceCount.status == 'submitted',
+        FrameworkDraftServiceCount.count > 0,
+    ).distinct().subquery('completed_drafts')
 
     def label_columns(labels, query):
         return [
@@ -208,57 +236,71 @@ def get_framework_stats(framework_slug):
         ]
 
     is_declaration_complete = case([
-        (SupplierFramework.declaration['status'].astext == 'complete', True)
+        (FrameworkSupplierDeclarationStatus.declaration_status == 'complete', True)
     ], else_=False)
 
+    # null for users who have never logged in
+    is_recent_login = SupplierUserLogin.logged_in_at > seven_days_ago
+
     return jsonify({
         'services': label_columns(
             ['status', 'lot', 'declaration_made', 'count'],
             db.session.query(
-                DraftService.status, Lot.slug, is_declaration_complete, func.count()
-            ).outerjoin(
-                SupplierFramework, DraftService.supplier_id == SupplierFramework.supplier_id
+                FrameworkDraftServiceCount.status, Lot.slug, is_declaration_complete,
+                func.sum(FrameworkDraftServiceCount.count)
             ).join(
-                Lot, DraftService.lot_id == Lot.id
+                FrameworkSupplierDeclarationStatus, and_(
+                    FrameworkDraftServiceCount.framework_id == FrameworkSupplierDeclarationStatus.framework_id,
+                    FrameworkDraftServiceCount.supplier_id == FrameworkSupplierDeclarationStatus.supplier_id,
+                )
+            ).join(
+                Lot, FrameworkDraftServiceCount.lot_id == Lot.id
             ).group_by(
-                DraftService.status, Lot.slug, is_declaration_complete
+                FrameworkDraftServiceCount.status, Lot.slug, is_declaration_complete
             ).filter(
-                SupplierFramework.framework_id == framework.id,
-                DraftService.framework_id == framework.id,
-                SupplierFramework.declaration.isnot(None)
+                FrameworkDraftServiceCount.framework_id == framework.id,
+                FrameworkDraftServiceCount.count > 0,
+                FrameworkSupplierDeclarationStatus.has_declaration
             ).all()
         ),
         'supplier_users': label_columns(
             ['recent_login', 'count'],
             db.session.query(
-                User.logged_in_at > seven_days_ago, func.count()
-            ).filter(
-                User.role == 'supplier'
+                is_recent_login, func.count()
             ).group_by(
-                User.logged_in_at > seven_days_ago
+                is_recent_login
             ).all()
         ),
         'interested_suppliers': label_columns(
             ['declaration_status', 'has_completed_services', 'count'],
             db.session.query(
-                SupplierFramework.declaration['status'].astext,
-                drafts_alias.supplier_id.isnot(None), func.count()
-            ).select_from(
-                Supplier
-            ).join(
-                SupplierFramework
+                FrameworkSupplierDeclarationStatus.declaration_status,
+                has_completed_drafts_query.c.supplier_id.isnot(None), func.count()
             ).outerjoin(
-                drafts_alias
+                has_completed_drafts_query,
+                FrameworkSupplierDeclarationStatus.supplier_id == has_completed_drafts_query.c.supplier_id
             ).filter(
-                SupplierFramework.framework_id == framework.id,
-                SupplierFramework.declaration.isnot(None)
+                FrameworkSupplierDeclarationStatus.framework_id == framework.id,
+                FrameworkSupplierDeclarationStatus.has_declaration
             ).group_by(
-                SupplierFramework.declaration['status'].astext, drafts_alias.supplier_id.isnot(None)
+                FrameworkSupplierDeclarationStatus.declaration_status,
+                has_completed_drafts_query.c.supplier_id.isnot(None)
             ).all()
         )
     }), 200
 
 
+@main.route('/frameworks/stats/reconcile', methods=['POST'])
+def reconcile_stats():
+    """Rebuild the counters behind the framework stats from scratch, should they drift from the tables they count"""
+    validate_and_return_updater_request()
+
+    reconcile_framework_stats()
+    db.session.commit()
+
+    return jsonify(message="done"), 200
+
+
 @main.route('/frameworks/<string:framework_slug>/suppliers', methods=['GET'])
 def get_framework_suppliers(framework_slug):
     framework = Framework.query.filter(
@@ -318,6 +360,7 @@ def get_framework_suppliers(framework_slug):
 
 
 @main.route('/frameworks/<string:framework_slug>/interest', methods=['GET'])
+@cached_response('frameworks', 'supplier_frameworks')
 def get_framework_interest(framework_slug):
     framework = Framework.query.filter(
         Framework.slug == framework_slug
@@ -429,35 +472,37 @@ def transition_dos_framework(framework_slug):
         db.session.rollback()
         abort(400, format_framework_integrity_error_message(error, {}))
 
-    expiring_framework_draft_briefs = Brief.query.options(
-        load_only('id', 'framework_id'),
-    ).filter(
-        Brief.status == 'draft',
-        Brief.framework_id == expiring_framework.id,
-    ).with_for_update(
-        of=Brief,
-    ).all()
-
     brief_timestamp = datetime.datetime.utcnow()
 
-    for brief in expiring_framework_draft_briefs:
-        brief.framework_id = going_live_framework.id
-        db.session.add(brief)
-        db.session.flush()
-
-        brief_audit = AuditEvent(
-            audit_type=AuditTypes.update_brief_framework_id,
-            user=updater_json['updated_by'],
-            data={
-                'briefId': brief.id,
+    # Move all the draft briefs across in a single statement rather than locking and flushing them one by one - at
+    # framework handover there can be thousands of them. "Draft" here is exactly what `Brief.status` considers a
+    # draft: neither published nor withdrawn.
+    moved_brief_ids = [
+        brief_id for (brief_id,) in db.session.execute(Brief.__table__.update().returning(
+            Brief.id
+        ).where(db.and_(
+            Brief.framework_id == expiring_framework.id,
+            Brief.published_at.is_(None),
+            Brief.withdrawn_at.is_(None),
+        )).values(
+            framework_id=going_live_framework.id,
+        )).fetchall()
+    ]
+
+    AuditEvent.bulk_insert(
+        AuditTypes.update_brief_framework_id,
+        updater_json['updated_by'],
+        Brief,
+        (
+            (brief_id, {
+                'briefId': brief_id,
                 'previousFrameworkId': expiring_framework.id,
                 'newFrameworkId': going_live_framework.id,
-            },
-            db_object=brief,
-        )
-        brief_audit.created_at = brief_timestamp
-
-        db.session.add(brief_audit)
+            }) for brief_id in moved_brief_ids
+        ),
+        created_at=brief_timestamp,
+    )
+    db.session.expire_all()
 
     try:
         db.session.commit()
@@ -1,36 +1,52 @@
 from dmapiclient.audit import AuditTypes
 from flask import jsonify, abort, request, current_app
+from operator import attrgetter
+
 from sqlalchemy import asc
+from sqlalchemy.orm import selectinload
 
 from dmutils.config import convert_to_boolean
 from dmutils.errors.api import ValidationError
 
 from .. import main
-from ...models import ArchivedService, Service, Supplier, AuditEvent, Framework, db
-from ...validation import is_valid_service_id_or_400
+from ...models import ArchivedService, Service, Supplier, AuditEvent, Framework, Lot, db
+from ...sparse_fieldsets import with_fields
+from ...validation import is_valid_service_id_or_400, validate_updater_json_or_400
 from ...utils import (
+    conditional_response_headers,
     display_list,
+    get_fields_or_400,
+    get_ids_or_400,
     get_int_or_400,
     get_json_from_request,
     get_valid_page_or_1,
+    json_has_keys,
+    json_has_required_keys,
     json_only_has_required_keys,
     list_result_response,
+    make_etag,
+    not_modified_response_or_none,
+    order_by_ids,
     paginated_result_response,
     pagination_links,
+    row_version,
     single_result_response,
     url_for,
     validate_and_return_updater_request,
 )
 from ...service_utils import (
     commit_and_archive_service,
-    delete_service_from_index,
+    commit_and_archive_service_statuses,
     filter_services,
+    get_archived_service_diff,
     index_service,
     update_and_validate_service,
+    update_index_for_service_status_change,
     validate_and_return_related_objects,
     validate_and_return_service_request,
     validate_service_data,
 )
+from ...service_import_utils import import_services as import_services_from_lines
 from .audits import acknowledge_including_previous
 
 RESOURCE_NAME = "services"
@@ -56,6 +72,27 @@ def list_services():
 
     response_headers = {"X-Compression-Safe": "0"}
 
+    # only these keys of each service, with only those taken from its data fetched from the database
+    fields = get_fields_or_400(request.args)
+    serialize_kwargs = {"fields": fields} if fields is not None else None
+
+    service_ids = get_ids_or_400(request.args, 'ids')
+    if service_ids is not None:
+        # the services with these ids, whatever their framework or status, in the order of the ids. Each relationship
+        # is loaded with a single query, however many services share its objects.
+        services = Service.query.filter(Service.service_id.in_(service_ids))
+        if fields is None:
+            services = services.options(
+                selectinload(Service.supplier),
+                selectinload(Service.framework),
+                selectinload(Service.lot),
+            )
+        else:
+            services = with_fields(services, Service, fields)
+        return list_result_response(
+            RESOURCE_NAME, order_by_ids(services, service_ids, attrgetter('service_id')), serialize_kwargs,
+        ), 200, response_headers
+
     if request.args.get('framework'):
         frameworks = [slug.strip() for slug in request.args['framework'].split(',')]
         if not db.session.query(Framework.query.filter(
@@ -83,19 +120,23 @@ def list_services():
     except ValidationError as e:
         abort(400, e.message)
 
+    if fields is not None:
+        services = with_fields(services, Service, fields)
+
     if supplier_id is not None:
         supplier = Supplier.query.filter(Supplier.supplier_id == supplier_id).all()
         if not supplier:
             abort(404, "supplier_id '%d' not found" % supplier_id)
 
         services = services.default_order().filter(Service.supplier_id == supplier_id)
-        return list_result_response(RESOURCE_NAME, services), 200
+        return list_result_response(RESOURCE_NAME, services, serialize_kwargs), 200
     else:
         services = services.order_by(asc(Service.id))
 
     return paginated_result_response(
         result_name=RESOURCE_NAME,
         results_query=services,
+        serialize_kwargs=serialize_kwargs,
         page=page,
         per_page=current_app.config['DM_API_SERVICES_PAGE_SIZE'],
         endpoint='.list_services',
@@ -119,6 +160,8 @@ def list_archived_services_by_service_id():
 
     services = ArchivedService.query.filter(
         ArchivedService.service_id == service_id
+    ).options(
+        selectinload(ArchivedService.snapshot),
     ).order_by(asc(ArchivedService.id))
 
     services = services.paginate(
@@ -196,6 +239,8 @@ def revert_service(service_id):
     try:
         archived_service = ArchivedService.query.filter(
             ArchivedService.id == int(payload_json["archivedServiceId"])
+        ).options(
+            selectinload(ArchivedService.snapshot),
         ).first()
     except ValueError:
         # presumably failed to interpret `archivedServiceId` as an integer
@@ -261,8 +306,61 @@ def import_service(service_id):
     return single_result_response(RESOURCE_NAME, service), 201
 
 
+@main.route('/services/import', methods=['POST'])
+def import_services():
+    """Import services from legacy digital marketplace in bulk
+
+    Takes a newline-delimited JSON body (`application/x-ndjson`), one service per line in the format `import_service`
+    accepts, with the service ID as `id`. The updater is given as the `updated_by` query argument.
+
+    Lines are loaded in chunks, each committed on its own, so a failing line doesn't stop the rest of the import.
+    :return: a result for each line, with either `created` or an `error`
+    """
+    if request.mimetype != 'application/x-ndjson':
+        abort(400, "Unexpected Content-Type, expecting 'application/x-ndjson'")
+
+    updater_json = {'updated_by': request.args.get('updated_by')}
+    validate_updater_json_or_400(updater_json)
+
+    lines = request.get_data(as_text=True).splitlines()
+    results = import_services_from_lines(lines, updater_json['updated_by'])
+
+    created_count = sum(1 for result in results if result.get('created'))
+    return jsonify(
+        results=results,
+        meta={
+            "created": created_count,
+            "failed": len(results) - created_count,
+        },
+    ), 200
+
+
 @main.route('/services/<string:service_id>', methods=['GET'])
 def get_service(service_id):
+    version = db.session.query(
+        Service.status,
+        Framework.status,
+        row_version(Service.__table__),
+        row_version(Supplier.__table__),
+        row_version(Framework.__table__),
+        row_version(Lot.__table__),
+    ).join(
+        Service.supplier, Service.framework, Service.lot,
+    ).filter(
+        Service.service_id == service_id
+    ).first_or_404()
+
+    # responses for unavailable services include the audit event that made them so, which has no cheap version
+    status, framework_status = version[:2]
+    if status == 'published' and framework_status != 'expired':
+        etag = make_etag(*version)
+        not_modified = not_modified_response_or_none(etag)
+        if not_modified:
+            return not_modified
+        response_headers = conditional_response_headers(etag)
+    else:
+        response_headers = {}
+
     service = Service.query.filter(
         Service.service_id == service_id
     ).first_or_404()
@@ -291,7 +389,39 @@ def get_service(service_id):
     return jsonify(
         services=service.serialize(),
         serviceMadeUnavailableAuditEvent=service_made_unavailable_audit_event
-    ), 200
+    ), 200, response_headers
+
+
+@main.route('/services/<string:service_id>/diff', methods=['GET'])
+def get_service_diff(service_id):
+    """
+    The changes to a service's data between two of its archived versions, without the versions themselves
+    :query_param from: archivedServiceId
+    :query_param to: archivedServiceId
+    """
+    archived_service_ids = {}
+    for arg in ('from', 'to'):
+        try:
+            archived_service_ids[arg] = int(request.args[arg])
+        except (KeyError, ValueError):
+            abort(400, "'{}' must be an archivedServiceId".format(arg))
+
+    archived_services = {
+        archived_service.id: archived_service
+        for archived_service in ArchivedService.query.filter(
+            ArchivedService.id.in_(archived_service_ids.values()),
+            ArchivedService.service_id == service_id,
+        ).options(
+            selectinload(ArchivedService.snapshot),
+        )
+    }
+    if not all(archived_service_id in archived_services for archived_service_id in archived_service_ids.values()):
+        abort(404, "No such ArchivedService for service {}".format(service_id))
+
+    return jsonify(serviceDiff=get_archived_service_diff(
+        archived_services[archived_service_ids['from']],
+        archived_services[archived_service_ids['to']],
+    )), 200
 
 
 @main.route('/archived-services/<int:archived_service_id>', methods=['GET'])
@@ -309,6 +439,23 @@ def get_archived_service(archived_service_id):
     return single_result_response(RESOURCE_NAME, service), 200
 
 
+def _validate_service_status_or_400(status):
+    # Statuses are defined in the Supplier model
+    valid_statuses = [
+        "published",
+        "enabled",
+        "disabled"
+    ]
+
+    if status not in valid_statuses:
+        valid_statuses_single_quotes = display_list(
+            ["\'{}\'".format(vstatus) for vstatus in valid_statuses]
+        )
+        abort(400, "'{}' is not a valid status. Valid statuses are {}".format(
+            status, valid_statuses_single_quotes
+        ))
+
+
 @main.route(
     '/services/<string:service_id>/status/<string:status>',
     methods=['POST']
@@ -321,26 +468,13 @@ def update_service_status(service_id, status):
     :return: the newly updated service in the response
     """
 
-    # Statuses are defined in the Supplier model
-    valid_statuses = [
-        "published",
-        "enabled",
-        "disabled"
-    ]
-
     is_valid_service_id_or_400(service_id)
 
     service = Service.query.filter(
         Service.service_id == service_id
     ).first_or_404()
 
-    if status not in valid_statuses:
-        valid_statuses_single_quotes = display_list(
-            ["\'{}\'".format(vstatus) for vstatus in valid_statuses]
-        )
-        abort(400, "'{}' is not a valid status. Valid statuses are {}".format(
-            status, valid_statuses_single_quotes
-        ))
+    _validate_service_status_or_400(status)
 
     update_json = validate_and_return_updater_request()
 
@@ -351,18 +485,78 @@ def update_service_status(service_id, status):
                                audit_data={'old_status': prior_status,
                                            'new_status': status})
 
-    if prior_status != status:
-        wait_for_response = convert_to_boolean(request.args.get("wait-for-index", "true"))
-        if prior_status == 'published':
-            # If it's being unpublished, delete it from the search api.
-            delete_service_from_index(service, wait_for_response=wait_for_response)
-        else:
-            # If it's being published, index in the search api.
-            index_service(service, wait_for_response=wait_for_response)
+    update_index_for_service_status_change(
+        service,
+        prior_status,
+        wait_for_response=convert_to_boolean(request.args.get("wait-for-index", "true")),
+    )
 
     return single_result_response(RESOURCE_NAME, service), 200
 
 
+@main.route('/services/status/<string:status>', methods=['POST'])
+def update_services_status(status):
+    """
+    Updates the status of a batch of services in one transaction, archiving and auditing each one as
+    `update_service_status` would. Services are selected either by a list of `serviceIds` or by a `supplierId` and
+    `frameworkSlug` pair (e.g. when suspending a supplier).
+
+    Search index changes are sent once the transaction has been committed and, unless `wait-for-index=true` is given,
+    without waiting for the search api to respond to each one.
+    :param status:
+    :return: the id and new status of each updated service
+    """
+    _validate_service_status_or_400(status)
+
+    update_json = validate_and_return_updater_request()
+    json_payload = get_json_from_request()
+    json_has_keys(json_payload, optional_keys=('updated_by', 'serviceIds', 'supplierId', 'frameworkSlug'))
+
+    services = Service.query.with_for_update(of=Service)
+
+    if 'serviceIds' in json_payload:
+        if 'supplierId' in json_payload or 'frameworkSlug' in json_payload:
+            abort(400, "Supply either 'serviceIds' or 'supplierId' and 'frameworkSlug', not both")
+        if not isinstance(json_payload['serviceIds'], list) or not json_payload['serviceIds']:
+            abort(400, "'serviceIds' must be a non-empty list")
+        service_ids = set(map(str, json_payload['serviceIds']))
+        for service_id in service_ids:
+            is_valid_service_id_or_400(service_id)
+        services = services.filter(Service.service_id.in_(service_ids))
+    else:
+        json_has_required_keys(json_payload, ('supplierId', 'frameworkSlug'))
+        supplier_id = get_int_or_400(json_payload, 'supplierId')
+        services = services.filter(
+            Service.supplier_id == supplier_id,
+            Service.framework.has(Framework.slug == json_payload['frameworkSlug']),
+        )
+
+    services = services.order_by(asc(Service.id)).all()
+
+    if 'serviceIds' in json_payload:
+        missing_service_ids = service_ids - {service.service_id for service in services}
+        if missing_service_ids:
+            abort(404, "Services not found: {}".format(", ".join(sorted(missing_service_ids))))
+
+    prior_statuses = commit_and_archive_service_statuses(services, status, update_json)
+
+    # reload the (now expired) services in one query rather than letting each one refresh itself while being indexed
+    services = Service.query.filter(
+        Service.id.in_([service.id for service in services])
+    ).order_by(asc(Service.id)).all()
+    wait_for_response = convert_to_boolean(request.args.get("wait-for-index", "false"))
+    for service in services:
+        update_index_for_service_status_change(
+            service,
+            prior_statuses[service.service_id],
+            wait_for_response=wait_for_response,
+        )
+
+    return jsonify(**{
+        RESOURCE_NAME: [{"id": service.service_id, "status": service.status} for service in services]
+    }), 200
+
+
 @main.route('/services/<service_id>/updates/acknowledge', methods=['POST'])
 def acknowledge_update_events(service_id):
     service = Service.query.filter(
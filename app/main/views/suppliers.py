@@ -1,36 +1,56 @@
 from datetime import datetime
+from operator import attrgetter
 
 from flask import jsonify, abort, request, current_app
-from itertools import groupby
-from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError, DataError
-from sqlalchemy.sql.expression import or_ as sql_or
+from sqlalchemy.sql.expression import and_ as sql_and, or_ as sql_or
 from sqlalchemy.orm import lazyload
 from sqlalchemy.orm.exc import NoResultFound
 from dmapiclient.audit import AuditTypes
 from dmutils.formats import DATETIME_FORMAT
 
 from .. import main
+from .brief_responses import COMPLETED_BRIEF_RESPONSE_STATUSES, with_brief_response_list_options
 from ... import db
+from ...response_cache import cached_export
 from ...supplier_utils import (
-    company_details_confirmed_if_required_for_framework,
     update_open_declarations_with_company_details,
+    update_suppliers_from_lines,
+)
+from ...models import (
+    AuditEvent,
+    BriefResponse,
+    ContactInformation,
+    Framework,
+    Service,
+    Supplier,
+    SupplierFramework,
+    SupplierFrameworkApplication,
+    User,
 )
-from ...models import Supplier, ContactInformation, AuditEvent, Service, SupplierFramework, Framework, User
 from ...validation import (
     is_valid_string_or_400,
     validate_contact_information_json_or_400,
     validate_supplier_json_or_400,
+    validate_updater_json_or_400,
 )
 from ...utils import (
+    conditional_response_headers,
     drop_foreign_fields,
+    get_ids_or_400,
     get_json_from_request,
     get_valid_page_or_1,
     json_has_keys,
     json_has_matching_id,
     json_has_required_keys,
     json_only_has_required_keys,
+    make_etag,
+    not_modified_response_or_none,
+    order_by_ids,
     paginated_result_response,
+    result_meta,
+    row_version,
+    row_versions,
     single_result_response,
     validate_and_return_updater_request,
 )
@@ -43,6 +63,17 @@ RESOURCE_NAME = "suppliers"
 def list_suppliers():
     page = get_valid_page_or_1()
 
+    supplier_ids = get_ids_or_400(request.args, 'ids', type=int)
+    if supplier_ids is not None:
+        # the suppliers with these ids, in the order of the ids, with their service counts as from `get_supplier`
+        suppliers = Supplier.query.filter(Supplier.supplier_id.in_(supplier_ids))
+        service_counts = Supplier.get_service_counts_for_supplier_ids(supplier_ids)
+        serialized_suppliers = [
+            supplier.serialize(data={"service_counts": service_counts.get(supplier.supplier_id, {})})
+            for supplier in order_by_ids(suppliers, supplier_ids, attrgetter('supplier_id'))
+        ]
+        return jsonify(meta=result_meta(len(serialized_suppliers)), **{RESOURCE_NAME: serialized_suppliers}), 200
+
     prefix = request.args.get('prefix', '')
 
     name = request.args.get('name', '')
@@ -116,6 +147,12 @@ def list_suppliers():
 
 
 @main.route('/suppliers/export/<framework_slug>', methods=['GET'])
+# keyed on what supplier_framework_applications is derived from rather than the table itself, as its triggers rewrite
+# its rows whenever one of a supplier's drafts or services is written, whether or not the export would change
+@cached_export(
+    'contact_information', 'draft_service_statuses', 'framework_agreements', 'framework_lots', 'frameworks', 'lots',
+    'service_statuses', 'supplier_frameworks', 'suppliers',
+)
 def export_suppliers_for_framework(framework_slug):
     # 400 if framework slug is invalid
     framework = Framework.query.filter(Framework.slug == framework_slug).first()
@@ -125,40 +162,21 @@ def export_suppliers_for_framework(framework_slug):
     if framework.status == 'coming':
         abort(400, 'framework not yet open')
 
-    lot_slugs_by_id = {lot.id: lot.slug for lot in framework.lots}
-
-    # Creates a dictionary of dictionaries, with published service counts per lot per supplier.
-    # To do this we use dictionary comprehension, SQL query and itertools' 'groupby' function.
-    # Grouping by supplier id is more efficient as this is what we will be iterating over later.
-    service_counts_by_lot_by_supplier = {
-        supplier_id: {row[1]: row[2] for row in rows}
-        for supplier_id, rows in groupby(
-            db.session.query(
-                Service.supplier_id,
-                Service.lot_id,
-                func.count(Service.id)
-            ).filter(
-                Service.status == 'published',
-                Service.framework_id == framework.id
-            ).order_by(
-                Service.supplier_id,
-                Service.lot_id,
-            ).group_by(
-                Service.supplier_id,
-                Service.lot_id,
-            ).all(),
-            key=lambda row: row[0],
-        )
-    }
+    lot_ids_by_slug = {lot.slug: lot.id for lot in framework.lots}
 
     suppliers_and_framework = db.session.query(
-        SupplierFramework, Supplier, ContactInformation
+        SupplierFramework, SupplierFrameworkApplication, Supplier, ContactInformation
     ).filter(
         SupplierFramework.supplier_id == Supplier.supplier_id
     ).filter(
         SupplierFramework.framework_id == framework.id
     ).filter(
         ContactInformation.supplier_id == Supplier.supplier_id
+    ).outerjoin(
+        SupplierFrameworkApplication, sql_and(
+            SupplierFrameworkApplication.supplier_id == SupplierFramework.supplier_id,
+            SupplierFrameworkApplication.framework_id == SupplierFramework.framework_id,
+        )
     ).options(
         lazyload(SupplierFramework.framework),
         lazyload(SupplierFramework.prefill_declaration_from_framework),
@@ -168,19 +186,15 @@ def export_suppliers_for_framework(framework_slug):
     ).all()
 
     supplier_rows = []
-
-    suppliers_with_a_complete_service = frozenset(framework.get_supplier_ids_for_completed_service())
-
-    for sf, supplier, ci in suppliers_and_framework:
-        declaration_status = sf.declaration.get('status') if sf.declaration else 'unstarted'
-
-        # This `application_status` logic also exists in users.export_users_for_framework
-        application_status = 'application' if (
-            declaration_status == 'complete' and
-            supplier.supplier_id in suppliers_with_a_complete_service and
-            company_details_confirmed_if_required_for_framework(framework_slug, sf)
-        ) else 'no_application'
-
+    # a supplier framework appears once per contact, so each missing application is only recomputed once
+    recomputed_applications = {}
+
+    for sf, application, supplier, ci in suppliers_and_framework:
+        if application is None:
+            key = (sf.supplier_id, sf.framework_id)
+            if key not in recomputed_applications:
+                recomputed_applications[key] = SupplierFrameworkApplication.refresh_missing_row(sf)
+            application = recomputed_applications[key]
         application_result = ''
         framework_agreement = False
         variations_agreed = ''
@@ -202,15 +216,13 @@ def export_suppliers_for_framework(framework_slug):
             "companies_house_number": supplier.companies_house_number,
             "other_company_registration_number": supplier.other_company_registration_number,
             'application_result': application_result,
-            'application_status': application_status,
-            'declaration_status': declaration_status,
+            'application_status': application.application_status,
+            'declaration_status': application.declaration_status,
             'framework_agreement': framework_agreement,
             'variations_agreed': variations_agreed,
             "published_services_count": {
-                lot_slugs_by_id[lot_id]: service_counts_by_lot_by_supplier.get(
-                    supplier.supplier_id, {}
-                ).get(lot_id, 0)
-                for lot_id in lot_slugs_by_id.keys()
+                lot_slug: application.get_published_service_count(lot_id)
+                for lot_slug, lot_id in lot_ids_by_slug.items()
             },
             "contact_information": {
                 'contact_name': ci.contact_name,
@@ -223,22 +235,40 @@ def export_suppliers_for_framework(framework_slug):
             }
         })
 
+    if recomputed_applications:
+        db.session.commit()
+
     return jsonify(suppliers=supplier_rows), 200
 
 
 @main.route('/suppliers/<int:supplier_id>', methods=['GET'])
 def get_supplier(supplier_id):
-    supplier = Supplier.query.filter(
+    version = db.session.query(
+        row_version(Supplier.__table__),
+        row_versions(
+            ContactInformation.__table__,
+            ContactInformation.id,
+            ContactInformation.supplier_id == Supplier.supplier_id,
+        ),
+    ).filter(
         Supplier.supplier_id == supplier_id
     ).first_or_404()
+    service_counts = Supplier.get_service_counts_for_supplier_id(supplier_id)
 
-    service_counts = supplier.get_service_counts()
+    etag = make_etag(*version, service_counts)
+    not_modified = not_modified_response_or_none(etag)
+    if not_modified:
+        return not_modified
+
+    supplier = Supplier.query.filter(
+        Supplier.supplier_id == supplier_id
+    ).first_or_404()
 
     return single_result_response(
         RESOURCE_NAME,
         supplier,
         serialize_kwargs={"data": {"service_counts": service_counts}}
-    ), 200
+    ), 200, conditional_response_headers(etag)
 
 
 @main.route('/suppliers/<int:supplier_id>', methods=['PUT'])
@@ -367,6 +397,35 @@ def update_supplier(supplier_id):
     return single_result_response(RESOURCE_NAME, supplier), 200
 
 
+@main.route('/suppliers/bulk-update', methods=['POST'])
+def update_suppliers():
+    """
+    Apply partial updates to many suppliers at once.
+
+    Takes a newline-delimited JSON body (`application/x-ndjson`), one update per line in the format `update_supplier`
+    accepts for `suppliers` plus the supplier's `id`. The updater is given as the `updated_by` query argument.
+
+    Lines are applied in chunks, each committed on its own, so a failing line doesn't stop the rest of the update.
+    :return: a result for each line, with either `updated` or an `error`
+    """
+    if request.mimetype != 'application/x-ndjson':
+        abort(400, "Unexpected Content-Type, expecting 'application/x-ndjson'")
+
+    updater_json = {'updated_by': request.args.get('updated_by')}
+    validate_updater_json_or_400(updater_json)
+
+    results = update_suppliers_from_lines(db, request.get_data(as_text=True).splitlines(), updater_json)
+
+    updated_count = sum(1 for result in results if result.get('updated'))
+    return jsonify(
+        results=results,
+        meta={
+            "updated": updated_count,
+            "failed": len(results) - updated_count,
+        },
+    ), 200
+
+
 @main.route('/suppliers/<int:supplier_id>/contact-information/<int:contact_id>', methods=['POST'])
 def update_contact_information(supplier_id, contact_id):
     request_data = get_json_from_request()
@@ -592,6 +651,63 @@ def get_supplier_frameworks_info(supplier_id):
     ), 200
 
 
+@main.route('/suppliers/<int:supplier_id>/dashboard', methods=['GET'])
+def get_supplier_dashboard(supplier_id):
+    """
+    Everything a supplier's dashboard shows, in one response: the supplier (as `get_supplier` returns it), its framework
+    interests (as `get_supplier_frameworks_info` returns them), its completed brief responses and its users.
+
+    Both sets of service counts come from the one grouped count of the supplier's services and drafts, and the
+    frameworks and agreements of its framework interests are loaded along with them, so this takes a fixed number of
+    queries however many frameworks, brief responses and users the supplier has.
+    """
+    supplier = Supplier.query.filter(
+        Supplier.supplier_id == supplier_id
+    ).first_or_404()
+
+    service_counts, draft_counts = SupplierFramework.get_service_and_draft_counts(supplier_id)
+    service_and_draft_counts = dict(service_counts)
+    service_and_draft_counts.update(draft_counts)
+
+    supplier_frameworks = SupplierFramework.query.filter(
+        SupplierFramework.supplier_id == supplier_id
+    ).all()
+    # most of these are in the session already, loaded along with the supplier frameworks
+    frameworks = Framework.query.filter(
+        Framework.id.in_({framework_id for framework_id, status in service_counts})
+    ).all()
+    live_framework_names = {framework.id: framework.name for framework in frameworks if framework.status == 'live'}
+
+    brief_responses = with_brief_response_list_options(BriefResponse.query.filter(
+        BriefResponse.supplier_id == supplier_id,
+        BriefResponse.status.in_(COMPLETED_BRIEF_RESPONSE_STATUSES),
+    ).order_by(BriefResponse.id))
+
+    users = User.query.filter(
+        User.supplier_id == supplier_id
+    ).order_by(User.id)
+
+    return jsonify(
+        suppliers=supplier.serialize({"service_counts": {
+            live_framework_names[framework_id]: count
+            for (framework_id, status), count in service_counts.items()
+            if status == 'published' and framework_id in live_framework_names
+        }}),
+        frameworkInterest=[
+            supplier_framework.serialize({
+                'drafts_count': service_and_draft_counts.get((supplier_framework.framework_id, 'not-submitted'), 0),
+                'complete_drafts_count': service_and_draft_counts.get(
+                    (supplier_framework.framework_id, 'submitted'), 0
+                ),
+                'services_count': service_and_draft_counts.get((supplier_framework.framework_id, 'published'), 0)
+            })
+            for supplier_framework in supplier_frameworks
+        ],
+        briefResponses=[brief_response.serialize() for brief_response in brief_responses],
+        users=[user.serialize() for user in users],
+    ), 200
+
+
 @main.route('/suppliers/<int:supplier_id>/frameworks/<framework_slug>', methods=['GET'])
 def get_supplier_framework_info(supplier_id, framework_slug):
     supplier_framework = SupplierFramework.find_by_supplier_and_framework(
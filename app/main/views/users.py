@@ -1,22 +1,32 @@
 from datetime import datetime
 
 from dmapiclient.audit import AuditTypes
-from sqlalchemy import func
 from sqlalchemy.orm import lazyload
+from sqlalchemy import func, select
 from sqlalchemy.exc import DataError, IntegrityError
 from sqlalchemy.sql.expression import false as sql_false, and_ as sql_and
 from flask import abort, current_app, jsonify, request
 
 from dmutils.config import convert_to_boolean
 from dmutils.email.helpers import hash_string
+from dmutils.formats import DATETIME_FORMAT
 
 from .. import main
 from ... import db, encryption
-from ...models import AuditEvent, BuyerEmailDomain, Framework, Service, Supplier, SupplierFramework, User
-from ...supplier_utils import (
-    check_supplier_role,
-    company_details_confirmed_if_required_for_framework,
+from ...models import (
+    AuditEvent,
+    Brief,
+    BriefResponse,
+    BriefUser,
+    BuyerEmailDomain,
+    Framework,
+    Supplier,
+    SupplierFramework,
+    SupplierFrameworkApplication,
+    User,
 )
+from ...response_cache import cached_export
+from ...supplier_utils import check_supplier_role
 from ...utils import (
     get_json_from_request,
     get_valid_page_or_1,
@@ -109,6 +119,50 @@ def get_user_by_id(user_id):
     return single_result_response(RESOURCE_NAME, user), 200
 
 
+@main.route('/users/<int:user_id>/briefs/summary', methods=['GET'])
+def get_user_briefs_summary(user_id):
+    """
+    The status, closing date and number of submitted responses of each of a buyer's briefs, counted in the same query
+    as the briefs are listed by rather than by listing each brief's responses
+    """
+    User.query.filter(User.id == user_id).first_or_404()
+
+    # counted in a subquery correlated to the brief, as `Brief.status` is itself a subquery of the brief's responses
+    # that a join to brief_responses in the outer query would correlate away
+    submitted_brief_responses_count = select([
+        func.count(BriefResponse.id)
+    ]).where(
+        sql_and(BriefResponse.brief_id == Brief.id, BriefResponse.submitted_at.isnot(None))
+    ).correlate(
+        Brief
+    ).as_scalar()
+
+    briefs = db.session.query(
+        Brief.id,
+        Brief.data['title'].astext,
+        Brief.status,
+        Brief.applications_closed_at,
+        submitted_brief_responses_count,
+    ).join(
+        BriefUser, BriefUser.brief_id == Brief.id
+    ).filter(
+        BriefUser.user_id == user_id
+    ).order_by(
+        Brief.id
+    ).all()
+
+    return jsonify(briefs=[
+        {
+            'id': brief_id,
+            'title': title,
+            'status': status,
+            'applicationsClosedAt': applications_closed_at and applications_closed_at.strftime(DATETIME_FORMAT),
+            'submittedBriefResponsesCount': submitted_brief_responses_count,
+        }
+        for brief_id, title, status, applications_closed_at, submitted_brief_responses_count in briefs
+    ]), 200
+
+
 @main.route('/users', methods=['GET'])
 def list_users():
     user_query = User.query.order_by(User.id)
@@ -346,6 +400,11 @@ def remove_user_personal_data(user_id):
 
 
 @main.route('/users/export/<framework_slug>', methods=['GET'])
+# keyed on what supplier_framework_applications is derived from, as the suppliers export is
+@cached_export(
+    'draft_service_statuses', 'framework_agreements', 'frameworks', 'service_statuses', 'supplier_frameworks',
+    'suppliers', 'users',
+)
 def export_users_for_framework(framework_slug):
 
     # 400 if framework slug is invalid
@@ -356,26 +415,19 @@ def export_users_for_framework(framework_slug):
     if framework.status == 'coming':
         abort(400, 'framework not yet open')
 
-    suppliers_with_a_complete_service = frozenset(framework.get_supplier_ids_for_completed_service())
-
-    supplier_id_published_service_count = dict(db.session.query(
-        Service.supplier_id,
-        func.count(Service.id)
-    ).filter(
-        Service.status == 'published',
-        Service.framework_id == framework.id
-    ).group_by(
-        Service.supplier_id
-    ).all())
-
     supplier_frameworks_and_users = db.session.query(
-        SupplierFramework, User
+        SupplierFramework, SupplierFrameworkApplication, User
     ).filter(
         SupplierFramework.supplier_id == User.supplier_id
     ).filter(
         SupplierFramework.framework_id == framework.id
     ).filter(
         User.active.is_(True)
+    ).outerjoin(
+        SupplierFrameworkApplication, sql_and(
+            SupplierFrameworkApplication.supplier_id == SupplierFramework.supplier_id,
+            SupplierFrameworkApplication.framework_id == SupplierFramework.framework_id,
+        )
     ).options(
         lazyload(User.supplier),
         lazyload(SupplierFramework.supplier),
@@ -388,19 +440,15 @@ def export_users_for_framework(framework_slug):
     ).all()
 
     user_rows = []
-
-    for sf, u in supplier_frameworks_and_users:
-
-        # always get the declaration status
-        declaration_status = sf.declaration.get('status') if sf.declaration else 'unstarted'
-
-        # This `application_status` logic also exists in suppliers.export_suppliers_for_framework
-        application_status = 'application' if (
-            declaration_status == 'complete' and
-            sf.supplier_id in suppliers_with_a_complete_service and
-            company_details_confirmed_if_required_for_framework(framework_slug, sf)
-        ) else 'no_application'
-
+    # a supplier framework appears once per user, so each missing application is only recomputed once
+    recomputed_applications = {}
+
+    for sf, application, u in supplier_frameworks_and_users:
+        if application is None:
+            key = (sf.supplier_id, sf.framework_id)
+            if key not in recomputed_applications:
+                recomputed_applications[key] = SupplierFrameworkApplication.refresh_missing_row(sf)
+            application = recomputed_applications[key]
         application_result = ''
         framework_agreement = ''
         variations_agreed = ''
@@ -419,14 +467,17 @@ def export_users_for_framework(framework_slug):
             'user_name': u.name,
             'user_research_opted_in': u.user_research_opted_in,
             'supplier_id': sf.supplier_id,
-            'declaration_status': declaration_status,
-            'application_status': application_status,
+            'declaration_status': application.declaration_status,
+            'application_status': application.application_status,
             'framework_agreement': framework_agreement,
             'application_result': application_result,
             'variations_agreed': variations_agreed,
-            'published_service_count': supplier_id_published_service_count.get(sf.supplier_id, 0)
+            'published_service_count': application.get_published_service_count()
         })
 
+    if recomputed_applications:
+        db.session.commit()
+
     return jsonify(users=user_rows), 200
 
 
@@ -2,3 +2,5 @@ from .main import *  # noqa
 from .direct_award import *  # noqa
 from .buyer_domains import *  # noqa
 from .outcomes import * # noqa
+from .framework_stats import *  # noqa
+from .applications import *  # noqa
@@ -0,0 +1,69 @@
+"""
+The state of each supplier's application to a framework, derived from the supplier's declaration, drafts and services.
+
+`supplier_framework_applications` is maintained by triggers on `supplier_frameworks`, `suppliers`, `draft_services` and
+`services` (installed by migration 1480), which recompute the row for each supplier framework a statement touched once
+that statement has finished.
+"""
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app import db
+
+
+class SupplierFrameworkApplication(db.Model):
+    __tablename__ = 'supplier_framework_applications'
+
+    supplier_id = db.Column(db.BigInteger, primary_key=True)
+    framework_id = db.Column(db.Integer, primary_key=True)
+
+    # the declaration's status, or 'unstarted' if there isn't one
+    declaration_status = db.Column(db.String, nullable=True)
+    # whether any of the supplier's drafts on the framework are submitted (or failed)
+    has_completed_service = db.Column(db.Boolean, nullable=False)
+    # 'application' if the declaration is complete, there is a completed service and the company details have been
+    # confirmed, 'no_application' otherwise
+    application_status = db.Column(db.String, nullable=False)
+    # the number of the supplier's published services on the framework for each lot id (as a string)
+    published_service_counts = db.Column(JSONB, nullable=False)
+
+    __table_args__ = (
+        db.Index('idx_supplier_framework_applications_status', framework_id, application_status),
+        {}
+    )
+
+    @classmethod
+    def refresh_missing_row(cls, supplier_framework):
+        """
+        Recomputes the application of a supplier framework without a row here, as when it was written with triggers
+        disabled, logging that it was missing. The caller is responsible for committing the new row.
+        """
+        current_app.logger.warning(
+            "{code}: No application row for supplier {supplier_id} on framework {framework_id}, recomputing it",
+            extra={
+                "code": "supplier_framework_application.missing_row",
+                "supplier_id": supplier_framework.supplier_id,
+                "framework_id": supplier_framework.framework_id,
+            }
+        )
+        db.session.execute(
+            text("SELECT refresh_supplier_framework_application(:supplier_id, :framework_id)"),
+            {"supplier_id": supplier_framework.supplier_id, "framework_id": supplier_framework.framework_id},
+        )
+        return cls.query.get((supplier_framework.supplier_id, supplier_framework.framework_id))
+
+    def get_published_service_count(self, lot_id=None):
+        if lot_id is None:
+            return sum(self.published_service_counts.values())
+        return self.published_service_counts.get(str(lot_id), 0)
+
+    def serialize(self):
+        return {
+            'supplierId': self.supplier_id,
+            'frameworkId': self.framework_id,
+            'declarationStatus': self.declaration_status,
+            'hasCompletedService': self.has_completed_service,
+            'applicationStatus': self.application_status,
+            'publishedServiceCounts': self.published_service_counts,
+        }
@@ -0,0 +1,37 @@
+"""
+Counters behind `/frameworks/<framework_slug>/stats`.
+
+These tables are maintained by row-level triggers on `supplier_frameworks`, `draft_services` and `users` (installed by
+migration 1470) rather than by application code, so every way those tables are written to keeps them up to date.
+`app.framework_utils.reconcile_framework_stats` rebuilds them from scratch should they ever drift.
+"""
+from app import db
+
+
+class FrameworkSupplierDeclarationStatus(db.Model):
+    """One row per SupplierFramework, holding just what the stats need from its (large) declaration"""
+    __tablename__ = 'framework_supplier_declaration_statuses'
+
+    framework_id = db.Column(db.Integer, primary_key=True)
+    supplier_id = db.Column(db.BigInteger, primary_key=True)
+    has_declaration = db.Column(db.Boolean, nullable=False)
+    declaration_status = db.Column(db.String, nullable=True)
+
+
+class FrameworkDraftServiceCount(db.Model):
+    """The number of a supplier's draft services on a framework for each lot and status"""
+    __tablename__ = 'framework_draft_service_counts'
+
+    framework_id = db.Column(db.Integer, primary_key=True)
+    supplier_id = db.Column(db.BigInteger, primary_key=True)
+    lot_id = db.Column(db.BigInteger, primary_key=True)
+    status = db.Column(db.String, primary_key=True)
+    count = db.Column(db.Integer, nullable=False)
+
+
+class SupplierUserLogin(db.Model):
+    """When each supplier user last logged in, or null if they never have"""
+    __tablename__ = 'supplier_user_logins'
+
+    user_id = db.Column(db.Integer, primary_key=True)
+    logged_in_at = db.Column(db.DateTime, nullable=True)
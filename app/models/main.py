@@ -1,5 +1,6 @@
 # TODO split this file into per-functional-area modules
 
+import json
 import re
 from abc import ABCMeta, abstractmethod
 from datetime import datetime
@@ -16,17 +17,19 @@ from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.event import listen
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.orm import validates, backref, mapper, foreign, remote
+from sqlalchemy.orm import validates, backref, mapper, foreign, query_expression, remote
 from sqlalchemy.orm.session import Session, object_session
 from sqlalchemy.sql.expression import (
     case as sql_case,
     cast as sql_cast,
+    literal_column as sql_literal_column,
     select as sql_select,
     true as sql_true,
     false as sql_false,
     null as sql_null,
     and_ as sql_and,
     or_ as sql_or,
+    union_all as sql_union_all,
 )
 from sqlalchemy.sql.sqltypes import Interval
 from sqlalchemy.types import String
@@ -38,7 +41,9 @@ from dmutils.formats import DATETIME_FORMAT
 from dmutils.errors.api import ValidationError
 from app import db, encryption
 from app.utils import (
+    apply_json_object_delta,
     drop_foreign_fields,
+    json_object_delta,
     link,
     purge_nulls_from_data,
     random_positive_external_id,
@@ -50,6 +55,8 @@ from app.validation import (
     admin_email_address_has_approved_domain
 )
 from app.draft_utils import get_copiable_service_data
+from app.serialization_cache import cached_serialization
+from app.sparse_fieldsets import SerializedField, loaded_data, serialize_fields
 
 # there is a danger of circular imports here. as such, it is not necessarily "safe" to expect all other models to be
 # present in `models` at import time, but it should be "safe" to reference any of them in this file from within a
@@ -448,17 +455,32 @@ class Supplier(db.Model):
 
         return value
 
-    # Drop this method once the supplier front end is using SupplierFramework counts
+    # Drop these methods once the supplier front end is using SupplierFramework counts
     def get_service_counts(self):
+        return self.get_service_counts_for_supplier_id(self.supplier_id)
+
+    @staticmethod
+    def get_service_counts_for_supplier_id(supplier_id):
+        return Supplier.get_service_counts_for_supplier_ids([supplier_id]).get(supplier_id, {})
+
+    @staticmethod
+    def get_service_counts_for_supplier_ids(supplier_ids):
+        """
+        :return: dict of the numbers of published services on each live framework (keyed on framework name) of each
+            supplier with any, keyed on supplier id
+        """
         services = db.session.query(
-            Framework.name, func.count(Framework.name)
+            Service.supplier_id, Framework.name, func.count(Framework.name)
         ).join(Service.framework).filter(
             Framework.status == 'live',
             Service.status == 'published',
-            Service.supplier_id == self.supplier_id
-        ).group_by(Framework.name).all()
+            Service.supplier_id.in_(supplier_ids)
+        ).group_by(Service.supplier_id, Framework.name).all()
 
-        return dict(services)
+        service_counts = {}
+        for supplier_id, framework_name, count in services:
+            service_counts.setdefault(supplier_id, {})[framework_name] = count
+        return service_counts
 
     def get_link(self):
         return url_for("main.get_supplier", supplier_id=self.supplier_id)
@@ -598,29 +620,45 @@ class SupplierFramework(db.Model):
 
     @staticmethod
     def get_service_counts(supplier_id):
+        """
+        :return: dict of the numbers of the supplier's services and drafts keyed on (framework id, status), where a
+            count of drafts takes the place of a count of services with the same key
+        """
+        service_counts, draft_counts = SupplierFramework.get_service_and_draft_counts(supplier_id)
+        counts = dict(service_counts)
+        counts.update(draft_counts)
+        return counts
 
-        count_services_query = db.session.query(
-            Service.framework_id, Service.status, func.count()
-        ).filter(
-            Service.supplier_id == supplier_id
-        ).group_by(
-            Service.framework_id,
-            Service.status
-        ).all()
+    @staticmethod
+    def get_service_and_draft_counts(supplier_id):
+        """
+        Drafts copied from services keep the services' statuses, so the two are told apart by the branch of the union
+        each row came from.
 
-        count_drafts_query = db.session.query(
-            DraftService.framework_id, DraftService.status, func.count()
-        ).filter(
-            DraftService.supplier_id == supplier_id
+        :return: tuple of dicts of the numbers of the supplier's services and of its drafts, each keyed on
+            (framework id, status), counted by a single grouped query
+        """
+        services_and_drafts = sql_union_all(
+            sql_select([
+                sql_literal_column("'service'").label('source'), Service.framework_id, Service.status,
+            ]).where(Service.supplier_id == supplier_id),
+            sql_select([
+                sql_literal_column("'draft'").label('source'), DraftService.framework_id, DraftService.status,
+            ]).where(DraftService.supplier_id == supplier_id),
+        ).alias('services_and_drafts')
+
+        counts = db.session.query(
+            services_and_drafts.c.source, services_and_drafts.c.framework_id, services_and_drafts.c.status, func.count()
         ).group_by(
-            DraftService.framework_id,
-            DraftService.status
+            services_and_drafts.c.source,
+            services_and_drafts.c.framework_id,
+            services_and_drafts.c.status,
         ).all()
 
-        return {
-            (row[0], row[1]): row[2]
-            for row in count_services_query + count_drafts_query
-        }
+        service_counts, draft_counts = {}, {}
+        for source, framework_id, status, count in counts:
+            (service_counts if source == 'service' else draft_counts)[(framework_id, status)] = count
+        return service_counts, draft_counts
 
     @staticmethod
     def serialize_agreed_variation(agreed_variation, with_users=False):
@@ -1083,6 +1121,30 @@ class ServiceTableMixin(object):
     def lot(cls):
         return db.relationship(Lot, lazy='joined', innerjoin=True, foreign_keys=(cls.lot_id,))
 
+    # the keys of `data` requested of a list endpoint, when loaded `with_fields`
+    @declared_attr
+    def projected_data(cls):
+        return query_expression()
+
+    SERIALIZED_FIELDS = {
+        'id': SerializedField(lambda service: service.service_id),
+        'supplierId': SerializedField(lambda service: service.supplier_id),
+        'supplierName': SerializedField(lambda service: service.supplier.name, ('supplier',)),
+        'frameworkSlug': SerializedField(lambda service: service.framework.slug, ('framework',)),
+        'frameworkFramework': SerializedField(lambda service: service.framework.framework, ('framework',)),
+        'frameworkFamily': SerializedField(lambda service: service.framework.framework, ('framework',)),
+        'frameworkName': SerializedField(lambda service: service.framework.name, ('framework',)),
+        'frameworkStatus': SerializedField(lambda service: service.framework.status, ('framework',)),
+        'lot': SerializedField(lambda service: service.lot.slug, ('lot',)),
+        'lotSlug': SerializedField(lambda service: service.lot.slug, ('lot',)),
+        'lotName': SerializedField(lambda service: service.lot.name, ('lot',)),
+        'updatedAt': SerializedField(lambda service: service.updated_at.strftime(DATETIME_FORMAT)),
+        'createdAt': SerializedField(lambda service: service.created_at.strftime(DATETIME_FORMAT)),
+        'status': SerializedField(lambda service: service.status),
+        'copiedToFollowingFramework': SerializedField(lambda service: service.copied_to_following_framework),
+        'links': SerializedField(lambda service: link("self", service.get_link())),
+    }
+
     @validates('service_id')
     def validate_service_id(self, key, value):
         if not is_valid_service_id(value):
@@ -1099,6 +1161,14 @@ class ServiceTableMixin(object):
 
     @validates('data')
     def validates_data(self, key, value):
+        return self.clean_data(value)
+
+    @staticmethod
+    def clean_data(value):
+        """
+        The normalisation applied to `data` on assignment, exposed for code that writes rows without going through the
+        ORM.
+        """
         data = drop_foreign_fields(value, [
             'id', 'status',
             'supplierId', 'supplierName',
@@ -1112,10 +1182,14 @@ class ServiceTableMixin(object):
 
         return data
 
-    def serialize(self):
+    @cached_serialization(lambda service: (service.framework.name, service.framework.status, service.supplier.name))
+    def serialize(self, fields=None):
         """
+        :param fields: the only top level keys to include, see `app.sparse_fieldsets`
         :return: dictionary representation of a service
         """
+        if fields is not None:
+            return serialize_fields(self, fields)
 
         data = dict(self.data.items())
 
@@ -1212,15 +1286,65 @@ class Service(db.Model, ServiceTableMixin):
 class ArchivedService(db.Model, ServiceTableMixin):
     """
         A record of a Service's past state
+
+        Rather than a full copy of the service's data, most archives only hold how it differs from that of an earlier
+        "snapshot" archive of the same service (see `from_service`). `data` puts the two back together.
     """
     __tablename__ = 'archived_services'
 
+    # a new snapshot is taken when the delta from the last one would be larger than this fraction of the data
+    MAX_DELTA_SIZE_RATIO = 0.5
+
     # Overwrites service_id column to remove uniqueness constraint
     service_id = db.Column(db.String, index=True, unique=False, nullable=False)
 
+    # Overwrites data column, which is only set for snapshots
+    _data = db.Column("data", JSON, nullable=True)
+    snapshot_id = db.Column(db.Integer, db.ForeignKey('archived_services.id'), nullable=True)
+    data_delta = db.Column(JSON, nullable=True)
+
+    snapshot = db.relationship('ArchivedService', remote_side='ArchivedService.id')
+
+    @property
+    def data(self):
+        if self.snapshot is None:
+            return self._data
+        return apply_json_object_delta(self.snapshot.data, self.data_delta)
+
+    @data.setter
+    def data(self, data):
+        self._data = self.clean_data(data)
+        self.snapshot = None
+        self.data_delta = None
+
+    def get_keys_differing_from(self, other):
+        """
+        :return: the top level keys of `data` that may differ from those of `other.data`, or None if any of them may
+        """
+        if (self.snapshot_id or self.id) != (other.snapshot_id or other.id):
+            return None
+        return set().union(*(
+            set(archived_service.data_delta['set']) | set(archived_service.data_delta['unset'])
+            for archived_service in (self, other) if archived_service.data_delta is not None
+        ))
+
+    @staticmethod
+    def get_data_delta(snapshot_data, data):
+        """
+        :return: the delta to store `data` as against `snapshot_data`, or None if it should be stored as a new snapshot
+        """
+        delta = json_object_delta(snapshot_data, data)
+        if len(json.dumps(delta)) > ArchivedService.MAX_DELTA_SIZE_RATIO * len(json.dumps(data)):
+            return None
+        return delta
+
     @staticmethod
-    def from_service(service):
-        return ArchivedService(
+    def from_service(service, last_archive=None):
+        """
+        :param last_archive: the service's most recent ArchivedService, if any, to store the new one as a delta
+            against the snapshot of
+        """
+        archived_service = ArchivedService(
             framework=service.framework,
             lot=service.lot,
             service_id=service.service_id,
@@ -1231,6 +1355,16 @@ class ArchivedService(db.Model, ServiceTableMixin):
             status=service.status
         )
 
+        snapshot = last_archive and (last_archive.snapshot or last_archive)
+        if snapshot is not None:
+            data_delta = ArchivedService.get_data_delta(snapshot.data, archived_service.data)
+            if data_delta is not None:
+                archived_service.snapshot = snapshot
+                archived_service.data_delta = data_delta
+                archived_service._data = None
+
+        return archived_service
+
     @staticmethod
     def link_object(service_id):
         if service_id is None:
@@ -1366,6 +1500,30 @@ class AuditEvent(db.Model):
         self.user = user
         self.acknowledged = False
 
+    @staticmethod
+    def bulk_insert(audit_type, user, object_class, data_by_object_id, created_at=None):
+        """
+        Insert one audit event per item of `data_by_object_id` (an iterable of (object_id, data) pairs) in a single
+        multi-row INSERT, bypassing the ORM. Intended for views that have made their changes with set-based statements
+        and so have primary keys rather than model instances to hand. `object_id`s should be primary key values of
+        `object_class`.
+        """
+        created_at = created_at or datetime.utcnow()
+        rows = [
+            {
+                "type": audit_type.value,
+                "created_at": created_at,
+                "user": user,
+                "data": data,
+                # the discriminator value sqlalchemy_utils' generic_relationship would write for an instance
+                "object_type": object_class.__name__,
+                "object_id": object_id,
+                "acknowledged": False,
+            } for object_id, data in data_by_object_id
+        ]
+        if rows:
+            db.session.execute(AuditEvent.__table__.insert().values(rows))
+
     class query_class(BaseQuery):
         def last_for_object(self, object, types=None):
             events = self.filter(AuditEvent.object == object)
@@ -1374,6 +1532,13 @@ class AuditEvent(db.Model):
 
             return events.order_by(desc(AuditEvent.created_at)).first()
 
+        def including_archived(self):
+            """Query the partitions of `archived_audit_events` as well as those of `audit_events`"""
+            return self.select_entity_from(sql_union_all(
+                sql_select([AuditEvent.__table__]),
+                sql_select([archived_audit_events]),
+            ).alias('all_audit_events'))
+
     def serialize(self, include_user=False):
         """
         :return: dictionary representation of an audit event
@@ -1418,6 +1583,23 @@ class AuditEvent(db.Model):
         return data
 
 
+# The parent of the monthly partitions of `audit_events` that have been archived by
+# `app.audit_utils.archive_audit_event_partitions`. It has no rows of its own.
+archived_audit_events = db.Table(
+    'archived_audit_events',
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('type', db.String, nullable=False),
+    db.Column('created_at', db.DateTime, nullable=False),
+    db.Column('user', db.String),
+    db.Column('data', JSONB, nullable=False),
+    db.Column('object_type', db.String),
+    db.Column('object_id', db.BigInteger),
+    db.Column('acknowledged', db.Boolean, nullable=False),
+    db.Column('acknowledged_by', db.String),
+    db.Column('acknowledged_at', db.DateTime, nullable=True),
+)
+
+
 class Brief(db.Model):
     __tablename__ = 'briefs'
 
@@ -1472,6 +1654,80 @@ class Brief(db.Model):
         uselist=False,
     )
 
+    # the keys of `data` requested of a list endpoint, when loaded `with_fields`
+    projected_data = query_expression()
+
+    SERIALIZED_FIELDS = {
+        'id': SerializedField(lambda brief: brief.id),
+        'status': SerializedField(
+            lambda brief: brief.status, ('awarded_brief_response',), ('requirementsLength',),
+        ),
+        'frameworkSlug': SerializedField(lambda brief: brief.framework.slug, ('framework',)),
+        'frameworkFramework': SerializedField(lambda brief: brief.framework.framework, ('framework',)),
+        'frameworkName': SerializedField(lambda brief: brief.framework.name, ('framework',)),
+        'frameworkStatus': SerializedField(lambda brief: brief.framework.status, ('framework',)),
+        'framework': SerializedField(
+            lambda brief: {
+                'family': brief.framework.framework,
+                'name': brief.framework.name,
+                'slug': brief.framework.slug,
+                'status': brief.framework.status,
+            },
+            ('framework',),
+        ),
+        'isACopy': SerializedField(lambda brief: brief.is_a_copy),
+        'lot': SerializedField(lambda brief: brief.lot.slug, ('lot',)),
+        'lotSlug': SerializedField(lambda brief: brief.lot.slug, ('lot',)),
+        'lotName': SerializedField(lambda brief: brief.lot.name, ('lot',)),
+        'createdAt': SerializedField(lambda brief: brief.created_at.strftime(DATETIME_FORMAT)),
+        'updatedAt': SerializedField(lambda brief: brief.updated_at.strftime(DATETIME_FORMAT)),
+        'publishedAt': SerializedField(
+            lambda brief: brief.published_at and brief.published_at.strftime(DATETIME_FORMAT),
+        ),
+        'applicationsClosedAt': SerializedField(
+            lambda brief: brief.published_at and brief.applications_closed_at.strftime(DATETIME_FORMAT),
+            data_keys=('requirementsLength',),
+        ),
+        'clarificationQuestionsClosedAt': SerializedField(
+            lambda brief: brief.published_at and brief.clarification_questions_closed_at.strftime(DATETIME_FORMAT),
+            data_keys=('requirementsLength',),
+        ),
+        'clarificationQuestionsPublishedBy': SerializedField(
+            lambda brief: brief.published_at and brief.clarification_questions_published_by.strftime(DATETIME_FORMAT),
+            data_keys=('requirementsLength',),
+        ),
+        'clarificationQuestionsAreClosed': SerializedField(
+            lambda brief: brief.published_at and brief.clarification_questions_are_closed,
+            data_keys=('requirementsLength',),
+        ),
+        'withdrawnAt': SerializedField(
+            lambda brief: brief.withdrawn_at and brief.withdrawn_at.strftime(DATETIME_FORMAT),
+        ),
+        'unsuccessfulAt': SerializedField(
+            lambda brief: brief.unsuccessful_at and brief.unsuccessful_at.strftime(DATETIME_FORMAT),
+        ),
+        'cancelledAt': SerializedField(
+            lambda brief: brief.cancelled_at and brief.cancelled_at.strftime(DATETIME_FORMAT),
+        ),
+        'awardedBriefResponseId': SerializedField(
+            lambda brief: brief.awarded_brief_response.id if brief.status == 'awarded' else None,
+            ('awarded_brief_response',),
+            ('requirementsLength',),
+        ),
+        'links': SerializedField(
+            lambda brief: {
+                'self': url_for('main.get_brief', brief_id=brief.id),
+                'framework': url_for('main.get_framework', framework_slug=brief.framework.slug),
+            },
+            ('framework',),
+        ),
+        'users': SerializedField(lambda brief: brief._serialize_users(), ('users',)),
+        'clarificationQuestions': SerializedField(
+            lambda brief: [question.serialize() for question in brief.clarification_questions],
+            ('clarification_questions',),
+        ),
+    }
+
     @validates('users')
     def validates_users(self, key, user):
         if user.role != 'buyer':
@@ -1706,14 +1962,28 @@ class Brief(db.Model):
 
     def _build_date_and_length_data(self):
         published_day = self.published_at.replace(hour=23, minute=59, second=59, microsecond=0)
-        requirements_length = self.data.get('requirementsLength')
+        requirements_length = loaded_data(self).get('requirementsLength')
 
         return {
             'publishedAt': published_day,
             'requirementsLength': requirements_length
         }
 
-    def serialize(self, with_users=False, with_clarification_questions=False):
+    @cached_serialization(lambda brief: (
+        brief.status,
+        brief.published_at is not None and brief.clarification_questions_are_closed,
+        brief.framework.name,
+        brief.framework.status,
+    ))
+    def serialize(self, with_users=False, with_clarification_questions=False, fields=None):
+        """
+        :param fields: the only top level keys to include, see `app.sparse_fieldsets`. 'users' and
+                       'clarificationQuestions' can be among them, in place of `with_users` and
+                       `with_clarification_questions`.
+        """
+        if fields is not None:
+            return serialize_fields(self, fields)
+
         data = dict(self.data.items())
 
         data.update({
@@ -1779,15 +2049,18 @@ class Brief(db.Model):
         }
 
         if with_users:
-            data['users'] = [
-                drop_foreign_fields(
-                    user.serialize(),
-                    ['locked', 'createdAt', 'updatedAt', 'passwordChangedAt', 'loggedInAt', 'failedLoginCount']
-                ) for user in self.users
-            ]
+            data['users'] = self._serialize_users()
 
         return data
 
+    def _serialize_users(self):
+        return [
+            drop_foreign_fields(
+                user.serialize(),
+                ['locked', 'createdAt', 'updatedAt', 'passwordChangedAt', 'loggedInAt', 'failedLoginCount']
+            ) for user in self.users
+        ]
+
 
 class BriefUser(db.Model):
     __tablename__ = 'brief_users'
@@ -1820,6 +2093,43 @@ class BriefResponse(db.Model):
     brief = db.relationship('Brief', lazy='joined', backref=backref("brief_responses", lazy="select"))
     supplier = db.relationship('Supplier', lazy='joined')
 
+    # the keys of `data` requested of a list endpoint, when loaded `with_fields`
+    projected_data = query_expression()
+
+    SERIALIZED_FIELDS = {
+        'id': SerializedField(lambda brief_response: brief_response.id),
+        'brief': SerializedField(lambda brief_response: brief_response._serialize_brief(), ('brief',)),
+        'briefId': SerializedField(lambda brief_response: brief_response.brief_id),
+        'supplierId': SerializedField(lambda brief_response: brief_response.supplier_id),
+        'supplierName': SerializedField(lambda brief_response: brief_response.supplier.name, ('supplier',)),
+        'supplierOrganisationSize': SerializedField(
+            lambda brief_response: brief_response.supplier.organisation_size, ('supplier',),
+        ),
+        'createdAt': SerializedField(lambda brief_response: brief_response.created_at.strftime(DATETIME_FORMAT)),
+        'submittedAt': SerializedField(
+            lambda brief_response: (
+                brief_response.submitted_at and brief_response.submitted_at.strftime(DATETIME_FORMAT)
+            ),
+        ),
+        'status': SerializedField(lambda brief_response: brief_response.status),
+        'links': SerializedField(
+            lambda brief_response: {
+                'self': url_for('main.get_brief_response', brief_response_id=brief_response.id),
+                'brief': url_for('main.get_brief', brief_id=brief_response.brief_id),
+                'supplier': url_for("main.get_supplier", supplier_id=brief_response.supplier_id),
+            },
+        ),
+        'awardDetails': SerializedField(
+            lambda brief_response: {
+                'awarded': brief_response.award_details,
+                'pending-awarded': {'pending': True},
+            }.get(brief_response.status),
+        ),
+        'awardedAt': SerializedField(
+            lambda brief_response: brief_response.awarded_at and brief_response.awarded_at.strftime(DATETIME_FORMAT),
+        ),
+    }
+
     @validates('data')
     def validates_data(self, key, data):
         data = drop_foreign_fields(data, [
@@ -1901,22 +2211,23 @@ class BriefResponse(db.Model):
         if errs:
             raise ValidationError(errs)
 
-    def serialize(self, with_data: bool = True):
+    def serialize(self, with_data: bool = True, fields=None):
         """
             :param with_data: allows serialization to be produced while omitting the majority of the content
             that comes from the `data` field. This tends to constitute the bulk of the volume of the serialized
             result, so this is useful in cases where response size is becoming an issue. the
             `essentialRequirementsMet` key (present in DOS2 BRs onwards)is pragmatically included anyway because it
             is referenced in some important listing views.
+            :param fields: the only top level keys to include, see `app.sparse_fieldsets`. `with_data` is ignored
+            when they are given.
         """
+        if fields is not None:
+            return serialize_fields(self, fields)
+
         data = {k: v for k, v in self.data.items() if with_data or k == "essentialRequirementsMet"}
-        parent_brief = self.brief.serialize()
-        parent_brief_fields = ['id', 'title', 'status', 'applicationsClosedAt', 'framework']
         data.update({
             'id': self.id,
-            'brief': {
-                **{key: parent_brief[key] for key in parent_brief_fields if key in parent_brief},
-            },
+            'brief': self._serialize_brief(),
             'briefId': self.brief_id,
             'supplierId': self.supplier_id,
             'supplierName': self.supplier.name,
@@ -1945,6 +2256,11 @@ class BriefResponse(db.Model):
 
         return purge_nulls_from_data(data)
 
+    def _serialize_brief(self):
+        parent_brief = self.brief.serialize()
+        parent_brief_fields = ['id', 'title', 'status', 'applicationsClosedAt', 'framework']
+        return {key: parent_brief[key] for key in parent_brief_fields if key in parent_brief}
+
 
 class BriefClarificationQuestion(db.Model):
     __tablename__ = 'brief_clarification_questions'
@@ -2028,6 +2344,15 @@ db.Index(
     postgresql_where=AuditEvent.data['draftId'].astext != sql_null()
 )
 
+# Index for the `data-contains` filter's containment (@>) queries on the data blob. jsonb_path_ops indexes only support
+# containment, but are a fraction of the size of the default jsonb_ops.
+db.Index(
+    'idx_audit_events_data_path_ops',
+    AuditEvent.data,
+    postgresql_using='gin',
+    postgresql_ops={'data': 'jsonb_path_ops'},
+)
+
 # DEPRECATED - remove in a migration once service update admin app feature has been updated
 db.Index(
     'idx_audit_events_type_acknowledged',
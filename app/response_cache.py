@@ -0,0 +1,259 @@
+"""
+A response cache for read-mostly endpoints, invalidated by per-table generation counters rather than expiry times.
+
+Every write to a tracked table appends a bump to that table's rows in `table_generations` (a statement-level trigger
+installed by migration 1460 does this, so ORM, core and hand-written SQL writes are all covered), and a table's
+generation is the sum of its bumps. A cached view declares the tables its response is built from, and the current
+generation of each of them is part of its cache key, so a write makes exactly the entries that depend on the written
+table unreachable. Bumps only count once the write commits, and generations are read before the view runs, so an entry
+can only ever be stored under generations at least as old as the data it was built from.
+Some generations only count writes to some of a table's columns, like `service_statuses` (see migration 1490), and the
+`users` generation ignores logins.
+
+Backends are chosen with `DM_API_RESPONSE_CACHE_BACKEND`: `lru` keeps entries in process, `filesystem` shares them
+between the processes on an instance through `DM_API_RESPONSE_CACHE_DIR`, and None disables caching.
+
+Large responses downloaded repeatedly, like the framework exports, are instead kept gzipped on disk in
+`DM_API_EXPORT_CACHE_DIR` under the same kind of key, and sent from there without being read back into the process.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, make_response, request, send_file
+import sqlalchemy as sa
+
+from . import db
+
+RESPONSE_CACHE_EXTENSION = 'dm_response_cache'
+
+# Not part of the models' metadata: the table is only written by the generation triggers and only read here
+table_generations = sa.Table(
+    'table_generations',
+    sa.MetaData(),
+    sa.Column('id', sa.BigInteger, primary_key=True),
+    sa.Column('table_name', sa.String, nullable=False),
+    sa.Column('bumps', sa.BigInteger, nullable=False),
+)
+
+
+class LRUResponseCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class FileSystemResponseCache:
+    def __init__(self, directory, max_entries):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, entry):
+        # write then rename, so other processes never read a partly written entry
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            current_app.logger.warning("Failed to write response cache entry {}".format(key))
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self._prune()
+
+    def _prune(self):
+        """Entries for old generations are never read again, so drop the least recently written ones"""
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if not entry.name.startswith('.')]
+            if len(entries) <= self.max_entries:
+                return
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[:len(entries) - self.max_entries]:
+                os.remove(entry.path)
+        except OSError:
+            # another process got there first
+            pass
+
+
+def get_response_cache():
+    """The current app's response cache, created from its config on first use, or None if caching is disabled"""
+    extensions = current_app.extensions
+    if RESPONSE_CACHE_EXTENSION not in extensions:
+        backend = current_app.config['DM_API_RESPONSE_CACHE_BACKEND']
+        max_entries = current_app.config['DM_API_RESPONSE_CACHE_MAX_ENTRIES']
+        if backend is None:
+            extensions[RESPONSE_CACHE_EXTENSION] = None
+        elif backend == 'lru':
+            extensions[RESPONSE_CACHE_EXTENSION] = LRUResponseCache(max_entries)
+        elif backend == 'filesystem':
+            extensions[RESPONSE_CACHE_EXTENSION] = FileSystemResponseCache(
+                current_app.config['DM_API_RESPONSE_CACHE_DIR'] or os.path.join(
+                    tempfile.gettempdir(), 'dm-api-response-cache'
+                ),
+                max_entries,
+            )
+        else:
+            raise ValueError("Unknown DM_API_RESPONSE_CACHE_BACKEND '{}'".format(backend))
+
+    return extensions[RESPONSE_CACHE_EXTENSION]
+
+
+def get_table_generations(table_names):
+    """
+    :return: the current generation of each of `table_names`, in the same order, or None if any of them isn't tracked
+    """
+    generations = dict(db.session.execute(
+        sa.select([
+            table_generations.c.table_name, sa.cast(sa.func.sum(table_generations.c.bumps), sa.BigInteger),
+        ]).where(
+            table_generations.c.table_name.in_(table_names)
+        ).group_by(
+            table_generations.c.table_name
+        )
+    ).fetchall())
+
+    if len(generations) < len(table_names):
+        return None
+    return [generations[table_name] for table_name in table_names]
+
+
+def cached_response(*table_names, vary_on=None):
+    """Return a Flask view decorator caching the view's successful responses until one of `table_names` is written to
+
+    `vary_on` is an optional callable returning anything else (json serializable) the response depends on, e.g. the
+    current time for views comparing against it.
+
+    Usage::
+        @main.route("/thingies", methods=["GET"])
+        @cached_response("thingies", "thingy_lots")
+        def list_thingies():
+            ...
+    """
+    def decorator(view):
+        @wraps(view)
+        def view_wrapper(*args, **kwargs):
+            cache = get_response_cache()
+            generations = get_table_generations(table_names) if cache is not None else None
+            if generations is None:
+                return view(*args, **kwargs)
+
+            key = hashlib.sha1(json.dumps([
+                request.url,
+                generations,
+                vary_on() if vary_on else None,
+            ], default=str).encode('utf-8')).hexdigest()
+
+            entry = cache.get(key)
+            if entry is not None:
+                response = current_app.response_class(
+                    entry['body'], status=entry['status'], headers=entry['headers'],
+                )
+                return response.make_conditional(request)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                cache.set(key, {
+                    'body': response.get_data(as_text=True),
+                    'status': response.status_code,
+                    'headers': list(response.headers.items()),
+                })
+            return response
+        return view_wrapper
+    return decorator
+
+
+def _write_export(directory, url_key, path, body):
+    """Write `body` gzipped to `path`, then remove the files holding older versions of the same export"""
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.')
+    try:
+        with gzip.open(os.fdopen(fd, 'wb'), 'wb') as f:
+            f.write(body)
+        os.replace(temp_path, path)
+    except OSError:
+        current_app.logger.warning("Failed to write export cache file {}".format(path))
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return
+
+    for entry in os.scandir(directory):
+        if entry.name.startswith(url_key) and entry.path != path:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                # another process got there first
+                pass
+
+
+def cached_export(*table_names):
+    """Return a Flask view decorator keeping the view's successful responses gzipped on disk until one of
+    `table_names` is written to, and sending them from there while nothing has changed
+
+    Clients not accepting gzip get the decompressed body. Does nothing unless `DM_API_EXPORT_CACHE_DIR` is set.
+    """
+    def decorator(view):
+        @wraps(view)
+        def view_wrapper(*args, **kwargs):
+            directory = current_app.config['DM_API_EXPORT_CACHE_DIR']
+            generations = get_table_generations(table_names) if directory else None
+            if generations is None:
+                return view(*args, **kwargs)
+
+            url_key = hashlib.sha1(request.url.encode('utf-8')).hexdigest()
+            path = os.path.join(directory, '{}-{}.json.gz'.format(
+                url_key, hashlib.sha1(json.dumps(generations).encode('utf-8')).hexdigest(),
+            ))
+
+            try:
+                if 'gzip' in request.accept_encodings:
+                    response = send_file(path, mimetype='application/json', conditional=True, cache_timeout=0)
+                    response.headers['Content-Encoding'] = 'gzip'
+                    # exports are for admins only, and send_file marks everything public
+                    response.cache_control.public = False
+                else:
+                    with gzip.open(path, 'rb') as f:
+                        response = current_app.response_class(f.read(), mimetype='application/json')
+                response.vary.add('Accept-Encoding')
+                return response
+            except OSError:
+                # not built yet for these generations (or removed by a newer version of the export since)
+                pass
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                os.makedirs(directory, exist_ok=True)
+                _write_export(directory, url_key, path, response.get_data())
+            return response
+        return view_wrapper
+    return decorator
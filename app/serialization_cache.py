@@ -0,0 +1,121 @@
+"""
+A per-process cache of the serializations of rarely changing model instances, like services and briefs.
+
+An instance's serialization is cached under its class, primary key and `updated_at`, and under whatever else it
+serializes that can change without its `updated_at` changing: the current values of its framework's fields, its
+supplier's name, or for briefs the status that passes with time. Any ORM write to the row moves `updated_at` on, so
+a serialization is never read back once it might be stale; writes made with hand-written SQL that leave `updated_at`
+alone aren't noticed. Instances with unflushed changes, and calls with arguments, aren't cached.
+
+The cache is limited to `DM_API_SERIALIZATION_CACHE_MAX_BYTES` of (JSON encoded) serializations, evicting the least
+recently used, and is disabled when that is 0. Hits and misses are counted by model in the
+`dm_api_serialization_cache_requests_total` metric.
+"""
+import json
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, has_app_context, has_request_context, request
+# gds_metrics' proxy of prometheus_client's Counter, so the multiprocess metrics directory is set before
+# prometheus_client is first imported - this module is imported with the models, before the app is created
+from gds_metrics.metrics import Counter
+from sqlalchemy import inspect
+
+SERIALIZATION_CACHE_EXTENSION = 'dm_serialization_cache'
+
+serialization_cache_requests = Counter(
+    'dm_api_serialization_cache_requests_total',
+    'Serializations looked up in the serialization cache',
+    ['model', 'result'],
+)
+
+
+class LRUSerializationCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, serialization):
+        size = len(json.dumps(serialization, default=str))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous_entry = self._entries.pop(key, None)
+            if previous_entry is not None:
+                self.bytes -= previous_entry[1]
+            self._entries[key] = (serialization, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self.bytes -= self._entries.popitem(last=False)[1][1]
+
+
+def get_serialization_cache():
+    """The current app's serialization cache, created from its config on first use, or None if caching is disabled"""
+    extensions = current_app.extensions
+    if SERIALIZATION_CACHE_EXTENSION not in extensions:
+        max_bytes = current_app.config['DM_API_SERIALIZATION_CACHE_MAX_BYTES']
+        extensions[SERIALIZATION_CACHE_EXTENSION] = LRUSerializationCache(max_bytes) if max_bytes else None
+
+    return extensions[SERIALIZATION_CACHE_EXTENSION]
+
+
+def cached_serialization(get_version):
+    """Return a decorator caching the serializations made by a model's `serialize` method
+
+    `get_version` is a callable returning a tuple of whatever else the serialization of the instance it is passed
+    depends on, besides the instance's own row.
+
+    Usage::
+        class Thingy(db.Model):
+            @cached_serialization(lambda thingy: (thingy.framework.status,))
+            def serialize(self):
+                ...
+    """
+    def decorator(serialize):
+        @wraps(serialize)
+        def serialize_wrapper(self, *args, **kwargs):
+            cache = get_serialization_cache() if has_app_context() and not (args or kwargs) else None
+            state = inspect(self)
+            if cache is None or not state.persistent or state.modified:
+                return serialize(self, *args, **kwargs)
+
+            model_name = type(self).__name__
+            key = (
+                model_name,
+                state.identity,
+                self.updated_at,
+                # links are absolute
+                request.url_root if has_request_context() else None,
+            ) + get_version(self)
+
+            serialization = cache.get(key)
+            serialization_cache_requests.labels(
+                model=model_name, result='miss' if serialization is None else 'hit',
+            ).inc()
+            if serialization is None:
+                serialization = serialize(self)
+                cache.set(key, serialization)
+
+            # callers add to the serialization and its links, so they mustn't be handed the cached dicts
+            serialization = dict(serialization)
+            if serialization.get('links') is not None:
+                serialization['links'] = dict(serialization['links'])
+            return serialization
+        return serialize_wrapper
+    return decorator
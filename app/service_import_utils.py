@@ -0,0 +1,237 @@
+"""
+Bulk import of services with existing IDs, the set-based counterpart of the `import_service` view.
+
+Lines are parsed and checked against reference data in the request process, validated against the services' JSON
+schemas in a pool of worker processes (started with the first import and kept for those after) and then loaded a
+chunk at a time - each chunk in its own transaction - with postgres COPY for the services, their archives and their
+audit events.
+"""
+import json
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from dmapiclient.audit import AuditTypes
+from flask import current_app
+from sqlalchemy import desc
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import db
+from .models import ArchivedService, AuditEvent, Framework, Service, ServiceTableMixin, Supplier
+from .service_utils import get_service_validator_name, index_service
+from .utils import allocate_sequence_values, copy_rows
+from .validation import get_validation_errors, is_valid_service_id
+
+SERVICE_COLUMNS = (
+    'id', 'service_id', 'supplier_id', 'framework_id', 'lot_id', 'created_at', 'updated_at', 'data', 'status',
+)
+AUDIT_EVENT_COLUMNS = ('type', 'created_at', 'user', 'data', 'object_type', 'object_id', 'acknowledged')
+
+VALIDATION_EXECUTOR_EXTENSION = 'dm_service_import_validation_executor'
+
+
+def get_import_validation_errors(validator_name_and_data):
+    """Runs in the validation worker processes, so must stay a picklable module-level function"""
+    validator_name, data = validator_name_and_data
+    return get_validation_errors(validator_name, data)
+
+
+def get_validation_map():
+    """`map`, or a map over the current app's pool of validation worker processes, started on first use"""
+    workers = current_app.config['DM_API_SERVICE_IMPORT_WORKERS']
+    if workers <= 1:
+        return map
+
+    extensions = current_app.extensions
+    if VALIDATION_EXECUTOR_EXTENSION not in extensions:
+        extensions[VALIDATION_EXECUTOR_EXTENSION] = ProcessPoolExecutor(max_workers=workers)
+    executor = extensions[VALIDATION_EXECUTOR_EXTENSION]
+    return lambda fn, items: executor.map(fn, items, chunksize=50)
+
+
+def import_services(lines, updated_by):
+    """
+    Import services from an iterable of JSON lines, each in the same format as the `services` payload accepted by
+    `import_service`.
+
+    :return: a list with one result dict per non-blank line, in line order
+    """
+    frameworks = {framework.slug: framework for framework in Framework.query.all()}
+    chunk_size = current_app.config['DM_API_SERVICE_IMPORT_CHUNK_SIZE']
+    # service ids accepted from earlier lines of this import
+    seen_service_ids = set()
+
+    results = []
+    validate_map = get_validation_map()
+    chunk = []
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        chunk.append((line_number, line))
+        if len(chunk) >= chunk_size:
+            results.extend(_import_chunk(chunk, frameworks, seen_service_ids, updated_by, validate_map))
+            chunk = []
+    if chunk:
+        results.extend(_import_chunk(chunk, frameworks, seen_service_ids, updated_by, validate_map))
+
+    return results
+
+
+def _parse_line(line):
+    try:
+        service_json = json.loads(line)
+    except ValueError:
+        return None, "Invalid JSON"
+
+    if not isinstance(service_json, dict):
+        return None, "Invalid JSON; must be a valid JSON object"
+
+    missing_keys = {'id', 'frameworkSlug', 'lot', 'supplierId'} - set(service_json.keys())
+    if missing_keys:
+        return None, "Invalid JSON must have '{}' keys".format("', '".join(sorted(missing_keys)))
+
+    service_json['id'] = str(service_json['id'])
+    if not is_valid_service_id(service_json['id']):
+        return None, "Invalid service ID supplied: {}".format(service_json['id'])
+
+    try:
+        service_json['supplierId'] = int(service_json['supplierId'])
+    except (TypeError, ValueError):
+        return None, "Invalid supplier ID '{}'".format(service_json['supplierId'])
+
+    if service_json.get('status', 'published') not in Service.STATUSES:
+        return None, "Invalid status value '{}'".format(service_json['status'])
+
+    return service_json, None
+
+
+def _import_chunk(chunk, frameworks, seen_service_ids, updated_by, validate_map):
+    results = {}
+    candidates = []
+    for line_number, line in chunk:
+        service_json, error = _parse_line(line)
+        if error:
+            results[line_number] = {'line': line_number, 'error': error}
+        else:
+            candidates.append((line_number, service_json))
+
+    supplier_names = dict(db.session.query(Supplier.supplier_id, Supplier.name).filter(
+        Supplier.supplier_id.in_({service_json['supplierId'] for _, service_json in candidates})
+    ))
+    existing_service_ids = {service_id for (service_id,) in db.session.query(Service.service_id).filter(
+        Service.service_id.in_({service_json['id'] for _, service_json in candidates})
+    )}
+
+    to_validate = []
+    for line_number, service_json in candidates:
+        result = results[line_number] = {'line': line_number, 'id': service_json['id']}
+
+        framework = frameworks.get(service_json['frameworkSlug'])
+        lot = framework and framework.get_lot(service_json['lot'])
+        if not framework:
+            result['error'] = "Framework '{}' does not exist".format(service_json['frameworkSlug'])
+        elif not lot:
+            result['error'] = "Incorrect lot '{}' for framework '{}'".format(service_json['lot'], framework.slug)
+        elif service_json['supplierId'] not in supplier_names:
+            result['error'] = "Invalid supplier ID '{}'".format(service_json['supplierId'])
+        elif service_json['id'] in existing_service_ids or service_json['id'] in seen_service_ids:
+            result['error'] = "Cannot update service by PUT"
+        else:
+            seen_service_ids.add(service_json['id'])
+            to_validate.append((line_number, service_json, framework, lot, ServiceTableMixin.clean_data(service_json)))
+
+    # copiedFromServiceId isn't in the schemas, and is left out of validation as `get_service_validation_errors` does
+    validation_errors = validate_map(get_import_validation_errors, [
+        (
+            get_service_validator_name(framework.slug, lot.slug),
+            {key: value for key, value in data.items() if key != 'copiedFromServiceId'},
+        )
+        for _, _, framework, lot, data in to_validate
+    ])
+
+    to_load = []
+    for (line_number, service_json, framework, lot, data), errors in zip(to_validate, validation_errors):
+        if errors:
+            results[line_number]['error'] = errors
+            seen_service_ids.discard(service_json['id'])
+        else:
+            to_load.append((line_number, service_json, framework, lot, data))
+
+    if to_load:
+        try:
+            service_pks = _load_services(to_load, supplier_names, updated_by)
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            current_app.logger.warning("Service import chunk failed: {}".format(e))
+            for line_number, service_json, _, _, _ in to_load:
+                results[line_number]['error'] = format(e)
+                seen_service_ids.discard(service_json['id'])
+        else:
+            for line_number, _, _, _, _ in to_load:
+                results[line_number]['created'] = True
+            for service in Service.query.filter(Service.id.in_(service_pks)):
+                index_service(service, wait_for_response=False)
+
+    return [results[line_number] for line_number, _ in chunk]
+
+
+def _load_services(to_load, supplier_names, updated_by):
+    now = datetime.utcnow()
+    service_ids = [service_json['id'] for _, service_json, _, _, _ in to_load]
+
+    service_pks = allocate_sequence_values('services_id_seq', len(to_load))
+    archived_service_pks = allocate_sequence_values('archived_services_id_seq', len(to_load))
+
+    last_archive_ids = dict(db.session.query(
+        ArchivedService.service_id, ArchivedService.id
+    ).filter(
+        ArchivedService.service_id.in_(service_ids)
+    ).order_by(
+        ArchivedService.service_id, desc(ArchivedService.id)
+    ).distinct(
+        ArchivedService.service_id
+    ))
+
+    service_rows = [
+        (
+            service_json['id'],
+            service_json['supplierId'],
+            framework.id,
+            lot.id,
+            service_json.get('createdAt') or now,
+            service_json.get('updatedAt') or now,
+            json.dumps(data),
+            service_json.get('status', 'published'),
+        )
+        for _, service_json, framework, lot, data in to_load
+    ]
+
+    copy_rows(Service.__table__, SERVICE_COLUMNS, (
+        (service_pk,) + row for service_pk, row in zip(service_pks, service_rows)
+    ))
+    copy_rows(ArchivedService.__table__, SERVICE_COLUMNS, (
+        (archived_service_pk,) + row for archived_service_pk, row in zip(archived_service_pks, service_rows)
+    ))
+    copy_rows(AuditEvent.__table__, AUDIT_EVENT_COLUMNS, (
+        (
+            AuditTypes.import_service.value,
+            now,
+            updated_by,
+            json.dumps({
+                'serviceId': service_json['id'],
+                'oldArchivedServiceId': last_archive_ids.get(service_json['id']),
+                'newArchivedServiceId': archived_service_pk,
+                'supplierName': supplier_names[service_json['supplierId']],
+                'supplierId': service_json['supplierId'],
+            }),
+            Service.__name__,
+            service_pk,
+            False,
+        )
+        for (_, service_json, _, _, _), service_pk, archived_service_pk in zip(
+            to_load, service_pks, archived_service_pks
+        )
+    ))
+
+    db.session.commit()
+
+    return service_pks
@@ -1,7 +1,9 @@
 from flask import current_app, abort
+from sqlalchemy import desc
 from sqlalchemy.exc import IntegrityError, DataError
+from sqlalchemy.sql.expression import select as sql_select
 
-from .utils import get_json_from_request, index_object, json_has_matching_id, json_has_required_keys
+from .utils import get_json_from_request, index_object, json_diff, json_has_matching_id, json_has_required_keys
 from .validation import get_validation_errors
 from . import search_api_client, dmapiclient
 from . import db
@@ -69,10 +71,14 @@ def update_and_validate_service(service, service_payload):
 
 
 def _get_validator_name(service):
-    if service.framework.slug in ['g-cloud-4', 'g-cloud-5']:
-        return 'services-{}'.format(service.framework.slug)
+    return get_service_validator_name(service.framework.slug, service.lot.slug)
+
+
+def get_service_validator_name(framework_slug, lot_slug):
+    if framework_slug in ['g-cloud-4', 'g-cloud-5']:
+        return 'services-{}'.format(framework_slug)
     else:
-        return 'services-{}-{}'.format(service.framework.slug, service.lot.slug)
+        return 'services-{}-{}'.format(framework_slug, lot_slug)
 
 
 def validate_service_data(service, enforce_required=True, required_fields=None):
@@ -97,14 +103,29 @@ def get_service_validation_errors(service, enforce_required=True, required_field
     )
 
 
+def get_archived_service_diff(from_archived_service, to_archived_service):
+    """The changes to a service's data from one of its ArchivedServices (None for none) to another"""
+    return {
+        'serviceId': to_archived_service.service_id,
+        'fromArchivedServiceId': from_archived_service.id if from_archived_service else None,
+        'toArchivedServiceId': to_archived_service.id,
+        'changes': json_diff(
+            from_archived_service.data if from_archived_service else {},
+            to_archived_service.data,
+            # archives stored against the same snapshot can only differ in the keys in their deltas
+            keys=to_archived_service.get_keys_differing_from(from_archived_service) if from_archived_service else None,
+        ),
+    }
+
+
 def commit_and_archive_service(updated_service, update_details,
                                audit_type, audit_data=None):
-    service_to_archive = ArchivedService.from_service(updated_service)
-
     last_archive = ArchivedService.query.filter(
         ArchivedService.service_id == updated_service.service_id
     ).order_by(ArchivedService.id.desc()).first()
 
+    service_to_archive = ArchivedService.from_service(updated_service, last_archive)
+
     last_archive = last_archive.id if last_archive else None
 
     if audit_data is None:
@@ -150,6 +171,87 @@ def commit_and_archive_service(updated_service, update_details,
         abort(400, format(e))
 
 
+def commit_and_archive_service_statuses(services, status, update_details):
+    """
+    Set the status of many services at once, archiving and auditing each of them as `commit_and_archive_service` would
+    but using a fixed number of set-based statements rather than a few per service. `services` should already have
+    been loaded (and locked) by the caller.
+
+    :return: dict of each service's previous status, keyed on service_id
+    """
+    prior_statuses = {service.service_id: service.status for service in services}
+    if not services:
+        return prior_statuses
+
+    service_pks = [service.id for service in services]
+
+    last_archive_ids = dict(db.session.query(
+        ArchivedService.service_id, ArchivedService.id
+    ).filter(
+        ArchivedService.service_id.in_(prior_statuses.keys())
+    ).order_by(
+        ArchivedService.service_id, desc(ArchivedService.id)
+    ).distinct(
+        ArchivedService.service_id
+    ))
+
+    db.session.execute(Service.__table__.update().where(
+        Service.id.in_(service_pks)
+    ).values(
+        status=status,
+    ))
+
+    archived_columns = (
+        'service_id', 'supplier_id', 'framework_id', 'lot_id', 'created_at', 'updated_at', 'data', 'status',
+    )
+    new_archive_ids = {
+        service_id: archived_service_id
+        for (archived_service_id, service_id) in db.session.execute(ArchivedService.__table__.insert().from_select(
+            archived_columns,
+            sql_select([Service.__table__.c[column] for column in archived_columns]).where(Service.id.in_(service_pks)),
+        ).returning(
+            ArchivedService.id, ArchivedService.service_id
+        ))
+    }
+
+    AuditEvent.bulk_insert(
+        AuditTypes.update_service_status,
+        update_details['updated_by'],
+        Service,
+        (
+            (service.id, {
+                'old_status': prior_statuses[service.service_id],
+                'new_status': status,
+                'serviceId': service.service_id,
+                'oldArchivedServiceId': last_archive_ids.get(service.service_id),
+                'newArchivedServiceId': new_archive_ids[service.service_id],
+                'supplierName': service.supplier.name,
+                'supplierId': service.supplier.supplier_id,
+            }) for service in services
+        ),
+    )
+
+    try:
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        abort(400, format(e))
+
+    return prior_statuses
+
+
+def update_index_for_service_status_change(service, prior_status, wait_for_response: bool = True):
+    if prior_status == service.status:
+        return
+
+    if prior_status == 'published':
+        # If it's being unpublished, delete it from the search api.
+        delete_service_from_index(service, wait_for_response=wait_for_response)
+    else:
+        # If it's being published, index in the search api.
+        index_service(service, wait_for_response=wait_for_response)
+
+
 def index_service(service, wait_for_response: bool = True):
     if (
         service.framework.status == 'live' and
@@ -0,0 +1,74 @@
+"""
+Sparse fieldsets: serializing only the top level keys of listed objects requested with `?fields=`.
+
+A model supporting them has a `SERIALIZED_FIELDS` dict of the keys its `serialize` makes from anything but its `data`,
+saying which relationships and `data` keys each needs; every other key requested is taken from `data`. `with_fields`
+has Postgres build just those `data` keys into the model's `projected_data` query expression, so `data` itself is
+never fetched (or decoded), and loads no relationships but the ones the requested keys need.
+"""
+from itertools import chain
+
+from sqlalchemy import func, inspect
+from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy.orm import defer, joinedload, lazyload, selectinload, with_expression
+
+
+class SerializedField:
+    """A top level key of a model's serialization that isn't taken from its `data`"""
+
+    def __init__(self, serialize, relationships=(), data_keys=()):
+        """
+        :param serialize: returns the key's value for an instance of the model, or None to leave the key out
+        :param relationships: the names of the model's relationships `serialize` uses
+        :param data_keys: the keys of the instance's `data` `serialize` uses
+        """
+        self.serialize = serialize
+        self.relationships = relationships
+        self.data_keys = data_keys
+
+
+def with_fields(query, model, fields):
+    """`query` for instances of `model` loading only what serializing `fields` of them needs"""
+    serialized_fields = [model.SERIALIZED_FIELDS[field] for field in fields if field in model.SERIALIZED_FIELDS]
+    data_keys = dict.fromkeys(chain(
+        (field for field in fields if field not in model.SERIALIZED_FIELDS),
+        chain.from_iterable(serialized_field.data_keys for serialized_field in serialized_fields),
+    ))
+    relationships = dict.fromkeys(chain.from_iterable(
+        serialized_field.relationships for serialized_field in serialized_fields
+    ))
+
+    return query.options(
+        defer(model.data),
+        with_expression(model.projected_data, func.json_build_object(
+            *chain.from_iterable((key, model.data[key]) for key in data_keys),
+            type_=JSON,
+        )),
+        lazyload('*'),
+        *(
+            # a collection joined to each row would repeat the row for each of its members
+            (selectinload if getattr(model, name).property.uselist else joinedload)(getattr(model, name))
+            for name in relationships
+        )
+    )
+
+
+def loaded_data(instance):
+    """`instance.data`, or the keys of it projected by `with_fields` if that was all that was loaded"""
+    state = inspect(instance)
+    if 'data' in state.unloaded and state.dict.get('projected_data') is not None:
+        return state.dict['projected_data']
+    return instance.data
+
+
+def serialize_fields(instance, fields):
+    """The `fields` of `instance`'s serialization, leaving out any it doesn't have"""
+    data = loaded_data(instance)
+    serialization = {}
+    for field in fields:
+        serialized_field = instance.SERIALIZED_FIELDS.get(field)
+        value = serialized_field.serialize(instance) if serialized_field else data.get(field)
+        # as null top level keys of `data` are dropped before they are stored
+        if value is not None:
+            serialization[field] = value
+    return serialization
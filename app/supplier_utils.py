@@ -1,13 +1,20 @@
 import inspect
+import json
 from typing import Union
 
 from flask import abort, current_app
-from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import lazyload
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import lazyload, selectinload
 
 from dmapiclient.audit import AuditTypes
+from dmutils.errors.api import ValidationError
 
-from .validation import validate_supplier_json_or_400, validate_new_supplier_json_or_400, get_validation_errors
+from .validation import (
+    get_supplier_json_error,
+    get_validation_errors,
+    validate_new_supplier_json_or_400,
+    validate_supplier_json_or_400,
+)
 from .utils import get_json_from_request, json_has_matching_id, json_has_required_keys, drop_foreign_fields
 from .models.main import AuditEvent, Supplier, SupplierFramework, Framework
 from . import supplier_constants
@@ -49,18 +56,26 @@ def check_supplier_role(role, supplier_id):
         abort(400, "'supplierId' is only valid for users with 'supplier' role, not '{}'".format(role))
 
 
-def company_details_confirmed_if_required_for_framework(framework_slug, supplier_framework):
-    return (
-        supplier_framework.supplier.company_details_confirmed
-        if framework_slug == 'g-cloud-10' else
-        supplier_framework.application_company_details_confirmed
+def update_open_declarations_with_company_details(db, supplier_id, updater_json, specific_framework_slug=None):
+    """Expected to be called within a view"""
+    update_open_declarations_with_suppliers_company_details(
+        db,
+        [supplier_id],
+        updater_json,
+        calling_function=inspect.stack()[1].function,
+        specific_framework_slug=specific_framework_slug,
     )
 
 
-def update_open_declarations_with_company_details(db, supplier_id, updater_json, specific_framework_slug=None):
-    """Expected to be called within a view"""
+def update_open_declarations_with_suppliers_company_details(
+    db, supplier_ids, updater_json, calling_function, specific_framework_slug=None
+):
+    """
+    Refresh the company details in the open framework declarations of several suppliers at once, fetching all of
+    the affected declarations in a single query. Expected to be called within a view.
+    """
     open_supplier_frameworks_query = SupplierFramework.query.filter(
-        SupplierFramework.supplier_id == supplier_id,
+        SupplierFramework.supplier_id.in_(supplier_ids),
         SupplierFramework.framework.has(Framework.status == 'open'),
     )
 
@@ -74,7 +89,11 @@ def update_open_declarations_with_company_details(db, supplier_id, updater_json,
     try:
         # This query invokes an autoflush. If there is something wrong with an object which has been staged for commit,
         # such as a supplier with a bad update, this kicks an Integrity error which we need to catch and handle.
-        open_supplier_frameworks = open_supplier_frameworks_query.options(lazyload('*')).with_for_update().all()
+        open_supplier_frameworks = open_supplier_frameworks_query.options(
+            lazyload('*')
+        ).order_by(
+            SupplierFramework.supplier_id, SupplierFramework.framework_id
+        ).with_for_update().all()
     except IntegrityError as e:
         db.session.rollback()
         abort(400, format(e))
@@ -82,12 +101,16 @@ def update_open_declarations_with_company_details(db, supplier_id, updater_json,
     if not open_supplier_frameworks:
         return
 
-    supplier = Supplier.query.filter(
-        Supplier.supplier_id == supplier_id
-    ).first_or_404()
+    suppliers = {
+        supplier.supplier_id: supplier
+        for supplier in Supplier.query.filter(
+            Supplier.supplier_id.in_({sf.supplier_id for sf in open_supplier_frameworks})
+        ).options(selectinload(Supplier.contact_information))
+    }
 
     # Update the open framework application(s) with latest company details.
     for open_supplier_framework in open_supplier_frameworks:
+        supplier = suppliers[open_supplier_framework.supplier_id]
         company_details = {
             supplier_constants.KEY_TRADING_NAME: supplier.name,
             supplier_constants.KEY_REGISTERED_NAME: supplier.registered_name,
@@ -112,7 +135,6 @@ def update_open_declarations_with_company_details(db, supplier_id, updater_json,
 
         db.session.add(open_supplier_framework)
 
-        calling_function = inspect.stack()[1].function
         db.session.add(
             AuditEvent(
                 audit_type=AuditTypes.answer_selection_questions,
@@ -126,6 +148,130 @@ def update_open_declarations_with_company_details(db, supplier_id, updater_json,
         )
 
 
+def update_suppliers_from_lines(db, lines, updater_json):
+    """
+    Apply partial supplier updates from an iterable of JSON lines, each the `suppliers` payload accepted by
+    `update_supplier` plus the supplier's `id`. Lines are applied in chunks, each committed on its own, with the
+    open declarations of each chunk's suppliers refreshed together. Expected to be called within a view.
+
+    :return: a list with one result dict per non-blank line, in line order
+    """
+    chunk_size = current_app.config['DM_API_SUPPLIER_UPDATE_CHUNK_SIZE']
+
+    results = []
+    chunk = []
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        chunk.append((line_number, line))
+        if len(chunk) >= chunk_size:
+            results.extend(_update_suppliers_chunk(db, chunk, updater_json))
+            chunk = []
+    if chunk:
+        results.extend(_update_suppliers_chunk(db, chunk, updater_json))
+
+    return results
+
+
+def _parse_supplier_update_line(line):
+    try:
+        update = json.loads(line)
+    except ValueError:
+        return None, "Invalid JSON"
+
+    if not isinstance(update, dict):
+        return None, "Invalid JSON; must be a valid JSON object"
+    if 'id' not in update:
+        return None, "Invalid JSON must have 'id' keys"
+
+    try:
+        update['id'] = int(update['id'])
+    except (TypeError, ValueError):
+        return None, "Invalid supplier ID '{}'".format(update['id'])
+
+    return update, None
+
+
+def _update_suppliers_chunk(db, chunk, updater_json):
+    results = {}
+    updates = []
+    for line_number, line in chunk:
+        update, error = _parse_supplier_update_line(line)
+        if error:
+            results[line_number] = {'line': line_number, 'error': error}
+        else:
+            results[line_number] = {'line': line_number, 'id': update['id']}
+            updates.append((line_number, update))
+
+    suppliers = {
+        supplier.supplier_id: supplier
+        for supplier in Supplier.query.filter(
+            Supplier.supplier_id.in_({update['id'] for _, update in updates})
+        ).options(selectinload(Supplier.contact_information))
+    }
+
+    audit_data = []
+    for line_number, update in updates:
+        supplier = suppliers.get(update['id'])
+        if supplier is None:
+            results[line_number]['error'] = "Supplier not found"
+            continue
+
+        supplier_data = supplier.serialize()
+        supplier_data.update(update)
+        supplier_data = drop_foreign_fields(supplier_data, ['links', 'contactInformation'])
+
+        error = get_supplier_json_error(supplier_data)
+        if error:
+            results[line_number]['error'] = error
+            continue
+
+        # a savepoint per line, so a line the model rejects doesn't leave its supplier half updated
+        savepoint = db.session.begin_nested()
+        try:
+            supplier.update_from_json(supplier_data)
+            db.session.flush()
+        except (ValidationError, IntegrityError, DataError) as e:
+            savepoint.rollback()
+            results[line_number]['error'] = format(e)
+            continue
+        savepoint.commit()
+
+        audit_data.append((line_number, supplier, {key: value for key, value in update.items() if key != 'id'}))
+
+    if not audit_data:
+        db.session.rollback()
+        return [results[line_number] for line_number, _ in chunk]
+
+    try:
+        AuditEvent.bulk_insert(
+            AuditTypes.supplier_update,
+            updater_json['updated_by'],
+            Supplier,
+            (
+                (supplier.id, {"update": update, "supplierId": supplier.supplier_id})
+                for _, supplier, update in audit_data
+            ),
+        )
+        update_open_declarations_with_suppliers_company_details(
+            db,
+            sorted({supplier.supplier_id for _, supplier, _ in audit_data}),
+            updater_json,
+            calling_function='update_suppliers',
+        )
+        db.session.commit()
+    except (IntegrityError, DataError) as e:
+        db.session.rollback()
+        current_app.logger.warning("Supplier update chunk failed: {}".format(e))
+        for line_number, _, _ in audit_data:
+            results[line_number]['error'] = format(e)
+    else:
+        for line_number, _, _ in audit_data:
+            results[line_number]['updated'] = True
+
+    return [results[line_number] for line_number, _ in chunk]
+
+
 def is_g12_recovery_supplier(supplier_id: Union[str, int]) -> bool:
     supplier_ids_string = current_app.config.get('DM_G12_RECOVERY_SUPPLIER_IDS') or ''
 
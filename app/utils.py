@@ -1,14 +1,25 @@
+import csv
 import datetime
+import hashlib
+import io
+import json
 import random
 
 from flask import url_for as base_url_for
-from flask import abort, current_app, request, jsonify
+from flask import abort, current_app, request, jsonify, stream_with_context
+from flask import json as flask_json
+from sqlalchemy import func, inspect, literal_column, tuple_
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import Query
+from sqlalchemy.sql.expression import select as sql_select
 from werkzeug.exceptions import BadRequest
+from werkzeug.http import quote_etag
 
 from dmutils.formats import DATE_FORMAT
 
 from .validation import validate_updater_json_or_400
-from . import search_api_client, dmapiclient
+from . import db, search_api_client, dmapiclient
 
 
 def random_positive_external_id() -> int:
@@ -18,6 +29,50 @@ def random_positive_external_id() -> int:
     return random.SystemRandom().randint(10 ** 14, (10 ** 15) - 1)
 
 
+def allocate_sequence_values(sequence_name, count):
+    """
+    Draw `count` values from the postgres sequence `sequence_name` in one round trip, returned in ascending order. Lets
+    set-based inserts assign primary keys up front so the new rows can be referred to (e.g. by audit events) without
+    relying on the order of INSERT ... RETURNING rows.
+    """
+    if not count:
+        return []
+
+    return sorted(value for (value,) in db.session.execute(
+        sql_select([func.nextval(sequence_name)]).select_from(func.generate_series(1, count).alias())
+    ))
+
+
+def copy_rows(table, columns, rows):
+    """
+    Load `rows` (sequences of values in `columns` order) into `table` using postgres' COPY ... FROM STDIN, inside the
+    session's current transaction.
+
+    COPY bypasses SQLAlchemy entirely, so no column defaults or type processing are applied: every non-nullable column
+    without a server-side default must be supplied and values must already be in a form postgres will parse from CSV
+    (e.g. JSON columns as serialized strings). `None` is loaded as NULL.
+
+    Errors are raised wrapped in SQLAlchemy's `DBAPIError` subclasses, as they would be from any other statement.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+
+    statement = 'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(
+        table.name,
+        ", ".join('"{}"'.format(column) for column in columns),
+    )
+    connection = db.session.connection()
+    dbapi = connection.dialect.dbapi
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(statement, buffer)
+    except dbapi.Error as e:
+        raise DBAPIError.instance(statement, None, e, dbapi.Error, dialect=connection.dialect) from e
+    finally:
+        cursor.close()
+
+
 def validate_and_return_updater_request():
     json_payload = get_json_from_request()
 
@@ -59,6 +114,53 @@ def get_int_or_400(data, key):
         abort(400, "Invalid {}: {}".format(key, value))
 
 
+def get_ids_or_400(data, key, type=str):
+    """
+    The comma separated ids in `data[key]`, without duplicates, or None if there are none. Aborts if any aren't valid
+    for `type` or there are more than DM_API_MULTI_GET_MAX_IDS of them.
+    """
+    value = data.get(key)
+
+    if value is None:
+        return value
+
+    try:
+        ids = [type(id_) for id_ in value.split(',')]
+    except ValueError:
+        abort(400, "Invalid {}: {}".format(key, value))
+
+    max_ids = current_app.config['DM_API_MULTI_GET_MAX_IDS']
+    if len(ids) > max_ids:
+        abort(400, "No more than {} {} can be requested at once".format(max_ids, key))
+
+    return list(dict.fromkeys(ids))
+
+
+def get_fields_or_400(data, key='fields'):
+    """
+    The comma separated top level keys requested in `data[key]`, without duplicates and always starting with 'id', or
+    None if none were requested. Aborts if there are more than DM_API_SPARSE_FIELDSETS_MAX_FIELDS of them.
+    """
+    value = data.get(key)
+
+    if value is None:
+        return value
+
+    fields = list(dict.fromkeys(['id'] + [field.strip() for field in value.split(',') if field.strip()]))
+
+    max_fields = current_app.config['DM_API_SPARSE_FIELDSETS_MAX_FIELDS']
+    if len(fields) > max_fields:
+        abort(400, "No more than {} {} can be requested at once".format(max_fields, key))
+
+    return fields
+
+
+def order_by_ids(results, ids, get_id):
+    """`results` sorted into the order of their ids (as returned by `get_id`) in `ids`"""
+    positions = {id_: position for position, id_ in enumerate(ids)}
+    return sorted(results, key=lambda result: positions[get_id(result)])
+
+
 def pagination_links(pagination, endpoint, args):
     links = dict()
     links['self'] = url_for(endpoint, **args)
@@ -84,7 +186,13 @@ def list_result_response(result_name, results_query, serialize_kwargs=None):
     Return a standardised JSON response for a SQLAlchemy result query e.g. a query that will retrieve closed briefs.
     The query should not be executed before being passed in as a argument. Results will be returned in a list and use
     the results `serialize` method for presentation.
+
+    Queries are streamed with `streamed_list_result_response` unless DM_API_LIST_RESPONSE_BATCH_SIZE is None.
     """
+    batch_size = current_app.config['DM_API_LIST_RESPONSE_BATCH_SIZE']
+    if batch_size and isinstance(results_query, Query):
+        return streamed_list_result_response(result_name, results_query, batch_size, serialize_kwargs)
+
     serialized_results = [
         result.serialize(**(serialize_kwargs if serialize_kwargs else {})) for result in results_query
     ]
@@ -92,6 +200,50 @@ def list_result_response(result_name, results_query, serialize_kwargs=None):
     return jsonify(meta=meta, **{result_name: serialized_results})
 
 
+def streamed_list_result_response(result_name, results_query, batch_size, serialize_kwargs=None):
+    """
+    The same response as `list_result_response`'s, but with the results loaded and serialized `batch_size` at a time as
+    it is sent, so only one batch of them is ever held in memory, and the meta (with the total) after them.
+
+    The primary keys of the results are fetched first, in the query's order, and each batch is then loaded by its
+    primary keys with the query itself, so the query's eager loads work as they otherwise would. Each batch is read by
+    a statement of its own, so results deleted (or changed to no longer match the query) since their primary keys were
+    fetched are left out, and the total is of the results actually sent.
+
+    The response's status and headers are sent before any of its results are loaded, so an error while streaming them
+    ends a 200 response with truncated (invalid) JSON rather than turning it into an error response.
+    """
+    primary_key = inspect(results_query.column_descriptions[0]['entity']).primary_key
+    ids = list(dict.fromkeys(tuple(row) for row in results_query.with_entities(*primary_key)))
+    serialize_kwargs = serialize_kwargs or {}
+
+    def get_batch(batch_ids):
+        if len(primary_key) > 1:
+            criterion = tuple_(*primary_key).in_(batch_ids)
+        else:
+            criterion = primary_key[0].in_([id_ for (id_,) in batch_ids])
+        # the session the query was made with is removed at the end of the request, before the response is streamed
+        batch_query = results_query.with_session(db.session()).order_by(None).filter(criterion)
+        return order_by_ids(batch_query, batch_ids, lambda result: inspect(result).identity)
+
+    def generate():
+        yield '{{{}:['.format(json.dumps(result_name))
+        total = 0
+        for start in range(0, len(ids), batch_size):
+            serialized_batch = [
+                flask_json.dumps(result.serialize(**serialize_kwargs), separators=(',', ':'))
+                for result in get_batch(ids[start:start + batch_size])
+            ]
+            if serialized_batch:
+                yield (',' if total else '') + ','.join(serialized_batch)
+                total += len(serialized_batch)
+        yield '],"meta":{}}}'.format(flask_json.dumps(result_meta(total), separators=(',', ':')))
+
+    return current_app.response_class(
+        stream_with_context(generate()), mimetype=current_app.config['JSONIFY_MIMETYPE'],
+    )
+
+
 def paginated_result_response(result_name, results_query, page, per_page, endpoint, request_args, serialize_kwargs={}):
     """
     Return a standardised JSON response for a page of serialized results for a SQLAlchemy result query e.g. the third
@@ -108,6 +260,43 @@ def paginated_result_response(result_name, results_query, page, per_page, endpoi
     return jsonify(meta=meta, links=links, **{result_name: serialized_results})
 
 
+def row_version(table):
+    """
+    Postgres' `xmin` system column for rows of `table`, which changes whenever a row is written. Lets conditional GETs
+    check whether anything a response is built from has changed without loading (or serializing) the objects.
+    """
+    return literal_column("{}.xmin::text".format(table.name))
+
+
+def row_versions(table, order_by, *criteria):
+    """A correlated subquery collecting the `row_version` of each row of `table` matching `criteria`"""
+    return sql_select([
+        func.array_agg(aggregate_order_by(row_version(table), order_by))
+    ]).where(db.and_(*criteria)).as_scalar()
+
+
+def make_etag(*version):
+    return hashlib.sha1(json.dumps(version, default=str).encode('utf-8')).hexdigest()
+
+
+def conditional_response_headers(etag):
+    return {"ETag": quote_etag(etag)}
+
+
+def not_modified_response_or_none(etag):
+    """
+    Returns a `304 Not Modified` response if the request's `If-None-Match` shows the client already has the current
+    representation, otherwise None.
+
+    Responses are built from other rows than the object's own, which have no `updated_at` between them, so no
+    `Last-Modified` is sent and `If-Modified-Since` isn't honoured - the ETag covers everything the response embeds.
+    """
+    if not request.if_none_match or not request.if_none_match.contains(etag):
+        return None
+
+    return "", 304, conditional_response_headers(etag)
+
+
 def get_json_from_request():
     if request.content_type not in ['application/json',
                                     'application/json; charset=UTF-8']:
@@ -208,6 +397,54 @@ def purge_nulls_from_data(data):
     return dict((k, v) for k, v in data.items() if v is not None)
 
 
+def json_object_delta(old, new):
+    """The top level keys of `new` whose values differ from those in `old`, and the keys of `old` missing from `new`"""
+    return {
+        'set': {key: value for key, value in new.items() if key not in old or old[key] != value},
+        'unset': sorted(key for key in old if key not in new),
+    }
+
+
+def apply_json_object_delta(old, delta):
+    """The inverse of `json_object_delta`"""
+    unset = frozenset(delta['unset'])
+    new = {key: value for key, value in old.items() if key not in unset}
+    new.update(delta['set'])
+    return new
+
+
+def json_diff(old, new, keys=None, path=()):
+    """
+    The structural differences between two JSON values, as a list of the values `added`, `removed` or `changed`, each
+    with the `path` of keys and list indices to it. Equal subtrees are skipped as a whole, and `keys` can limit the
+    comparison of two objects to the top level keys known to (possibly) differ.
+    """
+    if keys is None and old == new:
+        return []
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = []
+        for key in sorted(set(old) | set(new) if keys is None else keys):
+            key_path = path + (key,)
+            if key not in new:
+                if key in old:
+                    changes.append({'op': 'removed', 'path': list(key_path), 'from': old[key]})
+            elif key not in old:
+                changes.append({'op': 'added', 'path': list(key_path), 'to': new[key]})
+            else:
+                changes.extend(json_diff(old[key], new[key], path=key_path))
+        return changes
+
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        return [
+            change
+            for index, (old_item, new_item) in enumerate(zip(old, new))
+            for change in json_diff(old_item, new_item, path=path + (index,))
+        ]
+
+    return [{'op': 'changed', 'path': list(path), 'from': old, 'to': new}]
+
+
 def get_request_page_questions():
     json_payload = get_json_from_request()
     return json_payload.get('page_questions', [])
@@ -83,11 +83,17 @@ def validate_user_auth_json_or_400(submitted_json):
         abort(400, "JSON was not a valid format. {}".format(e.message))
 
 
-def validate_supplier_json_or_400(submitted_json):
+def get_supplier_json_error(submitted_json):
     try:
         get_validator('suppliers').validate(submitted_json)
     except ValidationError as e:
-        abort(400, "JSON was not a valid format. {}".format(e.message))
+        return "JSON was not a valid format. {}".format(e.message)
+
+
+def validate_supplier_json_or_400(submitted_json):
+    error = get_supplier_json_error(submitted_json)
+    if error:
+        abort(400, error)
 
 
 def validate_outcome_json_or_400(submitted_json):
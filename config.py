@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dmutils.status import get_version_label
 
 
@@ -27,6 +28,37 @@ class Config:
     DM_API_BUYER_DOMAINS_PAGE_SIZE = 100
     DM_API_PROJECTS_PAGE_SIZE = 100
     DM_API_OUTCOMES_PAGE_SIZE = 100
+    # the most ids that can be asked for at once by `?ids=` on /services and /suppliers
+    DM_API_MULTI_GET_MAX_IDS = 300
+    # the most sub-requests a POST to /batch may make
+    DM_API_BATCH_MAX_REQUESTS = 20
+    # the most keys that can be asked for by `?fields=` on /services, /briefs and /brief-responses. Postgres'
+    # json_build_object, which projects those taken from `data`, takes at most 100 arguments (50 keys).
+    DM_API_SPARSE_FIELDSETS_MAX_FIELDS = 40
+    # the number of results loaded and serialized at a time as unpaginated list responses are streamed, or None to
+    # build them whole
+    DM_API_LIST_RESPONSE_BATCH_SIZE = 500
+
+    DM_API_SERVICE_IMPORT_CHUNK_SIZE = 1000
+    # processes used to validate imported services against their schemas, 1 to validate in the request process
+    DM_API_SERVICE_IMPORT_WORKERS = 4
+    DM_API_SUPPLIER_UPDATE_CHUNK_SIZE = 1000
+
+    # 'lru', 'filesystem' or None to disable the cache of responses from read-mostly endpoints
+    DM_API_RESPONSE_CACHE_BACKEND = 'lru'
+    DM_API_RESPONSE_CACHE_MAX_ENTRIES = 1000
+    # shared by the processes on an instance when using the 'filesystem' backend, defaults to a temporary directory
+    DM_API_RESPONSE_CACHE_DIR = None
+    # where framework exports are kept between changes, shared by the processes on an instance, or None to disable
+    DM_API_EXPORT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'dm-api-export-cache')
+    # 'orjson', or 'stdlib' to encode JSON responses with the standard library's encoder
+    DM_API_JSON_ENCODER = 'orjson'
+    # 'orjson', or 'stdlib' to decode the values of JSON columns with the standard library's decoder
+    DM_API_JSON_DECODER = 'orjson'
+    # the most (JSON encoded) bytes of service and brief serializations each process keeps, or 0 to disable
+    DM_API_SERIALIZATION_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    # the longest a request to /audit-events/tail may wait for new audit events, in seconds
+    DM_API_AUDIT_EVENTS_TAIL_MAX_TIMEOUT = 30
 
     DM_ALLOWED_ADMIN_DOMAINS = ['digital.cabinet-office.gov.uk', 'crowncommercial.gov.uk', 'user.marketplace.team',
                                 'notifications.service.gov.uk']
@@ -86,6 +118,13 @@ class Test(Config):
     DM_API_BRIEF_RESPONSES_PAGE_SIZE = 5
 
     DM_API_PROJECTS_PAGE_SIZE = 5
+    DM_API_SERVICE_IMPORT_CHUNK_SIZE = 2
+    DM_API_SERVICE_IMPORT_WORKERS = 1
+    DM_API_SUPPLIER_UPDATE_CHUNK_SIZE = 2
+    # test databases are recreated, restarting the table generations the cached exports are keyed on
+    DM_API_EXPORT_CACHE_DIR = None
+    # rows updated within a frozen time keep their updated_at, the serialization cache's key
+    DM_API_SERIALIZATION_CACHE_MAX_BYTES = 0
 
     DM_G12_RECOVERY_SUPPLIER_IDS = "577184"
 
@@ -0,0 +1,106 @@
+"""Add table_generations, bumped by a trigger on every write to the tables behind cached responses
+
+Revision ID: 1460
+Revises: 1450
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1460'
+down_revision = '1450'
+
+TRACKED_TABLES = (
+    'buyer_email_domains',
+    'draft_services',
+    'framework_lots',
+    'frameworks',
+    'lots',
+    'supplier_frameworks',
+    'suppliers',
+    'users',
+)
+
+# users are written on every login, and nothing cached shows login bookkeeping, so updates of just those columns (and
+# the updated_at the ORM sets along with them) leave the users generation alone - any other column, including ones
+# added later, bumps it
+USERS_LOGIN_COLUMNS = ('logged_in_at', 'failed_login_count', 'updated_at')
+
+
+def upgrade():
+    # A table's generation is the sum of its rows' bumps, so it only changes when a writing transaction commits. Each
+    # write appends a row rather than updating one row per table, so concurrent writers never wait on each other here.
+    op.create_table(
+        'table_generations',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('table_name', sa.String(), nullable=False),
+        sa.Column('bumps', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id', name=op.f('table_generations_pkey')),
+    )
+    op.create_index('idx_table_generations_table_name', 'table_generations', ['table_name'], unique=False)
+
+    # A trigger's first argument, if it has one, names the generation it bumps in place of the table's name, for
+    # generations of just some of a table's columns. A row-level update trigger's further arguments name columns whose
+    # changes alone don't bump the generation (there are no transition tables for statement triggers to compare).
+    #
+    # Before appending, a write folds the table's committed rows that no other write is folding into its own row, which
+    # keeps the table small without blocking. Locking a row another transaction has since deleted is a serialization
+    # failure outside read committed, so other isolation levels just append.
+    op.execute("""
+        CREATE FUNCTION bump_table_generation() RETURNS trigger AS $$
+        DECLARE
+            folded_bumps bigint := 0;
+            old_row jsonb;
+            new_row jsonb;
+        BEGIN
+            IF TG_LEVEL = 'ROW' AND TG_OP = 'UPDATE' THEN
+                old_row := to_jsonb(OLD);
+                new_row := to_jsonb(NEW);
+                FOR i IN 1 .. TG_NARGS - 1 LOOP
+                    old_row := old_row - TG_ARGV[i];
+                    new_row := new_row - TG_ARGV[i];
+                END LOOP;
+                IF old_row = new_row THEN
+                    RETURN NULL;
+                END IF;
+            END IF;
+            IF current_setting('transaction_isolation') = 'read committed' THEN
+                WITH folded AS (
+                    DELETE FROM table_generations WHERE id IN (
+                        SELECT id FROM table_generations WHERE table_name = coalesce(TG_ARGV[0], TG_TABLE_NAME)
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING bumps
+                )
+                SELECT coalesce(sum(bumps), 0) INTO folded_bumps FROM folded;
+            END IF;
+            INSERT INTO table_generations (table_name, bumps)
+                VALUES (coalesce(TG_ARGV[0], TG_TABLE_NAME), folded_bumps + 1);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table_name in TRACKED_TABLES:
+        op.execute("INSERT INTO table_generations (table_name, bumps) VALUES ('{0}', 0)".format(table_name))
+        op.execute("""
+            CREATE TRIGGER {0}_bump_generation
+                AFTER INSERT OR {1}DELETE OR TRUNCATE ON {0}
+                FOR EACH STATEMENT EXECUTE PROCEDURE bump_table_generation()
+        """.format(table_name, '' if table_name == 'users' else 'UPDATE OR '))
+    op.execute("""
+        CREATE TRIGGER users_bump_generation_on_update
+            AFTER UPDATE ON users
+            FOR EACH ROW EXECUTE PROCEDURE bump_table_generation('users', {})
+    """.format(', '.join("'{}'".format(column) for column in USERS_LOGIN_COLUMNS)))
+
+
+def downgrade():
+    op.execute("DROP TRIGGER users_bump_generation_on_update ON users")
+    for table_name in TRACKED_TABLES:
+        op.execute("DROP TRIGGER {0}_bump_generation ON {0}".format(table_name))
+    op.execute("DROP FUNCTION bump_table_generation()")
+    op.drop_index('idx_table_generations_table_name', table_name='table_generations')
+    op.drop_table('table_generations')
@@ -0,0 +1,180 @@
+"""Add counters for framework stats, maintained by triggers on supplier_frameworks, draft_services and users
+
+Revision ID: 1470
+Revises: 1460
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1470'
+down_revision = '1460'
+
+COUNTER_TABLES = (
+    'framework_supplier_declaration_statuses',
+    'framework_draft_service_counts',
+    'supplier_user_logins',
+)
+
+
+def upgrade():
+    op.create_table(
+        'framework_supplier_declaration_statuses',
+        sa.Column('framework_id', sa.Integer(), nullable=False),
+        sa.Column('supplier_id', sa.BigInteger(), nullable=False),
+        sa.Column('has_declaration', sa.Boolean(), nullable=False),
+        sa.Column('declaration_status', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint(
+            'framework_id', 'supplier_id', name=op.f('framework_supplier_declaration_statuses_pkey')
+        ),
+    )
+    op.create_table(
+        'framework_draft_service_counts',
+        sa.Column('framework_id', sa.Integer(), nullable=False),
+        sa.Column('supplier_id', sa.BigInteger(), nullable=False),
+        sa.Column('lot_id', sa.BigInteger(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint(
+            'framework_id', 'supplier_id', 'lot_id', 'status', name=op.f('framework_draft_service_counts_pkey')
+        ),
+    )
+    # one row per supplier user rather than a count per period, so concurrent logins never write the same row
+    op.create_table(
+        'supplier_user_logins',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('logged_in_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('user_id', name=op.f('supplier_user_logins_pkey')),
+    )
+
+    # Counters are deleted rather than left at zero (and are only read where their count is positive), and
+    # decrementing one that isn't there does nothing rather than going negative, so the counters stay sane whatever
+    # order the tables are emptied in
+    op.execute("""
+        CREATE FUNCTION count_supplier_framework_declaration() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE'
+                    AND (OLD.framework_id, OLD.supplier_id) <> (NEW.framework_id, NEW.supplier_id)) THEN
+                DELETE FROM framework_supplier_declaration_statuses
+                    WHERE framework_id = OLD.framework_id AND supplier_id = OLD.supplier_id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO framework_supplier_declaration_statuses
+                    (framework_id, supplier_id, has_declaration, declaration_status)
+                    VALUES (NEW.framework_id, NEW.supplier_id, NEW.declaration IS NOT NULL, NEW.declaration->>'status')
+                    ON CONFLICT (framework_id, supplier_id) DO UPDATE SET
+                        has_declaration = EXCLUDED.has_declaration,
+                        declaration_status = EXCLUDED.declaration_status;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE FUNCTION count_draft_service() RETURNS trigger AS $$
+        DECLARE
+            remaining integer;
+        BEGIN
+            IF TG_OP = 'UPDATE'
+                    AND (OLD.framework_id, OLD.supplier_id, OLD.lot_id, OLD.status)
+                        IS NOT DISTINCT FROM (NEW.framework_id, NEW.supplier_id, NEW.lot_id, NEW.status) THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                -- decrementing first takes the row's lock, so concurrent decrements see each other's and only the
+                -- one that takes the count to zero deletes the row
+                UPDATE framework_draft_service_counts SET count = count - 1
+                    WHERE (framework_id, supplier_id, lot_id, status)
+                        = (OLD.framework_id, OLD.supplier_id, OLD.lot_id, OLD.status)
+                    RETURNING count INTO remaining;
+                IF remaining <= 0 THEN
+                    DELETE FROM framework_draft_service_counts
+                        WHERE (framework_id, supplier_id, lot_id, status)
+                            = (OLD.framework_id, OLD.supplier_id, OLD.lot_id, OLD.status);
+                END IF;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO framework_draft_service_counts (framework_id, supplier_id, lot_id, status, count)
+                    VALUES (NEW.framework_id, NEW.supplier_id, NEW.lot_id, NEW.status, 1)
+                    ON CONFLICT (framework_id, supplier_id, lot_id, status)
+                        DO UPDATE SET count = framework_draft_service_counts.count + 1;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE FUNCTION track_supplier_user_login() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND (OLD.id <> NEW.id OR NEW.role <> 'supplier')) THEN
+                DELETE FROM supplier_user_logins WHERE user_id = OLD.id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.role = 'supplier' THEN
+                INSERT INTO supplier_user_logins (user_id, logged_in_at)
+                    VALUES (NEW.id, NEW.logged_in_at)
+                    ON CONFLICT (user_id) DO UPDATE SET logged_in_at = EXCLUDED.logged_in_at;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    op.execute("""
+        CREATE TRIGGER supplier_frameworks_count_declaration
+            AFTER INSERT OR UPDATE OF declaration, framework_id, supplier_id OR DELETE ON supplier_frameworks
+            FOR EACH ROW EXECUTE PROCEDURE count_supplier_framework_declaration()
+    """)
+    op.execute("""
+        CREATE TRIGGER draft_services_count
+            AFTER INSERT OR UPDATE OR DELETE ON draft_services
+            FOR EACH ROW EXECUTE PROCEDURE count_draft_service()
+    """)
+    op.execute("""
+        CREATE TRIGGER users_track_supplier_login
+            AFTER INSERT OR UPDATE OF id, role, logged_in_at OR DELETE ON users
+            FOR EACH ROW EXECUTE PROCEDURE track_supplier_user_login()
+    """)
+
+    # track the counters' generations (see migration 1460), so responses built from them can be cached
+    for table_name in COUNTER_TABLES:
+        op.execute("INSERT INTO table_generations (table_name, bumps) VALUES ('{0}', 0)".format(table_name))
+        op.execute("""
+            CREATE TRIGGER {0}_bump_generation
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {0}
+                FOR EACH STATEMENT EXECUTE PROCEDURE bump_table_generation()
+        """.format(table_name))
+
+    # fill the counters from the existing rows (as `reconcile_framework_stats` does)
+    op.execute("""
+        INSERT INTO framework_supplier_declaration_statuses
+            (framework_id, supplier_id, has_declaration, declaration_status)
+        SELECT framework_id, supplier_id, declaration IS NOT NULL, declaration->>'status'
+        FROM supplier_frameworks
+    """)
+    op.execute("""
+        INSERT INTO framework_draft_service_counts (framework_id, supplier_id, lot_id, status, count)
+        SELECT framework_id, supplier_id, lot_id, status, count(*)
+        FROM draft_services
+        GROUP BY framework_id, supplier_id, lot_id, status
+    """)
+    op.execute("""
+        INSERT INTO supplier_user_logins (user_id, logged_in_at)
+        SELECT id, logged_in_at
+        FROM users
+        WHERE role = 'supplier'
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER users_track_supplier_login ON users")
+    op.execute("DROP TRIGGER draft_services_count ON draft_services")
+    op.execute("DROP TRIGGER supplier_frameworks_count_declaration ON supplier_frameworks")
+    op.execute("DROP FUNCTION track_supplier_user_login()")
+    op.execute("DROP FUNCTION count_draft_service()")
+    op.execute("DROP FUNCTION count_supplier_framework_declaration()")
+    for table_name in COUNTER_TABLES:
+        op.execute("DELETE FROM table_generations WHERE table_name = '{0}'".format(table_name))
+        op.drop_table(table_name)
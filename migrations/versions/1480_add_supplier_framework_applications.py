@@ -0,0 +1,242 @@
+"""Add supplier_framework_applications, maintained by triggers on supplier_frameworks, suppliers, draft_services and
+services
+
+Revision ID: 1480
+Revises: 1470
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '1480'
+down_revision = '1470'
+
+
+def upgrade():
+    op.create_table(
+        'supplier_framework_applications',
+        sa.Column('supplier_id', sa.BigInteger(), nullable=False),
+        sa.Column('framework_id', sa.Integer(), nullable=False),
+        sa.Column('declaration_status', sa.String(), nullable=True),
+        sa.Column('has_completed_service', sa.Boolean(), nullable=False),
+        sa.Column('application_status', sa.String(), nullable=False),
+        sa.Column('published_service_counts', postgresql.JSONB(), nullable=False),
+        sa.PrimaryKeyConstraint('supplier_id', 'framework_id', name=op.f('supplier_framework_applications_pkey')),
+    )
+    op.create_index(
+        'idx_supplier_framework_applications_status',
+        'supplier_framework_applications',
+        ['framework_id', 'application_status'],
+        unique=False,
+    )
+
+    # Recomputes a supplier framework's row from scratch. Locking the supplier_frameworks row first serializes the
+    # refreshes of any one supplier framework, and as each statement here takes a new snapshot, whichever refresh runs
+    # last sees the others' committed writes. Company details were confirmed once per supplier for g-cloud-10, and are
+    # confirmed for each application on later frameworks.
+    op.execute("""
+        CREATE FUNCTION refresh_supplier_framework_application(p_supplier_id bigint, p_framework_id integer)
+        RETURNS void AS $$
+        BEGIN
+            PERFORM 1 FROM supplier_frameworks
+                WHERE supplier_id = p_supplier_id AND framework_id = p_framework_id
+                FOR UPDATE;
+            IF NOT FOUND THEN
+                DELETE FROM supplier_framework_applications
+                    WHERE supplier_id = p_supplier_id AND framework_id = p_framework_id;
+                RETURN;
+            END IF;
+
+            INSERT INTO supplier_framework_applications (
+                supplier_id, framework_id, declaration_status, has_completed_service, application_status,
+                published_service_counts
+            )
+            SELECT
+                application.supplier_id,
+                application.framework_id,
+                application.declaration_status,
+                application.has_completed_service,
+                CASE WHEN application.declaration_status = 'complete'
+                    AND application.has_completed_service
+                    AND coalesce(application.company_details_confirmed, false)
+                    THEN 'application' ELSE 'no_application' END,
+                application.published_service_counts
+            FROM (
+                SELECT
+                    sf.supplier_id,
+                    sf.framework_id,
+                    CASE WHEN sf.declaration IS NULL OR sf.declaration::jsonb = '{}'::jsonb
+                        THEN 'unstarted' ELSE sf.declaration->>'status' END AS declaration_status,
+                    EXISTS (
+                        SELECT 1 FROM draft_services
+                        WHERE draft_services.supplier_id = sf.supplier_id
+                        AND draft_services.framework_id = sf.framework_id
+                        AND draft_services.status IN ('submitted', 'failed')
+                    ) AS has_completed_service,
+                    CASE WHEN frameworks.slug = 'g-cloud-10'
+                        THEN suppliers.company_details_confirmed
+                        ELSE sf.application_company_details_confirmed END AS company_details_confirmed,
+                    coalesce((
+                        SELECT jsonb_object_agg(lot_counts.lot_id, lot_counts.count)
+                        FROM (
+                            SELECT services.lot_id, count(*) AS count
+                            FROM services
+                            WHERE services.supplier_id = sf.supplier_id
+                            AND services.framework_id = sf.framework_id
+                            AND services.status = 'published'
+                            GROUP BY services.lot_id
+                        ) AS lot_counts
+                    ), '{}'::jsonb) AS published_service_counts
+                FROM supplier_frameworks AS sf
+                JOIN suppliers ON suppliers.supplier_id = sf.supplier_id
+                JOIN frameworks ON frameworks.id = sf.framework_id
+                WHERE sf.supplier_id = p_supplier_id AND sf.framework_id = p_framework_id
+            ) AS application
+            ON CONFLICT (supplier_id, framework_id) DO UPDATE SET
+                declaration_status = EXCLUDED.declaration_status,
+                has_completed_service = EXCLUDED.has_completed_service,
+                application_status = EXCLUDED.application_status,
+                published_service_counts = EXCLUDED.published_service_counts;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    # Row triggers only queue the supplier frameworks a write touches, and a statement trigger then refreshes each of
+    # them once, so a statement writing many of a supplier's services or drafts recomputes its row once rather than
+    # once per row. Inserting into the queue takes no locks other writers wait on, and a transaction only ever dequeues
+    # its own entries. Refreshing in key order means two statements refreshing overlapping supplier frameworks lock
+    # their supplier_frameworks rows in the same order.
+    op.create_table(
+        'supplier_framework_application_refreshes',
+        sa.Column('txid', sa.BigInteger(), nullable=False),
+        sa.Column('supplier_id', sa.BigInteger(), nullable=False),
+        sa.Column('framework_id', sa.Integer(), nullable=False),
+    )
+    op.create_index(
+        'idx_supplier_framework_application_refreshes_txid',
+        'supplier_framework_application_refreshes',
+        ['txid'],
+        unique=False,
+    )
+
+    # supplier_frameworks, draft_services and services all have supplier_id and framework_id columns
+    op.execute("""
+        CREATE FUNCTION queue_supplier_framework_application_refresh() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                INSERT INTO supplier_framework_application_refreshes (txid, supplier_id, framework_id)
+                    VALUES (txid_current(), OLD.supplier_id, OLD.framework_id);
+            END IF;
+            IF TG_OP = 'INSERT'
+                    OR (TG_OP = 'UPDATE' AND (OLD.supplier_id, OLD.framework_id) <> (NEW.supplier_id, NEW.framework_id))
+                    THEN
+                INSERT INTO supplier_framework_application_refreshes (txid, supplier_id, framework_id)
+                    VALUES (txid_current(), NEW.supplier_id, NEW.framework_id);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE FUNCTION queue_supplier_framework_application_refreshes_for_supplier() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO supplier_framework_application_refreshes (txid, supplier_id, framework_id)
+                SELECT txid_current(), supplier_id, framework_id
+                FROM supplier_frameworks WHERE supplier_id = NEW.supplier_id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE FUNCTION refresh_queued_supplier_framework_applications() RETURNS trigger AS $$
+        DECLARE
+            queued record;
+        BEGIN
+            FOR queued IN
+                WITH dequeued AS (
+                    DELETE FROM supplier_framework_application_refreshes WHERE txid = txid_current()
+                    RETURNING supplier_id, framework_id
+                )
+                SELECT DISTINCT supplier_id, framework_id FROM dequeued ORDER BY supplier_id, framework_id
+            LOOP
+                PERFORM refresh_supplier_framework_application(queued.supplier_id, queued.framework_id);
+            END LOOP;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    # updates only queue a refresh if they change something the row is derived from
+    for table_name, columns in (
+        (
+            'supplier_frameworks',
+            ('declaration', 'application_company_details_confirmed', 'supplier_id', 'framework_id'),
+        ),
+        ('draft_services', ('status', 'supplier_id', 'framework_id')),
+        ('services', ('status', 'supplier_id', 'framework_id', 'lot_id')),
+    ):
+        op.execute("""
+            CREATE TRIGGER {table_name}_queue_application_refresh
+                AFTER INSERT OR DELETE ON {table_name}
+                FOR EACH ROW EXECUTE PROCEDURE queue_supplier_framework_application_refresh()
+        """.format(table_name=table_name))
+        op.execute("""
+            CREATE TRIGGER {table_name}_update_queue_application_refresh
+                AFTER UPDATE OF {columns} ON {table_name}
+                FOR EACH ROW
+                WHEN ({changed})
+                EXECUTE PROCEDURE queue_supplier_framework_application_refresh()
+        """.format(
+            table_name=table_name,
+            columns=', '.join(columns),
+            # json has no equality operator, so declarations are compared as text
+            changed=' OR '.join(
+                'OLD.{0}::text IS DISTINCT FROM NEW.{0}::text'.format(column) if column == 'declaration' else
+                'OLD.{0} IS DISTINCT FROM NEW.{0}'.format(column)
+                for column in columns
+            ),
+        ))
+        op.execute("""
+            CREATE TRIGGER {table_name}_refresh_applications
+                AFTER INSERT OR UPDATE OF {columns} OR DELETE ON {table_name}
+                FOR EACH STATEMENT EXECUTE PROCEDURE refresh_queued_supplier_framework_applications()
+        """.format(table_name=table_name, columns=', '.join(columns)))
+    op.execute("""
+        CREATE TRIGGER suppliers_queue_application_refreshes
+            AFTER UPDATE OF company_details_confirmed ON suppliers
+            FOR EACH ROW
+            WHEN (OLD.company_details_confirmed IS DISTINCT FROM NEW.company_details_confirmed)
+            EXECUTE PROCEDURE queue_supplier_framework_application_refreshes_for_supplier()
+    """)
+    op.execute("""
+        CREATE TRIGGER suppliers_refresh_applications
+            AFTER UPDATE OF company_details_confirmed ON suppliers
+            FOR EACH STATEMENT EXECUTE PROCEDURE refresh_queued_supplier_framework_applications()
+    """)
+
+    op.execute("""
+        SELECT refresh_supplier_framework_application(supplier_id, framework_id) FROM supplier_frameworks
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER suppliers_refresh_applications ON suppliers")
+    op.execute("DROP TRIGGER suppliers_queue_application_refreshes ON suppliers")
+    for table_name in ('services', 'draft_services', 'supplier_frameworks'):
+        op.execute("DROP TRIGGER {0}_refresh_applications ON {0}".format(table_name))
+        op.execute("DROP TRIGGER {0}_update_queue_application_refresh ON {0}".format(table_name))
+        op.execute("DROP TRIGGER {0}_queue_application_refresh ON {0}".format(table_name))
+    op.execute("DROP FUNCTION refresh_queued_supplier_framework_applications()")
+    op.execute("DROP FUNCTION queue_supplier_framework_application_refreshes_for_supplier()")
+    op.execute("DROP FUNCTION queue_supplier_framework_application_refresh()")
+    op.drop_index(
+        'idx_supplier_framework_application_refreshes_txid', table_name='supplier_framework_application_refreshes'
+    )
+    op.drop_table('supplier_framework_application_refreshes')
+    op.execute("DROP FUNCTION refresh_supplier_framework_application(bigint, integer)")
+    op.drop_index('idx_supplier_framework_applications_status', table_name='supplier_framework_applications')
+    op.drop_table('supplier_framework_applications')
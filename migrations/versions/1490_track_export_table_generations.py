@@ -0,0 +1,53 @@
+"""Track the generations of the remaining tables the framework exports are built from
+
+Revision ID: 1490
+Revises: 1480
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '1490'
+down_revision = '1480'
+
+TRACKED_TABLES = (
+    'contact_information',
+    'framework_agreements',
+)
+
+# The exports show the application status and published service counts derived from drafts' and services' statuses,
+# which change far less often than the drafts and services themselves. These generations only count writes to the
+# columns they're derived from.
+STATUS_GENERATIONS = (
+    ('draft_services', 'draft_service_statuses', ('status', 'supplier_id', 'framework_id')),
+    ('services', 'service_statuses', ('status', 'supplier_id', 'framework_id', 'lot_id')),
+)
+
+
+def upgrade():
+    # see migration 1460
+    for table_name in TRACKED_TABLES:
+        op.execute("INSERT INTO table_generations (table_name, bumps) VALUES ('{0}', 0)".format(table_name))
+        op.execute("""
+            CREATE TRIGGER {0}_bump_generation
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {0}
+                FOR EACH STATEMENT EXECUTE PROCEDURE bump_table_generation()
+        """.format(table_name))
+    for table_name, generation_name, columns in STATUS_GENERATIONS:
+        op.execute("INSERT INTO table_generations (table_name, bumps) VALUES ('{0}', 0)".format(generation_name))
+        op.execute("""
+            CREATE TRIGGER {0}_bump_{1}_generation
+                AFTER INSERT OR UPDATE OF {2} OR DELETE OR TRUNCATE ON {0}
+                FOR EACH STATEMENT EXECUTE PROCEDURE bump_table_generation('{1}')
+        """.format(table_name, generation_name, ', '.join(columns)))
+
+
+def downgrade():
+    for table_name, generation_name, columns in STATUS_GENERATIONS:
+        op.execute("DROP TRIGGER {0}_bump_{1}_generation ON {0}".format(table_name, generation_name))
+        op.execute("DELETE FROM table_generations WHERE table_name = '{0}'".format(generation_name))
+    for table_name in TRACKED_TABLES:
+        op.execute("DROP TRIGGER {0}_bump_generation ON {0}".format(table_name))
+        op.execute("DELETE FROM table_generations WHERE table_name = '{0}'".format(table_name))
@@ -0,0 +1,45 @@
+"""archived services: allow storing data as a delta against an earlier snapshot archive
+
+Revision ID: 1500
+Revises: 1490
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '1500'
+down_revision = '1490'
+
+
+def upgrade():
+    op.add_column('archived_services', sa.Column('snapshot_id', sa.Integer(), nullable=True))
+    op.add_column('archived_services', sa.Column('data_delta', postgresql.JSON(), nullable=True))
+    op.create_foreign_key(
+        op.f('archived_services_snapshot_id_fkey'), 'archived_services', 'archived_services', ['snapshot_id'], ['id'],
+    )
+    op.alter_column('archived_services', 'data', existing_type=postgresql.JSON(), nullable=True)
+
+
+def downgrade():
+    # put the full data back into the archives stored as deltas
+    op.execute("""
+        UPDATE archived_services SET data = (
+            coalesce((
+                SELECT jsonb_object_agg(snapshot_data.key, snapshot_data.value)
+                FROM jsonb_each(snapshots.data::jsonb) AS snapshot_data
+                WHERE snapshot_data.key NOT IN (
+                    SELECT jsonb_array_elements_text(archived_services.data_delta::jsonb->'unset')
+                )
+            ), '{}'::jsonb) || (archived_services.data_delta::jsonb->'set')
+        )::json
+        FROM archived_services AS snapshots
+        WHERE snapshots.id = archived_services.snapshot_id
+    """)
+    op.alter_column('archived_services', 'data', existing_type=postgresql.JSON(), nullable=False)
+    op.drop_constraint(op.f('archived_services_snapshot_id_fkey'), 'archived_services', type_='foreignkey')
+    op.drop_column('archived_services', 'data_delta')
+    op.drop_column('archived_services', 'snapshot_id')
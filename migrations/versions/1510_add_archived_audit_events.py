@@ -0,0 +1,54 @@
+"""Add archived_audit_events, the parent of the archived monthly partitions of audit_events
+
+Revision ID: 1510
+Revises: 1500
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '1510'
+down_revision = '1500'
+
+
+def upgrade():
+    # audit_events itself is partitioned by `flask audit-events partition` (see app.audit_utils) rather than here, so
+    # the events can be moved a month at a time outside of a deploy
+    op.create_table(
+        'archived_audit_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('type', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('user', sa.String(), nullable=True),
+        sa.Column('data', postgresql.JSONB(), nullable=False),
+        sa.Column('object_type', sa.String(), nullable=True),
+        sa.Column('object_id', sa.BigInteger(), nullable=True),
+        sa.Column('acknowledged', sa.Boolean(), nullable=False),
+        sa.Column('acknowledged_by', sa.String(), nullable=True),
+        sa.Column('acknowledged_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id', name=op.f('archived_audit_events_pkey')),
+    )
+
+
+def downgrade():
+    # move the events of any archived partitions back into audit_events
+    op.execute("""
+        DO $$
+        DECLARE
+            partition_name text;
+        BEGIN
+            FOR partition_name IN
+                SELECT pg_class.relname FROM pg_inherits JOIN pg_class ON pg_class.oid = pg_inherits.inhrelid
+                WHERE pg_inherits.inhparent = 'archived_audit_events'::regclass
+            LOOP
+                EXECUTE format('INSERT INTO audit_events SELECT * FROM %I', partition_name);
+                EXECUTE format('DROP TABLE %I', partition_name);
+            END LOOP;
+        END
+        $$
+    """)
+    op.drop_table('archived_audit_events')
@@ -0,0 +1,61 @@
+"""Add a jsonb_path_ops GIN index on audit_events.data, for containment queries
+
+Revision ID: 1520
+Revises: 1510
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '1520'
+down_revision = '1510'
+
+
+def upgrade():
+    op.create_index(
+        'idx_audit_events_data_path_ops',
+        'audit_events',
+        ['data'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'data': 'jsonb_path_ops'},
+    )
+    # partitions made since migration 1510 copied the indexes of audit_events as they were then (partitions archived
+    # since don't need it)
+    op.execute("""
+        DO $$
+        DECLARE
+            partition_name text;
+        BEGIN
+            FOR partition_name IN
+                SELECT pg_class.relname FROM pg_inherits JOIN pg_class ON pg_class.oid = pg_inherits.inhrelid
+                WHERE pg_inherits.inhparent = 'audit_events'::regclass
+            LOOP
+                EXECUTE format('CREATE INDEX ON %I USING gin (data jsonb_path_ops)', partition_name);
+            END LOOP;
+        END
+        $$
+    """)
+
+
+def downgrade():
+    op.execute("""
+        DO $$
+        DECLARE
+            index_name text;
+        BEGIN
+            FOR index_name IN
+                SELECT CAST(pg_index.indexrelid AS regclass)::text
+                FROM pg_inherits
+                JOIN pg_index ON pg_index.indrelid = pg_inherits.inhrelid
+                JOIN pg_opclass ON pg_opclass.oid = pg_index.indclass[0]
+                WHERE pg_inherits.inhparent = 'audit_events'::regclass AND pg_opclass.opcname = 'jsonb_path_ops'
+            LOOP
+                EXECUTE format('DROP INDEX %s', index_name);
+            END LOOP;
+        END
+        $$
+    """)
+    op.drop_index('idx_audit_events_data_path_ops', table_name='audit_events')
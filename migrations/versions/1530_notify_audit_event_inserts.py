@@ -0,0 +1,64 @@
+"""Notify listeners on the audit_events channel when audit events are inserted, and record the inserting transaction
+
+Revision ID: 1530
+Revises: 1520
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '1530'
+down_revision = '1520'
+
+
+def upgrade():
+    # the id of the transaction that inserted each event, so that tailing them (see app.audit_utils) can hold back those
+    # of transactions that may yet commit behind ones it has returned. Events inserted before now are left without one,
+    # and are never tailed.
+    op.execute("ALTER TABLE audit_events ADD COLUMN txid bigint")
+    op.execute("ALTER TABLE audit_events ALTER COLUMN txid SET DEFAULT txid_current()")
+    op.execute("CREATE INDEX idx_audit_events_txid ON audit_events (txid, id)")
+
+    # a statement-level trigger, as the notifications carry no payload, and postgres folds identical notifications sent
+    # by a transaction into one anyway - so each transaction inserting audit events sends one notification, whatever
+    # it inserts. Its cost is paid at commit: postgres queues the notification under a lock shared by the whole cluster
+    # and held until the commit has been flushed, so transactions inserting audit events commit one at a time (others
+    # aren't held up). Events moved into partitions of audit_events aren't inserted into audit_events itself, so don't
+    # notify.
+    op.execute("""
+        CREATE FUNCTION notify_audit_events() RETURNS trigger AS $$
+        BEGIN
+            NOTIFY audit_events;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER audit_events_notify
+            AFTER INSERT ON audit_events
+            FOR EACH STATEMENT EXECUTE PROCEDURE notify_audit_events()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER audit_events_notify ON audit_events")
+    op.execute("DROP FUNCTION notify_audit_events()")
+
+    op.execute("ALTER TABLE audit_events DROP COLUMN txid")
+    # partitions created since have a txid column of their own, which dropping audit_events' doesn't drop
+    op.execute("""
+        DO $$
+        DECLARE
+            partition_name text;
+        BEGIN
+            FOR partition_name IN
+                SELECT pg_class.relname FROM pg_inherits JOIN pg_class ON pg_class.oid = pg_inherits.inhrelid
+                WHERE pg_inherits.inhparent IN ('audit_events'::regclass, 'archived_audit_events'::regclass)
+            LOOP
+                EXECUTE format('ALTER TABLE %I DROP COLUMN IF EXISTS txid', partition_name);
+            END LOOP;
+        END
+        $$
+    """)
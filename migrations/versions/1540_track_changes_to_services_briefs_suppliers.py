@@ -0,0 +1,53 @@
+"""Track the transaction and order in which services, briefs and suppliers were last written, for the change feed
+
+Revision ID: 1540
+Revises: 1530
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '1540'
+down_revision = '1530'
+
+TRACKED_TABLES = ('briefs', 'services', 'suppliers')
+
+
+def upgrade():
+    op.execute("CREATE SEQUENCE change_sequence")
+    op.execute("""
+        CREATE FUNCTION track_change() RETURNS trigger AS $$
+        BEGIN
+            NEW.change_txid := txid_current();
+            NEW.change_sequence := nextval('change_sequence');
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    for table_name in TRACKED_TABLES:
+        op.execute("""
+            ALTER TABLE {0} ADD COLUMN change_txid bigint, ADD COLUMN change_sequence bigint
+        """.format(table_name))
+        op.execute("""
+            UPDATE {0} SET change_txid = txid_current(), change_sequence = nextval('change_sequence')
+        """.format(table_name))
+        op.execute("""
+            ALTER TABLE {0} ALTER COLUMN change_txid SET NOT NULL, ALTER COLUMN change_sequence SET NOT NULL
+        """.format(table_name))
+        op.execute("CREATE INDEX idx_{0}_change ON {0} (change_txid, change_sequence)".format(table_name))
+        op.execute("""
+            CREATE TRIGGER {0}_track_change
+                BEFORE INSERT OR UPDATE ON {0}
+                FOR EACH ROW EXECUTE PROCEDURE track_change()
+        """.format(table_name))
+
+
+def downgrade():
+    for table_name in TRACKED_TABLES:
+        op.execute("DROP TRIGGER {0}_track_change ON {0}".format(table_name))
+        op.execute("ALTER TABLE {0} DROP COLUMN change_txid, DROP COLUMN change_sequence".format(table_name))
+    op.execute("DROP FUNCTION track_change()")
+    op.execute("DROP SEQUENCE change_sequence")
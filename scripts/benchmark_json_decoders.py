@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""Time fetching a synthetic set of services' JSON data with each of the decoders `DM_API_JSON_DECODER` chooses between
+
+Postgres generates a `json` value for each service from an example listing, so no services need to exist, and the rows
+are fetched through an engine created as `create_app` creates it, once with each decoder.
+
+Usage:
+    benchmark_json_decoders.py [<environment>] [<example_listing>] [--services=<n>] [--repeat=<n>]
+
+Options:
+    --services=<n>  Number of services fetched [default: 10000]
+    --repeat=<n>    Number of times to fetch them with each decoder [default: 5]
+
+Example:
+    ./benchmark_json_decoders.py development example_listings/G6-SaaS.json
+"""
+from __future__ import print_function
+import json
+import timeit
+
+from docopt import docopt
+from sqlalchemy import create_engine, text
+
+from app import create_app, db
+from app.json_decoder import get_json_decoder
+
+FETCH_SERVICES_DATA = """
+    SELECT CAST(jsonb_set(CAST(:listing AS jsonb), '{{id}}', to_jsonb(CAST(i AS text))) AS {})
+    FROM generate_series(1, :services) AS i
+"""
+
+
+def fetch_services_data(engine, listing, services, type_name='json'):
+    with engine.connect() as connection:
+        return [row[0] for row in connection.execute(
+            text(FETCH_SERVICES_DATA.format(type_name)), {"listing": listing, "services": services},
+        )]
+
+
+if __name__ == "__main__":
+    arguments = docopt(__doc__)
+    with open(arguments['<example_listing>'] or 'example_listings/G6-SaaS.json') as f:
+        listing = f.read()
+    services = int(arguments['--services'])
+    repeat = int(arguments['--repeat'])
+
+    app = create_app(arguments['<environment>'] or "development")
+    with app.app_context():
+        # the same documents as text, to time decoding them alone
+        documents = fetch_services_data(db.engine, listing, services, type_name='text')
+
+        fetch_seconds, decode_seconds = {}, {}
+        for name in ('stdlib', 'orjson'):
+            decoder = get_json_decoder(name)
+            engine = create_engine(db.engine.url, json_deserializer=decoder)
+            assert fetch_services_data(engine, listing, services) == [json.loads(document) for document in documents]
+
+            fetch_seconds[name] = timeit.timeit(
+                lambda: fetch_services_data(engine, listing, services), number=repeat,
+            ) / repeat
+            decode_seconds[name] = timeit.timeit(
+                lambda: [decoder(document) for document in documents], number=repeat,
+            ) / repeat
+            engine.dispose()
+            print("{:<7} {:>8.1f} ms per fetch of {} services, {:>8.1f} ms of it decoding".format(
+                name, fetch_seconds[name] * 1000, services, decode_seconds[name] * 1000,
+            ))
+
+    print("Speedup: {:.1f}x fetching, {:.1f}x decoding".format(
+        fetch_seconds['stdlib'] / fetch_seconds['orjson'], decode_seconds['stdlib'] / decode_seconds['orjson'],
+    ))
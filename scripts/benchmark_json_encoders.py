@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""Time the JSON encoders `DM_API_JSON_ENCODER` chooses between on a large list response
+
+The response is made of copies of an example listing serialized much as `Service.serialize` would serialize them,
+and is encoded as `jsonify` encodes responses outside debug mode.
+
+Usage:
+    benchmark_json_encoders.py [<example_listing>] [--services=<n>] [--repeat=<n>]
+
+Options:
+    --services=<n>  Number of services in the response [default: 1000]
+    --repeat=<n>    Number of times to encode the response with each encoder [default: 10]
+
+Example:
+    ./benchmark_json_encoders.py example_listings/G6-SaaS.json --services=5000
+"""
+from __future__ import print_function
+from datetime import datetime
+import json
+import timeit
+
+from docopt import docopt
+from flask.json import JSONEncoder
+
+from app.json_encoder import get_json_encoder
+
+
+def make_response_data(listing, services):
+    now = datetime.utcnow()
+    return {
+        'services': [
+            dict(
+                listing,
+                id=str(2000000000 + i),
+                supplierId=i % 100,
+                supplierName="Supplier {} – Ltd".format(i % 100),
+                frameworkSlug='g-cloud-6',
+                status='published',
+                createdAt=now,
+                updatedAt=now,
+                links={'self': 'http://localhost/services/{}'.format(2000000000 + i)},
+            )
+            for i in range(services)
+        ],
+        'meta': {'total': services},
+        'links': {},
+    }
+
+
+if __name__ == "__main__":
+    arguments = docopt(__doc__)
+    with open(arguments['<example_listing>'] or 'example_listings/G6-SaaS.json') as f:
+        data = make_response_data(json.load(f), int(arguments['--services']))
+    repeat = int(arguments['--repeat'])
+
+    encodings, seconds = {}, {}
+    for name in ('stdlib', 'orjson'):
+        encoder = get_json_encoder(name, JSONEncoder)
+        encodings[name] = json.dumps(data, cls=encoder, separators=(',', ':'), sort_keys=True)
+        seconds[name] = timeit.timeit(
+            lambda: json.dumps(data, cls=encoder, separators=(',', ':'), sort_keys=True), number=repeat,
+        ) / repeat
+        print("{:<7} {:>8.1f} ms per encoding, {:>7.1f} MB/s".format(
+            name, seconds[name] * 1000, len(encodings[name]) / seconds[name] / 1e6,
+        ))
+
+    print("{} bytes, identical: {}".format(len(encodings['stdlib']), encodings['stdlib'] == encodings['orjson']))
+    print("Speedup: {:.1f}x".format(seconds['stdlib'] / seconds['orjson']))
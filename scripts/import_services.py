@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""Import services in bulk from a newline-delimited JSON file
+
+Each line of the file should be a service, with its service ID as `id`, in the format accepted by
+`PUT /services/<service_id>`.
+
+Usage:
+        import_services.py <endpoint> <access_token> <filename>
+
+Example:
+    ./import_services.py http://localhost:5000 myToken ~/services.ndjson
+"""
+from __future__ import print_function
+import getpass
+import sys
+
+import requests
+from docopt import docopt
+
+
+def import_services(base_url, access_token, filename):
+    endpoint = "{}/services/import".format(base_url)
+
+    with open(filename, 'rb') as data_file:
+        response = requests.post(
+            endpoint,
+            params={'updated_by': getpass.getuser()},
+            data=data_file,
+            headers={
+                "content-type": "application/x-ndjson",
+                "authorization": "Bearer {}".format(access_token),
+            }
+        )
+
+    if response.status_code != 200:
+        print(response.status_code)
+        print(response.text)
+        return False
+
+    response_json = response.json()
+    for result in response_json['results']:
+        if not result.get('created'):
+            print("Line {}{}: {}".format(
+                result['line'],
+                " (service {})".format(result['id']) if result.get('id') else "",
+                result['error'],
+            ))
+
+    print("{created} created, {failed} failed".format(**response_json['meta']))
+    return response_json['meta']['failed'] == 0
+
+
+if __name__ == "__main__":
+    arguments = docopt(__doc__)
+    ok = import_services(
+        base_url=arguments['<endpoint>'],
+        access_token=arguments['<access_token>'],
+        filename=arguments['<filename>'],
+    )
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""Compare the space taken by a synthetic service history archived as full copies and as snapshots plus deltas
+
+Each update changes (or occasionally removes) one or two top level keys of an example listing, and is archived the way
+`ArchivedService.from_service` archives it. The sizes reported are those of the serialized JSON, before any
+compression by Postgres.
+
+Usage:
+    measure_archived_service_deltas.py [<example_listing>] [--updates=<n>] [--seed=<seed>]
+
+Options:
+    --updates=<n>  Number of updates to the service [default: 500]
+    --seed=<seed>  Random seed [default: 0]
+
+Example:
+    ./measure_archived_service_deltas.py example_listings/G6-SaaS.json --updates=1000
+"""
+from __future__ import print_function
+import json
+import random
+
+from docopt import docopt
+
+from app.models import ArchivedService
+from app.utils import apply_json_object_delta
+
+
+def update_data(data, rng):
+    data = dict(data)
+    for key in rng.sample(sorted(data), rng.choice((1, 2))):
+        if rng.random() < 0.05:
+            del data[key]
+        elif isinstance(data[key], list):
+            data[key] = data[key][1:] + data[key][:1]
+        else:
+            data[key] = "{} (revision {})".format(data[key], rng.randint(0, 1000))
+    return data
+
+
+def measure(data, updates, rng):
+    full_bytes = delta_bytes = snapshots = 0
+    snapshot_data = None
+    for _ in range(updates + 1):
+        full_size = len(json.dumps(data))
+        full_bytes += full_size
+
+        data_delta = ArchivedService.get_data_delta(snapshot_data, data) if snapshot_data is not None else None
+        if data_delta is None:
+            snapshot_data = data
+            snapshots += 1
+            delta_bytes += full_size
+        else:
+            assert apply_json_object_delta(snapshot_data, data_delta) == data
+            delta_bytes += len(json.dumps(data_delta))
+
+        data = update_data(data, rng)
+
+    return full_bytes, delta_bytes, snapshots
+
+
+if __name__ == "__main__":
+    arguments = docopt(__doc__)
+    with open(arguments['<example_listing>'] or 'example_listings/G6-SaaS.json') as f:
+        data = ArchivedService.clean_data(json.load(f))
+
+    archives = int(arguments['--updates']) + 1
+    full_bytes, delta_bytes, snapshots = measure(data, archives - 1, random.Random(int(arguments['--seed'])))
+
+    print("{} archives, {} of them snapshots".format(archives, snapshots))
+    print("Full copies:          {:>10} bytes, {:>8.0f} bytes written per update".format(
+        full_bytes, full_bytes / archives,
+    ))
+    print("Snapshots and deltas: {:>10} bytes, {:>8.0f} bytes written per update".format(
+        delta_bytes, delta_bytes / archives,
+    ))
+    print("Saving: {:.1%}".format(1 - delta_bytes / full_bytes))
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+"""Rebuild the counters behind `/frameworks/<framework_slug>/stats` from the tables they count
+
+The counters are kept up to date by database triggers, so this should only be needed if they are suspected to have
+drifted (e.g. after restoring some of the counted tables from a backup).
+
+Usage:
+        reconcile_framework_stats.py <endpoint> <access_token>
+
+Example:
+    ./reconcile_framework_stats.py http://localhost:5000 myToken
+"""
+from __future__ import print_function
+import getpass
+import sys
+
+import requests
+from docopt import docopt
+
+
+def reconcile_framework_stats(base_url, access_token):
+    response = requests.post(
+        "{}/frameworks/stats/reconcile".format(base_url),
+        json={'updated_by': getpass.getuser()},
+        headers={
+            "authorization": "Bearer {}".format(access_token),
+        }
+    )
+
+    if response.status_code != 200:
+        print(response.status_code)
+        print(response.text)
+        return False
+
+    return True
+
+
+if __name__ == "__main__":
+    arguments = docopt(__doc__)
+    ok = reconcile_framework_stats(
+        base_url=arguments['<endpoint>'],
+        access_token=arguments['<access_token>'],
+    )
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""Report which of the special-purpose indexes on `audit_events.data` the `data-contains` filter could replace
+
+`data-supplier-id` and `data-draft-service-id` compare ids as text, so they match events whose ids were stored as
+strings, and `data-supplier-id` also matches the legacy `supplier_id` key. `data-contains` matches JSON values exactly,
+so an index is only redundant once no events need that leniency, which this counts (with a sequential scan of
+`audit_events`). The size and number of scans of each index (since the database's statistics were last reset) are
+reported alongside.
+
+Usage:
+    report_redundant_audit_event_indexes.py [<environment>]
+
+Example:
+    ./report_redundant_audit_event_indexes.py development
+"""
+from __future__ import print_function
+
+from docopt import docopt
+from sqlalchemy import text
+
+from app import create_app, db
+
+SPECIAL_PURPOSE_INDEXES = (
+    (
+        "idx_audit_events_data_supplier_id",
+        "data-supplier-id=<id>",
+        'data-contains={"supplierId": <id>}',
+        """
+            (data ? 'supplier_id' AND NOT data ? 'supplierId')
+            OR (data ? 'supplierId' AND jsonb_typeof(data->'supplierId') <> 'number')
+        """,
+    ),
+    (
+        "idx_audit_events_data_draft_id",
+        "data-draft-service-id=<id>",
+        'data-contains={"draftId": <id>}',
+        "data ? 'draftId' AND jsonb_typeof(data->'draftId') <> 'number'",
+    ),
+)
+
+
+def report_redundant_audit_event_indexes():
+    for index_name, filter_, replacement_filter, missed_events_condition in SPECIAL_PURPOSE_INDEXES:
+        index_size, index_scans = db.session.execute(text("""
+            SELECT pg_size_pretty(pg_relation_size(indexrelid)), idx_scan
+            FROM pg_stat_user_indexes WHERE indexrelname = :index_name
+        """), {"index_name": index_name}).first() or ("-", "-")
+        missed_events = db.session.execute(text(
+            "SELECT count(*) FROM audit_events WHERE {}".format(missed_events_condition)
+        )).scalar()
+
+        print(index_name)
+        print("    size {}, {} scans".format(index_size, index_scans))
+        if missed_events:
+            print("    not redundant: {} would miss {} events found by {}".format(
+                replacement_filter, missed_events, filter_,
+            ))
+        else:
+            print("    redundant: {} finds the same events as {}".format(replacement_filter, filter_))
+
+
+if __name__ == "__main__":
+    arguments = docopt(__doc__)
+    app = create_app(arguments['<environment>'] or "development")
+    with app.app_context():
+        report_redundant_audit_event_indexes()
@@ -2,42 +2,54 @@
 """
 Update a series of suppliers from a file of JSON objects, one per line.
 
-The JSON objects should have an "id" field in them with the supplier ID
-so that the update URL can be generated. The rest of the object should
-be what needs to be updated.
+The JSON objects should have an "id" field in them with the supplier ID.
+The rest of the object should be what needs to be updated.
 
 {"id": 1234, "name": "Foo Bar"}
 
+The whole file is sent to the API's bulk update endpoint, which applies the
+updates in chunks and reports the result of each line.
+
 Usage:
     update-suppliers.py <data_api_endpoint> <data_api_token> <updates_path> <updated_by>
 """
-from docopt import docopt
-from dmapiclient import DataAPIClient
-
-import json
+import sys
 
-
-def load_updates(updates_path):
-    with open(updates_path) as f:
-        for line in f:
-            yield json.loads(line)
+import requests
+from docopt import docopt
 
 
 def update_suppliers(data_api_endpoint, data_api_token, updates_path, updated_by):
-    client = DataAPIClient(data_api_endpoint, data_api_token)
-
-    for update in load_updates(updates_path):
-        print("Updating {}".format(update))
-        client.update_supplier(
-            update.pop('id'),
-            update,
-            updated_by)
+    with open(updates_path, 'rb') as f:
+        response = requests.post(
+            "{}/suppliers/bulk-update".format(data_api_endpoint),
+            params={'updated_by': updated_by},
+            data=f,
+            headers={
+                "content-type": "application/x-ndjson",
+                "authorization": "Bearer {}".format(data_api_token),
+            }
+        )
+    response.raise_for_status()
+
+    response_json = response.json()
+    for result in response_json['results']:
+        if not result.get('updated'):
+            print("Line {}{}: {}".format(
+                result['line'],
+                " (supplier {})".format(result['id']) if result.get('id') else "",
+                result['error'],
+            ))
+
+    print("{updated} updated, {failed} failed".format(**response_json['meta']))
+    return response_json['meta']['failed'] == 0
 
 
 if __name__ == '__main__':
     arguments = docopt(__doc__)
-    update_suppliers(
+    ok = update_suppliers(
         data_api_endpoint=arguments['<data_api_endpoint>'],
         data_api_token=arguments['<data_api_token>'],
         updates_path=arguments['<updates_path>'],
         updated_by=arguments['<updated_by>'])
+    sys.exit(0 if ok else 1)
@@ -39,8 +39,23 @@ def db_migration(request):
         with app.app_context():
             db.session.remove()
             db.engine.execute("drop sequence suppliers_supplier_id_seq cascade")
+            # along with any partitions of them
+            db.engine.execute("drop table audit_events, archived_audit_events cascade")
             db.drop_all()
             db.engine.execute("drop table alembic_version")
+            db.engine.execute("drop table table_generations")
+            db.engine.execute("drop function bump_table_generation()")
+            db.engine.execute("drop function count_supplier_framework_declaration()")
+            db.engine.execute("drop function count_draft_service()")
+            db.engine.execute("drop function track_supplier_user_login()")
+            db.engine.execute("drop table supplier_framework_application_refreshes")
+            db.engine.execute("drop function refresh_queued_supplier_framework_applications()")
+            db.engine.execute("drop function queue_supplier_framework_application_refreshes_for_supplier()")
+            db.engine.execute("drop function queue_supplier_framework_application_refresh()")
+            db.engine.execute("drop function refresh_supplier_framework_application(bigint, integer)")
+            db.engine.execute("drop function notify_audit_events()")
+            db.engine.execute("drop function track_change()")
+            db.engine.execute("drop sequence change_sequence")
             insp = inspect(db.engine)
             for enum in insp.get_enums():
                 db.Enum(name=enum['name']).drop(db.engine)
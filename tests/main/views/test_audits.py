@@ -1,6 +1,8 @@
 # -*- coding: UTF-8 -*-
 from datetime import datetime
 from itertools import chain, repeat
+import threading
+import time
 import mock
 import pytest
 from flask import json
@@ -10,8 +12,9 @@ from freezegun import freeze_time
 from dmapiclient.audit import AuditTypes
 
 from app import db
+from app.audit_utils import archive_audit_event_partitions, partition_audit_events
 from app.models import AuditEvent
-from app.models import Supplier, Service
+from app.models import ArchivedService, Supplier, Service
 from tests.bases import BaseApplicationTest
 from tests.helpers import FixtureMixin
 
@@ -709,6 +712,24 @@ class TestAuditEvents(BaseTestAuditEvents):
         assert response.status_code == 200
         assert len(data['auditEvents']) == 0
 
+    def test_should_only_get_archived_audit_events_if_asked_to(self):
+        self.add_audit_event(user="archived", created_at=datetime(2003, 1, 1))
+        self.add_audit_event(user="current")
+        partition_audit_events(datetime(2003, 2, 1))
+        archive_audit_event_partitions(datetime(2003, 2, 1))
+        db.session.commit()
+
+        for query_string, users in (
+            ('', ['current']),
+            ('?include-archived=true', ['archived', 'current']),
+            ('?include-archived=true&audit-date=2003-01-01', ['archived']),
+            ('?include-archived=true&earliest_for_each_object=true', ['archived']),
+        ):
+            response = self.client.get('/audit-events{}'.format(query_string))
+
+            assert response.status_code == 200
+            assert [audit_event['user'] for audit_event in json.loads(response.get_data())['auditEvents']] == users
+
     @pytest.mark.parametrize(
         ("date_range_query", "number_of_events"),
         (
@@ -1013,6 +1034,36 @@ class TestAuditEvents(BaseTestAuditEvents):
         assert any(audit_event['data'].get('supplier_id') == 3 for audit_event in audit_events)
         assert all(audit_event['data']['info'] == 'hit' for audit_event in audit_events)
 
+    def test_should_get_audit_events_by_data_containing_json(self):
+        for data in (
+            {'draftId': 3, 'supplierId': 1, 'info': 'hit'},
+            {'draftId': 3, 'supplierId': 2, 'info': 'miss'},
+            {'draftId': '3', 'supplierId': 1, 'info': 'miss'},
+            {'draftId': 3, 'supplierId': 1, 'info': 'hit', 'update': {'status': 'submitted'}},
+        ):
+            self.add_audit_event(data=data)
+
+        response = self.client.get('/audit-events?{}'.format(urlencode({
+            'data-contains': json.dumps({'draftId': 3, 'supplierId': 1}),
+        })))
+        audit_events = json.loads(response.get_data())['auditEvents']
+
+        assert response.status_code == 200
+        assert [audit_event['data']['info'] for audit_event in audit_events] == ['hit', 'hit']
+
+        response = self.client.get('/audit-events?{}'.format(urlencode({
+            'data-contains': json.dumps({'update': {'status': 'submitted'}}),
+        })))
+
+        assert response.status_code == 200
+        assert len(json.loads(response.get_data())['auditEvents']) == 1
+
+    @pytest.mark.parametrize("data_contains", ('{"draftId": ', '[3]', '3'))
+    def test_should_reject_data_contains_that_is_not_a_json_object(self, data_contains):
+        response = self.client.get('/audit-events?{}'.format(urlencode({'data-contains': data_contains})))
+
+        assert response.status_code == 400
+
     def test_reject_invalid_audit_id_on_acknowledgement(self):
         res = self.client.post(
             '/audit-events/invalid-id!/acknowledge',
@@ -1261,6 +1312,171 @@ class TestCreateAuditEvent(BaseApplicationTest, FixtureMixin):
         assert data['error'] == "referenced object does not exist"
 
 
+class TestTailAuditEvents(BaseTestAuditEvents):
+    def tail(self, query_string):
+        response = self.client.get('/audit-events/tail?{}'.format(query_string))
+        assert response.status_code == 200
+        return json.loads(response.get_data())
+
+    def test_returns_events_written_since_the_cursor_of_the_types_asked_for(self):
+        cursor = self.tail('timeout=0')['cursor']
+        audit_ids = [
+            self.add_audit_event(type=AuditTypes.supplier_update),
+            self.add_audit_event(type=AuditTypes.contact_update),
+            self.add_audit_event(type=AuditTypes.update_service),
+        ]
+
+        data = self.tail('since={}&types=supplier_update,update_service'.format(cursor))
+
+        assert [audit_event['id'] for audit_event in data['auditEvents']] == [audit_ids[0], audit_ids[2]]
+        assert self.tail('since={}&timeout=0'.format(data['cursor']))['auditEvents'] == []
+
+    def test_returns_no_events_if_none_are_added_before_the_timeout(self):
+        self.add_audit_event()
+
+        start = time.monotonic()
+        data = self.tail('timeout=0.5')
+
+        assert data['auditEvents'] == []
+        assert time.monotonic() - start >= 0.5
+
+    def test_waits_for_new_events(self):
+        cursor = self.tail('timeout=0')['cursor']
+
+        def add_audit_event_later():
+            time.sleep(0.5)
+            with self.app.app_context():
+                self.add_audit_event(user="later")
+
+        thread = threading.Thread(target=add_audit_event_later)
+        thread.start()
+        start = time.monotonic()
+        data = self.tail('since={}&timeout=10'.format(cursor))
+        thread.join()
+
+        assert [audit_event['user'] for audit_event in data['auditEvents']] == ["later"]
+        assert time.monotonic() - start < 10
+
+    def test_holds_back_events_until_earlier_transactions_finish(self):
+        cursor = self.tail('timeout=0')['cursor']
+        connection = db.engine.connect()
+        earlier_transaction = connection.begin()
+        connection.execute("SELECT txid_current()")
+        self.add_audit_event(user="later")
+
+        assert self.tail('since={}&timeout=0'.format(cursor))['auditEvents'] == []
+
+        def add_audit_event_and_commit():
+            time.sleep(0.5)
+            connection.execute(AuditEvent.__table__.insert().values(
+                type=AuditTypes.supplier_update.value, created_at=datetime.utcnow(), user="earlier", data={},
+                acknowledged=False,
+            ))
+            earlier_transaction.commit()
+            connection.close()
+
+        thread = threading.Thread(target=add_audit_event_and_commit)
+        thread.start()
+        data = self.tail('since={}&timeout=10'.format(cursor))
+        thread.join()
+
+        # the earlier transaction's event, though inserted (and committed) after the later one's, isn't missed
+        assert [audit_event['user'] for audit_event in data['auditEvents']] == ["earlier", "later"]
+
+    def test_returns_events_held_back_by_a_transaction_that_finishes_without_adding_any(self):
+        cursor = self.tail('timeout=0')['cursor']
+        connection = db.engine.connect()
+        earlier_transaction = connection.begin()
+        connection.execute("SELECT txid_current()")
+        audit_id = self.add_audit_event()
+
+        def roll_back_later():
+            time.sleep(0.5)
+            earlier_transaction.rollback()
+            connection.close()
+
+        thread = threading.Thread(target=roll_back_later)
+        thread.start()
+        start = time.monotonic()
+        data = self.tail('since={}&timeout=10'.format(cursor))
+        thread.join()
+
+        assert [audit_event['id'] for audit_event in data['auditEvents']] == [audit_id]
+        assert time.monotonic() - start < 10
+
+    @pytest.mark.parametrize("query_string", (
+        "since=one",
+        "since=1.1&timeout=soon",
+        "since=1.1&timeout=31",
+        "since=1.1&timeout=-1",
+        "since=1.1&types=not_an_audit_type",
+    ))
+    def test_rejects_invalid_arguments(self, query_string):
+        response = self.client.get('/audit-events/tail?{}'.format(query_string))
+
+        assert response.status_code == 400
+
+
+class TestListAuditEventServiceDiffs(BaseTestAuditEvents):
+    def setup(self):
+        super().setup()
+        self.setup_dummy_suppliers(2)
+        self.setup_dummy_service("1234123412340001")
+        self.archived_service_ids = [
+            self.setup_dummy_service("1234123412340001", model=ArchivedService, serviceName=service_name)
+            for service_name in ("Pie", "Pies", "More pies")
+        ]
+
+    def add_update_service_event(self, old_archived_service_id, new_archived_service_id):
+        return self.add_audit_event(type=AuditTypes.update_service, data={
+            "serviceId": "1234123412340001",
+            "oldArchivedServiceId": old_archived_service_id,
+            "newArchivedServiceId": new_archived_service_id,
+        })
+
+    def test_lists_diffs_in_the_order_of_the_ids_requested(self):
+        audit_ids = [
+            self.add_update_service_event(None, self.archived_service_ids[0]),
+            self.add_update_service_event(self.archived_service_ids[0], self.archived_service_ids[1]),
+            self.add_update_service_event(self.archived_service_ids[1], self.archived_service_ids[2]),
+            self.add_audit_event(),
+        ]
+
+        response = self.client.get('/audit-events/service-diffs?ids={},{},{},{}'.format(
+            audit_ids[2], audit_ids[3], audit_ids[0], audit_ids[1],
+        ))
+
+        assert response.status_code == 200
+        assert json.loads(response.get_data())["serviceDiffs"] == [
+            {
+                "auditEventId": audit_ids[2],
+                "serviceId": "1234123412340001",
+                "fromArchivedServiceId": self.archived_service_ids[1],
+                "toArchivedServiceId": self.archived_service_ids[2],
+                "changes": [{"op": "changed", "path": ["serviceName"], "from": "Pies", "to": "More pies"}],
+            },
+            {
+                "auditEventId": audit_ids[0],
+                "serviceId": "1234123412340001",
+                "fromArchivedServiceId": None,
+                "toArchivedServiceId": self.archived_service_ids[0],
+                "changes": [{"op": "added", "path": ["serviceName"], "to": "Pie"}],
+            },
+            {
+                "auditEventId": audit_ids[1],
+                "serviceId": "1234123412340001",
+                "fromArchivedServiceId": self.archived_service_ids[0],
+                "toArchivedServiceId": self.archived_service_ids[1],
+                "changes": [{"op": "changed", "path": ["serviceName"], "from": "Pie", "to": "Pies"}],
+            },
+        ]
+
+    def test_invalid_ids(self):
+        response = self.client.get('/audit-events/service-diffs?ids=1,two')
+
+        assert response.status_code == 400
+
+
 class TestGetAuditEvent(BaseTestAuditEvents):
     def test_get_existing_audit_event(self):
         event_ids = self.add_audit_events_with_db_object()
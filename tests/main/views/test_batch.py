@@ -0,0 +1,76 @@
+from flask import json
+import pytest
+
+from tests.bases import BaseApplicationTest, JSONTestMixin
+from tests.helpers import FixtureMixin
+
+
+class TestBatch(BaseApplicationTest, JSONTestMixin, FixtureMixin):
+    method = 'post'
+    endpoint = '/batch'
+
+    def setup(self):
+        super(TestBatch, self).setup()
+        self.setup_dummy_suppliers(2)
+        self.setup_dummy_service("1234123412340001", supplier_id=1)
+
+    def batch(self, paths):
+        return self.client.post(
+            '/batch',
+            data=json.dumps({'requests': [{'path': path} for path in paths]}),
+            content_type='application/json',
+        )
+
+    def test_responds_as_each_request_would_on_its_own(self):
+        paths = ['/suppliers/1', '/services?supplier_id=1', '/suppliers/100', '/services?page=x']
+
+        response = self.batch(paths)
+
+        assert response.status_code == 200
+        assert json.loads(response.get_data()) == {'responses': [
+            {
+                'status': self.client.get(path).status_code,
+                'body': json.loads(self.client.get(path).get_data()),
+            }
+            for path in paths
+        ]}
+
+    def test_empty_batch(self):
+        response = self.batch([])
+
+        assert response.status_code == 200
+        assert json.loads(response.get_data()) == {'responses': []}
+
+    def test_sub_requests_are_gets(self):
+        response = self.batch(['/batch'])
+
+        assert json.loads(response.get_data())['responses'][0]['status'] == 405
+
+    def test_too_many_requests(self):
+        self.app.config['DM_API_BATCH_MAX_REQUESTS'] = 2
+
+        response = self.batch(['/suppliers/0', '/suppliers/1', '/suppliers/0'])
+
+        assert response.status_code == 400
+        assert 'at most 2 requests' in json.loads(response.get_data())['error']
+
+    @pytest.mark.parametrize('requests', (
+        {'path': '/suppliers/1'},
+        ['/suppliers/1'],
+        [{'path': 'suppliers/1'}],
+        [{'path': '//example.com/suppliers/1'}],
+        [{'url': '/suppliers/1'}],
+    ))
+    def test_invalid_requests(self, requests):
+        response = self.client.post(
+            '/batch',
+            data=json.dumps({'requests': requests}),
+            content_type='application/json',
+        )
+
+        assert response.status_code == 400
+
+    def test_requests_are_required(self):
+        response = self.client.post('/batch', data=json.dumps({}), content_type='application/json')
+
+        assert response.status_code == 400
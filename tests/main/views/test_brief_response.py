@@ -2,6 +2,7 @@
 from datetime import datetime, timedelta
 from freezegun import freeze_time
 import json
+from operator import itemgetter
 import mock
 import pytest
 
@@ -739,6 +740,29 @@ class TestListBriefResponses(BaseBriefResponseTest):
         assert all("essentialRequirementsMet" in br for br in data['briefResponses'])
         assert all(("essentialRequirements" in br) == (not without_data) for br in data['briefResponses'])
 
+    @pytest.mark.parametrize("fields", (
+        "",
+        "essentialRequirementsMet,respondToEmailAddress,notAKey",
+        "brief,supplierName,supplierOrganisationSize,status,submittedAt,links",
+        "awardDetails,awardedAt,createdAt",
+    ))
+    @pytest.mark.parametrize("parameters", ({}, {"supplier_id": 0}))
+    def test_list_brief_responses_with_fields(self, fields, parameters):
+        self.setup_dummy_brief_response()
+        self.setup_dummy_brief_response(award_details={"pending": True})
+        self.setup_dummy_awarded_brief_response(brief_id=111)
+        requested = ["id"] + fields.split(",")
+
+        res = self.list_brief_responses({"fields": fields, **parameters})
+        full_res = self.list_brief_responses(parameters)
+
+        assert res.status_code == full_res.status_code == 200
+        # brief responses aren't listed in any particular order
+        assert sorted(json.loads(res.get_data(as_text=True))["briefResponses"], key=itemgetter("id")) == [
+            {key: br[key] for key in requested if key in br}
+            for br in sorted(json.loads(full_res.get_data(as_text=True))["briefResponses"], key=itemgetter("id"))
+        ]
+
     def test_list_brief_responses_pagination(self):
         for i in range(8):
             self.setup_dummy_brief_response()
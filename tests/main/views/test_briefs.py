@@ -472,6 +472,45 @@ class TestGetBrief(FrameworkSetupAndTeardown):
 
         assert res.status_code == 404
 
+    def test_get_brief_returns_304_for_matching_etag(self):
+        self.setup_dummy_briefs(1, status='live')
+        etag = self.client.get('/briefs/1').headers['ETag']
+
+        res = self.client.get('/briefs/1', headers={'If-None-Match': etag})
+
+        assert res.status_code == 304
+        assert res.headers['ETag'] == etag
+
+    def test_get_brief_etag_changes_when_brief_closes(self):
+        with freeze_time('2016-01-01 12:00:00'):
+            self.setup_dummy_briefs(1, status='live')
+            etag = self.client.get('/briefs/1').headers['ETag']
+
+        with freeze_time('2016-03-01 12:00:00'):
+            res = self.client.get('/briefs/1', headers={'If-None-Match': etag})
+
+        assert res.status_code == 200
+        assert res.headers['ETag'] != etag
+        assert json.loads(res.get_data(as_text=True))['briefs']['status'] == 'closed'
+
+    def test_get_brief_etag_changes_when_clarification_question_added(self):
+        self.setup_dummy_briefs(1, status='live')
+        etag = self.client.get('/briefs/1').headers['ETag']
+
+        self.client.post(
+            "/briefs/1/clarification-questions",
+            data=json.dumps({
+                "clarificationQuestion": {"question": "What?", "answer": "That"},
+                "updated_by": "joeblogs",
+            }),
+            content_type="application/json",
+        )
+
+        res = self.client.get('/briefs/1', headers={'If-None-Match': etag})
+
+        assert res.status_code == 200
+        assert len(json.loads(res.get_data(as_text=True))['briefs']['clarificationQuestions']) == 1
+
 
 class TestListBrief(FrameworkSetupAndTeardown):
     def test_list_briefs(self):
@@ -680,6 +719,40 @@ class TestListBrief(FrameworkSetupAndTeardown):
         assert response.status_code == 200
         assert "clarificationQuestions" not in data['briefs'][0]
 
+    @pytest.mark.parametrize("fields", (
+        "",
+        "title,location,notAKey",
+        "status,applicationsClosedAt,clarificationQuestionsAreClosed,awardedBriefResponseId,withdrawnAt",
+        "framework,frameworkSlug,lotName,publishedAt,createdAt,links",
+        "users,clarificationQuestions,title",
+    ))
+    @pytest.mark.parametrize("user_id", ["&user_id=123", ""])
+    def test_list_briefs_with_fields(self, fields, user_id):
+        self.setup_dummy_briefs(1, title="Live brief", user_id=123, add_clarification_question=True, status='live')
+        self.setup_dummy_briefs(1, title="Draft brief", user_id=123, status='draft', brief_start=2)
+        self.setup_dummy_briefs(1, title="Withdrawn brief", user_id=123, status='withdrawn', brief_start=3)
+        self.setup_dummy_briefs(1, title="Awarded brief", user_id=123, status='closed', brief_start=4)
+        self.setup_dummy_suppliers(1)
+        db.session.add(BriefResponse(brief_id=4, supplier_id=0, submitted_at=datetime.utcnow(), data={}))
+        db.session.commit()
+        BriefResponse.query.filter(BriefResponse.brief_id == 4).update({
+            'award_details': {'pending': True}, 'awarded_at': datetime.utcnow(),
+        })
+        db.session.commit()
+        requested = ['id'] + fields.split(',')
+
+        # (each streamed response is read before the next request is made, as its request context lasts until then)
+        response = self.client.get('/briefs?fields=' + fields + user_id)
+        assert response.status_code == 200
+        briefs = json.loads(response.get_data(as_text=True))['briefs']
+
+        full_response = self.client.get('/briefs?with_users=true&with_clarification_questions=true' + user_id)
+        assert full_response.status_code == 200
+        assert briefs == [
+            {key: brief[key] for key in requested if key in brief}
+            for brief in json.loads(full_response.get_data(as_text=True))['briefs']
+        ]
+
     def test_list_briefs_pagination_page_one(self):
         self.setup_dummy_briefs(7)
 
@@ -0,0 +1,57 @@
+from flask import json
+import pytest
+
+from app import db
+from app.models import Supplier
+from tests.bases import BaseApplicationTest
+from tests.helpers import FixtureMixin
+
+
+class TestListChanges(BaseApplicationTest, FixtureMixin):
+    def setup(self):
+        super(TestListChanges, self).setup()
+        self.setup_dummy_suppliers(2)
+        self.setup_dummy_service("1234123412340001", supplier_id=1)
+        self.setup_dummy_user(id=1)
+        self.brief_id = self.setup_dummy_brief(id=1, data={"title": "A brief"}).id
+
+    def list_changes(self, query_string=''):
+        response = self.client.get('/changes{}'.format(query_string))
+        assert response.status_code == 200
+        return json.loads(response.get_data())
+
+    def test_lists_objects_in_the_order_they_were_written(self):
+        data = self.list_changes()
+
+        assert [(change['objectType'], change['objectId']) for change in data['changes']] == [
+            ('suppliers', 0),
+            ('suppliers', 1),
+            ('services', "1234123412340001"),
+            ('briefs', self.brief_id),
+        ]
+        assert data['changes'][2]['object']['serviceName'] == "Service 1234123412340001"
+        assert data['cursor'] in data['links']['next']
+
+    def test_lists_objects_written_since_the_cursor(self):
+        cursor = self.list_changes()['cursor']
+        assert self.list_changes('?since={}'.format(cursor))['changes'] == []
+
+        Supplier.query.filter(Supplier.supplier_id == 0).update({'name': 'Renamed supplier'})
+        db.session.commit()
+
+        data = self.list_changes('?since={}'.format(cursor))
+        assert [(change['objectType'], change['object']['name']) for change in data['changes']] == [
+            ('suppliers', 'Renamed supplier'),
+        ]
+        assert data['cursor'] != cursor
+
+    def test_lists_changes_of_the_types_asked_for(self):
+        data = self.list_changes('?types=briefs,services')
+
+        assert [change['objectType'] for change in data['changes']] == ['services', 'briefs']
+
+    @pytest.mark.parametrize('query_string', ('?since=yesterday', '?since=1', '?types=users', '?types=services,'))
+    def test_rejects_invalid_arguments(self, query_string):
+        response = self.client.get('/changes{}'.format(query_string))
+
+        assert response.status_code == 400
@@ -682,18 +682,34 @@ class TestCopyPublishedFromFramework(DraftsHelpersMixin):
 
         assert "Could not commit" in json.loads(res.get_data())['error']
 
-    def test_uses_with_for_update_for_isolation(self):
-        filter_mock = mock.Mock()
-        filter_mock.with_for_update.return_value = Service.query
-        query_patch = mock.patch('app.main.views.drafts.Service.query')
-        query = query_patch.start()
-        query.filter.return_value = filter_mock
+    def test_should_not_copy_services_that_have_already_been_copied(self):
+        self.setup_dummy_services(3, supplier_id=1, lot_id=2)
 
-        self.post_to_copy_published_from_framework()
+        res = self.post_to_copy_published_from_framework()
+        assert res.status_code == 201
+        assert json.loads(res.get_data(as_text=True))['services']['draftsCreatedCount'] == 3
 
-        query_patch.stop()
+        res = self.post_to_copy_published_from_framework()
+        assert res.status_code == 201
+        assert json.loads(res.get_data(as_text=True))['services']['draftsCreatedCount'] == 0
 
-        filter_mock.with_for_update.assert_called_once_with(of=Service)
+        assert DraftService.query.count() == 3
+        assert AuditEvent.query.count() == 3
+
+    def test_audit_events_reference_the_created_drafts(self):
+        self.setup_dummy_services(3, supplier_id=1, lot_id=2)
+
+        res = self.post_to_copy_published_from_framework()
+        assert res.status_code == 201
+
+        draft_ids = {draft.id for draft in DraftService.query.all()}
+        audit_events = AuditEvent.query.all()
+
+        assert {audit_event.data['draftId'] for audit_event in audit_events} == draft_ids
+        assert all(
+            (audit_event.object_type, audit_event.object_id) == ('DraftService', audit_event.data['draftId'])
+            for audit_event in audit_events
+        )
 
 
 class TestDraftServices(DraftsHelpersMixin):
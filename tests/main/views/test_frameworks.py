@@ -12,6 +12,7 @@ from tests.bases import BaseApplicationTest, JSONUpdateTestMixin
 from app.models import db, Framework, SupplierFramework, DraftService, User, FrameworkLot, AuditEvent, Brief
 from tests.helpers import FixtureMixin
 from app.main.views.frameworks import FRAMEWORK_UPDATE_WHITELISTED_ATTRIBUTES_MAP
+from app.utils import list_result_response
 
 
 class TestListFrameworks(BaseApplicationTest):
@@ -45,6 +46,37 @@ class TestListFrameworks(BaseApplicationTest):
             'hasFurtherCompetition',
         ])
 
+    def test_response_is_cached_until_frameworks_change(self):
+        with mock.patch(
+            'app.main.views.frameworks.list_result_response', wraps=list_result_response
+        ) as list_result_response_mock:
+            first_response = self.client.get('/frameworks')
+            second_response = self.client.get('/frameworks')
+
+            assert list_result_response_mock.call_count == 1
+            assert second_response.get_data() == first_response.get_data()
+
+            # framework agreement details are reset on teardown
+            Framework.query.filter(Framework.slug == 'g-cloud-7').update(
+                {'framework_agreement_details': {'frameworkAgreementVersion': 'v99'}}
+            )
+            db.session.commit()
+            third_response = self.client.get('/frameworks')
+
+            assert list_result_response_mock.call_count == 2
+            assert "v99" in third_response.get_data(as_text=True)
+
+    def test_response_is_not_cached_when_cache_is_disabled(self):
+        self.app.config['DM_API_RESPONSE_CACHE_BACKEND'] = None
+
+        with mock.patch(
+            'app.main.views.frameworks.list_result_response', wraps=list_result_response
+        ) as list_result_response_mock:
+            self.client.get('/frameworks')
+            self.client.get('/frameworks')
+
+            assert list_result_response_mock.call_count == 2
+
 
 class TestCreateFramework(BaseApplicationTest):
     def framework(self, **kwargs):
@@ -251,6 +283,26 @@ class TestGetFramework(BaseApplicationTest):
 
         assert response.status_code == 404
 
+    def test_returns_304_for_matching_etag(self):
+        etag = self.client.get('/frameworks/g-cloud-7').headers['ETag']
+
+        response = self.client.get('/frameworks/g-cloud-7', headers={'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+
+    def test_etag_changes_when_framework_is_updated(self):
+        etag = self.client.get('/frameworks/g-cloud-7').headers['ETag']
+        Framework.query.filter(Framework.slug == 'g-cloud-7').update(
+            {'framework_agreement_details': {'frameworkAgreementVersion': 'v99'}}
+        )
+        db.session.commit()
+
+        response = self.client.get('/frameworks/g-cloud-7', headers={'If-None-Match': etag})
+
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
 
 class TestUpdateFramework(BaseApplicationTest, JSONUpdateTestMixin, FixtureMixin):
     endpoint = '/frameworks/example'
@@ -728,6 +780,109 @@ class TestFrameworkStats(BaseApplicationTest, FixtureMixin):
 
         assert response.status_code == 200
 
+    def test_stats_follow_changes_to_drafts_and_logins(self):
+        self.setup_data('g-cloud-7')
+        framework = Framework.query.filter(Framework.slug == 'g-cloud-7').first()
+
+        DraftService.query.filter(
+            DraftService.framework_id == framework.id,
+            DraftService.supplier_id != 14,
+        ).delete(synchronize_session=False)
+        DraftService.query.filter(
+            DraftService.framework_id == framework.id,
+        ).update({DraftService.status: 'not-submitted'}, synchronize_session=False)
+        User.query.filter(User.supplier_id.in_([6, 7, 8, 9])).update(
+            {User.logged_in_at: datetime.datetime.utcnow()}, synchronize_session=False
+        )
+        db.session.commit()
+
+        response = self.client.get('/frameworks/g-cloud-7/stats')
+        data = json.loads(response.get_data())
+
+        # only supplier 14's 10 drafts are left, all unsubmitted, and its declaration was never started
+        assert {(row['status'], row['declaration_made']) for row in data['services']} == {('not-submitted', False)}
+        assert sum(row['count'] for row in data['services']) == 10
+        assert data['interested_suppliers'] == [
+            {u'count': 8, u'declaration_status': None, u'has_completed_services': False},
+            {u'count': 6, u'declaration_status': 'complete', u'has_completed_services': False},
+            {u'count': 6, u'declaration_status': 'started', u'has_completed_services': False},
+        ]
+        assert data['supplier_users'] == [
+            {u'count': 2, u'recent_login': None},
+            {u'count': 9, u'recent_login': True},
+        ]
+
+    def test_draft_counters_are_deleted_rather_than_left_at_zero(self):
+        self.setup_data('g-cloud-7')
+        framework = Framework.query.filter(Framework.slug == 'g-cloud-7').first()
+
+        DraftService.query.filter(DraftService.framework_id == framework.id).delete(synchronize_session=False)
+        db.session.commit()
+
+        assert db.session.execute(
+            "SELECT count(*) FROM framework_draft_service_counts WHERE framework_id = :framework_id",
+            {'framework_id': framework.id},
+        ).scalar() == 0
+
+    def test_stats_ignore_counters_at_zero(self):
+        self.setup_data('g-cloud-7')
+        framework = Framework.query.filter(Framework.slug == 'g-cloud-7').first()
+        DraftService.query.filter(DraftService.framework_id == framework.id).delete(synchronize_session=False)
+        db.session.execute(
+            "INSERT INTO framework_draft_service_counts (framework_id, supplier_id, lot_id, status, count) "
+            "SELECT :framework_id, 1, lot_id, 'submitted', 0 FROM framework_lots WHERE framework_id = :framework_id",
+            {'framework_id': framework.id},
+        )
+        db.session.commit()
+
+        data = json.loads(self.client.get('/frameworks/g-cloud-7/stats').get_data())
+
+        assert data['services'] == []
+        assert not any(row['has_completed_services'] for row in data['interested_suppliers'])
+
+    def test_supplier_users_follow_role_changes_and_deletions(self):
+        self.setup_data('g-cloud-7')
+        User.query.filter(User.supplier_id.in_([1, 2])).update(
+            {User.role: 'buyer', User.supplier_id: None}, synchronize_session=False
+        )
+        User.query.filter(User.supplier_id == 10).delete(synchronize_session=False)
+        db.session.commit()
+
+        data = json.loads(self.client.get('/frameworks/g-cloud-7/stats').get_data())
+
+        assert data['supplier_users'] == [
+            {u'count': 4, u'recent_login': False},
+            {u'count': 1, u'recent_login': None},
+            {u'count': 3, u'recent_login': True},
+        ]
+
+    def test_reconcile_rebuilds_stats(self):
+        self.setup_data('g-cloud-7')
+        expected = json.loads(self.client.get('/frameworks/g-cloud-7/stats').get_data())
+
+        db.session.execute(
+            "DELETE FROM framework_draft_service_counts; UPDATE supplier_user_logins SET logged_in_at = NULL"
+        )
+        db.session.commit()
+        assert json.loads(self.client.get('/frameworks/g-cloud-7/stats').get_data()) != expected
+
+        response = self.client.post(
+            '/frameworks/stats/reconcile',
+            data=json.dumps({'updated_by': 'example'}),
+            content_type='application/json'
+        )
+        assert response.status_code == 200
+
+        assert json.loads(self.client.get('/frameworks/g-cloud-7/stats').get_data()) == expected
+
+    def test_reconcile_requires_updated_by(self):
+        response = self.client.post(
+            '/frameworks/stats/reconcile',
+            data=json.dumps({}),
+            content_type='application/json'
+        )
+        assert response.status_code == 400
+
 
 class TestGetFrameworkSuppliers(BaseApplicationTest, FixtureMixin):
     def setup(self):
@@ -1274,6 +1429,9 @@ class TestTransitionDosFramework(BaseApplicationTest, FixtureMixin):
             (audit.data["previousFrameworkId"], audit.data["newFrameworkId"]) == (101, 102) for audit in brief_audits
         )
         assert {audit.data["briefId"] for audit in brief_audits} == draft_brief_ids
+        assert all(
+            (audit.object_type, audit.object_id) == ("Brief", audit.data["briefId"]) for audit in brief_audits
+        )
 
         # Assert the frameworks statuses were correctly changed and timestamps set
         expired_framework = Framework.query.get(101)
@@ -7,8 +7,10 @@ from app.models import Service, Supplier, ContactInformation, Framework, \
 import mock
 import pytest
 from app import db, create_app
+from app.sparse_fieldsets import with_fields
 from tests.helpers import TEST_SUPPLIERS_COUNT, FixtureMixin, load_example_listing
 from tests.bases import BaseApplicationTest, JSONUpdateTestMixin, WSGIApplicationWithEnvironment
+from sqlalchemy import inspect
 from sqlalchemy.exc import IntegrityError
 from dmapiclient import HTTPError
 from dmutils.formats import DATETIME_FORMAT
@@ -479,6 +481,89 @@ class TestListServices(BaseApplicationTest, FixtureMixin):
             assert len(response.get_data()) > 9000
 
 
+class TestListServicesByIds(BaseApplicationTest, FixtureMixin):
+    def setup(self):
+        super(TestListServicesByIds, self).setup()
+        self.setup_dummy_suppliers(2)
+        for service_id, supplier_id, status in (
+            ('10000000001', 0, 'published'),
+            ('10000000002', 1, 'disabled'),
+            ('10000000003', 0, 'published'),
+        ):
+            self.setup_dummy_service(service_id=service_id, supplier_id=supplier_id, status=status)
+
+    def test_lists_services_in_the_order_of_the_ids(self):
+        response = self.client.get('/services?ids=10000000003,10000000002,10000000009,10000000001,10000000003')
+
+        assert response.status_code == 200
+        services = json.loads(response.get_data())['services']
+        assert [(service['id'], service['supplierId'], service['status']) for service in services] == [
+            ('10000000003', 0, 'published'),
+            ('10000000002', 1, 'disabled'),
+            ('10000000001', 0, 'published'),
+        ]
+
+    def test_too_many_ids(self):
+        self.app.config['DM_API_MULTI_GET_MAX_IDS'] = 2
+
+        response = self.client.get('/services?ids=10000000001,10000000002,10000000003')
+
+        assert response.status_code == 400
+
+
+class TestListServicesWithFields(BaseApplicationTest, FixtureMixin):
+    def setup(self):
+        super(TestListServicesWithFields, self).setup()
+        self.setup_dummy_suppliers(2)
+        self.setup_dummy_service('10000000001', supplier_id=0, serviceName='First service', serviceTypes=['a', 'b'])
+        self.setup_dummy_service('10000000002', supplier_id=1, status='disabled', serviceName='Second service')
+
+    def list_services(self, query_string):
+        response = self.client.get('/services', query_string=query_string)
+        assert response.status_code == 200
+        return json.loads(response.get_data())['services']
+
+    @pytest.mark.parametrize('fields', (
+        '',
+        'serviceName',
+        'serviceName,serviceTypes,notAKey',
+        'supplierName,frameworkSlug,lotName,status,updatedAt,links',
+        'serviceTypes,serviceName,serviceTypes,id',
+    ))
+    @pytest.mark.parametrize('query_string', (
+        {},
+        {'supplier_id': 0},
+        {'ids': '10000000001,10000000002'},
+    ))
+    def test_lists_only_the_requested_fields(self, fields, query_string):
+        requested = ['id'] + fields.split(',')
+
+        services = self.list_services(dict(query_string, fields=fields))
+
+        assert services == [
+            {key: service[key] for key in requested if key in service}
+            for service in self.list_services(query_string)
+        ]
+
+    def test_does_not_load_data_or_unrequested_relationships(self):
+        services = with_fields(
+            Service.query.order_by(Service.id), Service, ['id', 'serviceName', 'supplierName'],
+        ).all()
+
+        assert [inspect(service).unloaded >= {'data', 'framework', 'lot'} for service in services] == [True, True]
+        assert [service.projected_data for service in services] == [
+            {'serviceName': 'First service'},
+            {'serviceName': 'Second service'},
+        ]
+
+    def test_too_many_fields(self):
+        self.app.config['DM_API_SPARSE_FIELDSETS_MAX_FIELDS'] = 2
+
+        response = self.client.get('/services?fields=serviceName,serviceTypes')
+
+        assert response.status_code == 400
+
+
 class TestPostService(BaseApplicationTest, JSONUpdateTestMixin, FixtureMixin):
     endpoint = '/services/{self.service_id}'
     method = 'post'
@@ -957,7 +1042,7 @@ class TestPostService(BaseApplicationTest, JSONUpdateTestMixin, FixtureMixin):
         assert response.status_code == 200, response.get_data()
 
 
-class TestUpdateServiceStatus(BaseApplicationTest, FixtureMixin):
+class TestUpdateServiceStatusBase(BaseApplicationTest, FixtureMixin):
     def setup(self):
         super().setup()
         self.services = {}
@@ -989,6 +1074,8 @@ class TestUpdateServiceStatus(BaseApplicationTest, FixtureMixin):
         return Service.query.filter(
             Service.service_id == service_id).first()
 
+
+class TestUpdateServiceStatus(TestUpdateServiceStatusBase):
     def _post_update_status(
         self,
         old_status,
@@ -1132,6 +1219,128 @@ class TestUpdateServiceStatus(BaseApplicationTest, FixtureMixin):
         assert response.status_code == 200
 
 
+class TestBulkUpdateServiceStatus(TestUpdateServiceStatusBase):
+    def _post_bulk_update_status(self, new_status, payload, query_string=""):
+        return self.client.post(
+            '/services/status/{}{}'.format(new_status, query_string),
+            data=json.dumps({'updated_by': 'joeblogs', **payload}),
+            content_type='application/json'
+        )
+
+    def test_updates_archives_and_audits_all_listed_services(self):
+        service_ids = [self.services['enabled']['id'], self.services['published']['id']]
+
+        with mock.patch('app.service_utils.index_object'), mock.patch('app.service_utils.search_api_client'):
+            response = self._post_bulk_update_status('disabled', {'serviceIds': service_ids})
+
+        assert response.status_code == 200
+        assert json.loads(response.get_data())['services'] == [
+            {'id': service_id, 'status': 'disabled'} for service_id in service_ids
+        ]
+
+        for service_id in service_ids:
+            assert self._get_service_from_database_by_service_id(service_id).status == 'disabled'
+        assert self._get_service_from_database_by_service_id(self.services['disabled']['id']).status == 'disabled'
+
+        archived_services = ArchivedService.query.filter(ArchivedService.service_id.in_(service_ids)).all()
+        assert sorted(archived.service_id for archived in archived_services) == sorted(service_ids)
+        assert all(archived.status == 'disabled' for archived in archived_services)
+
+        audit_events = AuditEvent.query.filter(AuditEvent.type == AuditTypes.update_service_status.value).all()
+        assert sorted(
+            (audit.data['serviceId'], audit.data['old_status'], audit.data['new_status']) for audit in audit_events
+        ) == sorted([
+            (self.services['enabled']['id'], 'enabled', 'disabled'),
+            (self.services['published']['id'], 'published', 'disabled'),
+        ])
+        assert all(audit.data['oldArchivedServiceId'] is None for audit in audit_events)
+        assert {audit.data['newArchivedServiceId'] for audit in audit_events} == {
+            archived.id for archived in archived_services
+        }
+        assert all(audit.object_type == 'Service' for audit in audit_events)
+
+    def test_selects_services_by_supplier_and_framework(self):
+        framework_slug = self._get_service_from_database_by_service_id(self.services['enabled']['id']).framework.slug
+
+        with mock.patch('app.service_utils.index_object'), mock.patch('app.service_utils.search_api_client'):
+            response = self._post_bulk_update_status('disabled', {'supplierId': 1, 'frameworkSlug': framework_slug})
+
+        assert response.status_code == 200
+        assert len(json.loads(response.get_data())['services']) == 3
+        assert Service.query.filter(Service.status != 'disabled').count() == 0
+        assert AuditEvent.query.filter(AuditEvent.type == AuditTypes.update_service_status.value).count() == 3
+
+    def test_old_archived_service_ids_refer_to_the_latest_archive(self):
+        service_id = self.services['enabled']['id']
+        with mock.patch('app.service_utils.index_object'), mock.patch('app.service_utils.search_api_client'):
+            self._post_bulk_update_status('disabled', {'serviceIds': [service_id]})
+            self._post_bulk_update_status('enabled', {'serviceIds': [service_id]})
+
+        first_archive, second_archive = ArchivedService.query.filter(
+            ArchivedService.service_id == service_id
+        ).order_by(ArchivedService.id).all()
+        latest_audit = AuditEvent.query.filter(
+            AuditEvent.type == AuditTypes.update_service_status.value
+        ).order_by(AuditEvent.id.desc()).first()
+
+        assert latest_audit.data['oldArchivedServiceId'] == first_archive.id
+        assert latest_audit.data['newArchivedServiceId'] == second_archive.id
+
+    @pytest.mark.parametrize("wait_for_index,expect_wait_for_index", (
+        ("?wait-for-index=true", True),
+        ("", False),
+    ))
+    def test_updates_search_index_for_changed_services_only(self, wait_for_index, expect_wait_for_index):
+        service_ids = [self.services[status]['id'] for status in ('enabled', 'published', 'disabled')]
+
+        with mock.patch('app.service_utils.index_object') as index_object:
+            with mock.patch('app.service_utils.search_api_client') as search_api_client:
+                response = self._post_bulk_update_status('published', {'serviceIds': service_ids}, wait_for_index)
+
+        assert response.status_code == 200
+        assert index_object.mock_calls == [
+            mock.call(
+                doc_type="services",
+                framework=mock.ANY,
+                object_id=service_id,
+                serialized_object=mock.ANY,
+                wait_for_response=expect_wait_for_index,
+            ) for service_id in sorted(
+                (self.services['enabled']['id'], self.services['disabled']['id']),
+                key=lambda service_id: Service.query.filter(Service.service_id == service_id).one().id,
+            )
+        ]
+        assert search_api_client.delete.mock_calls == []
+
+    def test_404s_if_any_service_does_not_exist(self):
+        response = self._post_bulk_update_status(
+            'disabled', {'serviceIds': [self.services['enabled']['id'], '1234567890123456']}
+        )
+
+        assert response.status_code == 404
+        assert '1234567890123456' in json.loads(response.get_data())['error']
+        assert self._get_service_from_database_by_service_id(self.services['enabled']['id']).status == 'enabled'
+        assert ArchivedService.query.count() == 0
+
+    def test_400s_for_invalid_status(self):
+        response = self._post_bulk_update_status('suspended', {'serviceIds': [self.services['enabled']['id']]})
+
+        assert response.status_code == 400
+        assert "'suspended' is not a valid status" in json.loads(response.get_data())['error']
+
+    def test_400s_if_both_service_ids_and_supplier_are_given(self):
+        response = self._post_bulk_update_status(
+            'disabled', {'serviceIds': [self.services['enabled']['id']], 'supplierId': 1, 'frameworkSlug': 'g-cloud-6'}
+        )
+
+        assert response.status_code == 400
+
+    def test_400s_if_no_services_are_selected(self):
+        response = self._post_bulk_update_status('disabled', {'serviceIds': []})
+
+        assert response.status_code == 400
+
+
 class TestPutService(BaseApplicationTest, JSONUpdateTestMixin, FixtureMixin):
     method = "put"
     endpoint = "/services/{self.service_id}"
@@ -1568,6 +1777,133 @@ class TestPutService(BaseApplicationTest, JSONUpdateTestMixin, FixtureMixin):
         assert response.status_code == 201
 
 
+@mock.patch('app.service_import_utils.index_service', autospec=True)
+class TestImportServices(BaseApplicationTest, FixtureMixin):
+    def setup(self):
+        super(TestImportServices, self).setup()
+        self.setup_dummy_suppliers(2)
+        db.session.commit()
+
+    def _service(self, service_id, **kwargs):
+        service = load_example_listing("G6-SaaS")
+        service.update(id=service_id, **kwargs)
+        return service
+
+    def _import(self, lines, updated_by='joeblogs', content_type='application/x-ndjson'):
+        return self.client.post(
+            '/services/import?updated_by={}'.format(updated_by),
+            data="\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines),
+            content_type=content_type,
+        )
+
+    def test_imports_services_in_chunks(self, index_service):
+        # Test chunk size is 2
+        service_ids = ["1234567890123456", "1234567890123457", "1234567890123458"]
+        response = self._import([self._service(service_id) for service_id in service_ids])
+
+        assert response.status_code == 200
+        data = json.loads(response.get_data())
+        assert data['meta'] == {'created': 3, 'failed': 0}
+        assert data['results'] == [
+            {'line': 1, 'id': service_ids[0], 'created': True},
+            {'line': 2, 'id': service_ids[1], 'created': True},
+            {'line': 3, 'id': service_ids[2], 'created': True},
+        ]
+
+        services = Service.query.filter(Service.service_id.in_(service_ids)).order_by(Service.service_id).all()
+        assert [service.service_id for service in services] == service_ids
+        assert all(service.status == 'published' for service in services)
+        assert all(service.framework.slug == 'g-cloud-6' and service.lot.slug == 'saas' for service in services)
+        assert all('id' not in service.data and 'supplierId' not in service.data for service in services)
+
+        # the indexed instances are detached by the end of the request, so are matched on their identity
+        indexed_pks = sorted(inspect(call[0][0]).identity[0] for call in index_service.call_args_list)
+        assert indexed_pks == sorted(service.id for service in services)
+        assert all(call[1] == {'wait_for_response': False} for call in index_service.call_args_list)
+
+    def test_archives_and_audits_imported_services(self, index_service):
+        response = self._import([self._service("1234567890123456")])
+        assert response.status_code == 200
+
+        service = Service.query.filter(Service.service_id == "1234567890123456").one()
+        archived_service = ArchivedService.query.filter(ArchivedService.service_id == "1234567890123456").one()
+        assert archived_service.data == service.data
+
+        audit = AuditEvent.query.filter(AuditEvent.type == AuditTypes.import_service.value).one()
+        assert audit.user == 'joeblogs'
+        assert audit.object == service
+        assert audit.data == {
+            'serviceId': "1234567890123456",
+            'oldArchivedServiceId': None,
+            'newArchivedServiceId': archived_service.id,
+            'supplierName': service.supplier.name,
+            'supplierId': service.supplier_id,
+        }
+
+    def test_reports_failed_lines_and_imports_the_rest(self, index_service):
+        self.setup_dummy_service("1234567890123450")
+        invalid_service = self._service("1234567890123452")
+        invalid_service['serviceName'] = 123
+
+        response = self._import([
+            self._service("1234567890123450"),
+            "not json",
+            "",
+            self._service("1234567890123451", supplierId=999),
+            invalid_service,
+            self._service("1234567890123453", lot="not-a-lot"),
+            self._service("1234567890123454"),
+            self._service("1234567890123454"),
+        ])
+
+        assert response.status_code == 200
+        data = json.loads(response.get_data())
+        assert data['meta'] == {'created': 1, 'failed': 6}
+        assert 'serviceName' in data['results'][3].pop('error')
+        assert data['results'] == [
+            {'line': 1, 'id': "1234567890123450", 'error': "Cannot update service by PUT"},
+            {'line': 2, 'error': "Invalid JSON"},
+            {'line': 4, 'id': "1234567890123451", 'error': "Invalid supplier ID '999'"},
+            {'line': 5, 'id': "1234567890123452"},
+            {'line': 6, 'id': "1234567890123453", 'error': "Incorrect lot 'not-a-lot' for framework 'g-cloud-6'"},
+            {'line': 7, 'id': "1234567890123454", 'created': True},
+            {'line': 8, 'id': "1234567890123454", 'error': "Cannot update service by PUT"},
+        ]
+        assert Service.query.filter(Service.service_id == "1234567890123454").count() == 1
+
+    def test_reports_each_line_of_a_chunk_the_database_rejects(self, index_service):
+        # Test chunk size is 2
+        response = self._import([
+            self._service("1234567890123456"),
+            self._service("1234567890123457", createdAt="not a date"),
+            self._service("1234567890123458"),
+        ])
+
+        assert response.status_code == 200
+        data = json.loads(response.get_data())
+        assert data['meta'] == {'created': 1, 'failed': 2}
+        assert [result.get('created') for result in data['results']] == [None, None, True]
+        assert all('not a date' in data['results'][i]['error'] for i in (0, 1))
+        assert [service.service_id for service in Service.query.all()] == ["1234567890123458"]
+        assert index_service.call_count == 1
+
+    def test_should_400_without_ndjson_content_type(self, index_service):
+        response = self._import([self._service("1234567890123456")], content_type='application/json')
+
+        assert response.status_code == 400
+        assert Service.query.count() == 0
+
+    def test_should_400_without_updated_by(self, index_service):
+        response = self.client.post(
+            '/services/import',
+            data=json.dumps(self._service("1234567890123456")),
+            content_type='application/x-ndjson',
+        )
+
+        assert response.status_code == 400
+        assert Service.query.count() == 0
+
+
 class TestGetService(BaseApplicationTest):
     def setup(self):
         super(TestGetService, self).setup()
@@ -1663,6 +1999,44 @@ class TestGetService(BaseApplicationTest):
         assert data['services']['supplierId'] == 1
         assert data['services']['supplierName'] == u'Supplier 1'
 
+    def test_get_published_service_returns_304_for_matching_etag(self):
+        response = self.client.get('/services/123-published-456')
+        etag = response.headers['ETag']
+
+        response = self.client.get('/services/123-published-456', headers={'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+        assert response.get_data() == b''
+
+    def test_get_published_service_ignores_if_modified_since(self):
+        # the response embeds the supplier, framework and lot, so the service's own updated_at can't say it's unchanged
+        response = self.client.get('/services/123-published-456')
+        assert 'Last-Modified' not in response.headers
+
+        response = self.client.get(
+            '/services/123-published-456', headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'}
+        )
+
+        assert response.status_code == 200
+
+    def test_get_published_service_etag_changes_with_supplier_name(self):
+        etag = self.client.get('/services/123-published-456').headers['ETag']
+        Supplier.query.filter(Supplier.supplier_id == 1).update({'name': "Renamed"})
+        db.session.commit()
+
+        response = self.client.get('/services/123-published-456', headers={'If-None-Match': etag})
+
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        assert json.loads(response.get_data())['services']['supplierName'] == "Renamed"
+
+    def test_get_unavailable_service_has_no_etag(self):
+        response = self.client.get('/services/123-disabled-456')
+
+        assert response.status_code == 200
+        assert 'ETag' not in response.headers
+
     def test_get_service_returns_framework_and_lot_info(self):
         response = self.client.get('/services/123-published-456')
         data = json.loads(response.get_data())
@@ -1936,3 +2310,75 @@ class TestRevertServiceHappyPath(TestRevertServiceBase):
                 wait_for_response=True
             )
         ]
+
+
+class TestGetServiceDiff(TestRevertServiceBase):
+
+    def get_diff(self, service_id, from_archived_service_id, to_archived_service_id):
+        return self.client.get('/services/{}/diff?from={}&to={}'.format(
+            service_id, from_archived_service_id, to_archived_service_id,
+        ))
+
+    def test_changed_value(self):
+        response = self.get_diff("1234123412340001", self.archived_service_ids[0], self.archived_service_ids[1])
+
+        assert response.status_code == 200
+        assert json.loads(response.get_data())["serviceDiff"] == {
+            "serviceId": "1234123412340001",
+            "fromArchivedServiceId": self.archived_service_ids[0],
+            "toArchivedServiceId": self.archived_service_ids[1],
+            "changes": [
+                {
+                    "op": "changed",
+                    "path": ["serviceSummary"],
+                    "from": "Definitely the best",
+                    "to": "Assuredly the best",
+                },
+            ],
+        }
+
+    def test_removed_value(self):
+        response = self.get_diff("1234123412340001", self.archived_service_ids[1], self.archived_service_ids[2])
+
+        assert response.status_code == 200
+        assert json.loads(response.get_data())["serviceDiff"]["changes"] == [
+            {"op": "removed", "path": ["serviceSummary"], "from": "Assuredly the best"},
+        ]
+
+    @mock.patch('app.main.views.services.index_service', autospec=True)
+    def test_diff_between_archives_stored_as_deltas(self, index_service):
+        for service_summary in ("Certainly the best", "Unquestionably the best"):
+            response = self.client.post(
+                '/services/1234123412340003',
+                content_type='application/json',
+                data=json.dumps({"updated_by": "papli@example.com", "services": {"serviceSummary": service_summary}}),
+            )
+            assert response.status_code == 200
+
+        archived_services = ArchivedService.query.filter(
+            ArchivedService.service_id == "1234123412340003"
+        ).order_by(ArchivedService.id).all()
+        assert archived_services[1].snapshot_id == archived_services[0].id
+
+        response = self.get_diff("1234123412340003", archived_services[0].id, archived_services[1].id)
+
+        assert response.status_code == 200
+        assert json.loads(response.get_data())["serviceDiff"]["changes"] == [
+            {
+                "op": "changed",
+                "path": ["serviceSummary"],
+                "from": "Certainly the best",
+                "to": "Unquestionably the best",
+            },
+        ]
+
+    def test_archived_service_of_another_service(self):
+        response = self.get_diff("1234123412340001", self.archived_service_ids[0], self.archived_service_ids[3])
+
+        assert response.status_code == 404
+
+    def test_missing_archived_service_id(self):
+        response = self.client.get('/services/1234123412340001/diff?to={}'.format(self.archived_service_ids[1]))
+
+        assert response.status_code == 400
+        assert "'from'" in json.loads(response.get_data())["error"]
@@ -1,4 +1,5 @@
 from datetime import datetime
+import gzip
 
 from flask import json
 from freezegun import freeze_time
@@ -6,7 +7,7 @@ import pytest
 
 from app import db
 from app.models import Supplier, ContactInformation, AuditEvent, \
-    SupplierFramework, Framework, FrameworkAgreement, DraftService, Service, Lot
+    SupplierFramework, Framework, FrameworkAgreement, DraftService, Service, Lot, BriefResponse, User
 from mock import mock
 from sqlalchemy.exc import DataError, IntegrityError
 from tests.bases import BaseApplicationTest, JSONTestMixin, JSONUpdateTestMixin
@@ -66,6 +67,35 @@ class TestGetSupplier(BaseApplicationTest, FixtureMixin):
             u'G-Cloud 6': 5
         }
 
+    def test_get_supplier_returns_304_for_matching_etag(self):
+        response = self.client.get('/suppliers/{}'.format(self.supplier_id))
+        etag = response.headers['ETag']
+
+        response = self.client.get('/suppliers/{}'.format(self.supplier_id), headers={'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+        assert response.get_data() == b''
+
+    @pytest.mark.parametrize('change', ('supplier', 'contact_information', 'service_counts'))
+    def test_get_supplier_etag_changes_with_supplier(self, change):
+        etag = self.client.get('/suppliers/{}'.format(self.supplier_id)).headers['ETag']
+
+        if change == 'supplier':
+            Supplier.query.filter(Supplier.supplier_id == self.supplier_id).update({'name': "New Name"})
+        elif change == 'contact_information':
+            ContactInformation.query.filter(
+                ContactInformation.supplier_id == self.supplier_id
+            ).update({'city': "Newtown"})
+        else:
+            self.setup_dummy_services(1, supplier_id=self.supplier_id, framework_id=1)
+        db.session.commit()
+
+        response = self.client.get('/suppliers/{}'.format(self.supplier_id), headers={'If-None-Match': etag})
+
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
 
 class TestListSuppliers(BaseApplicationTest, FixtureMixin):
     def setup(self):
@@ -191,6 +221,31 @@ class TestListSuppliers(BaseApplicationTest, FixtureMixin):
         assert response.status_code == 404
 
 
+class TestListSuppliersByIds(BaseApplicationTest, FixtureMixin):
+    def setup(self):
+        super(TestListSuppliersByIds, self).setup()
+        self.setup_dummy_suppliers(3)
+        for service_id, supplier_id in (('10000000001', 2), ('10000000002', 2), ('10000000003', 0)):
+            self.setup_dummy_service(service_id=service_id, supplier_id=supplier_id)
+
+    def test_lists_suppliers_in_the_order_of_the_ids(self):
+        response = self.client.get('/suppliers?ids=2,9,0,1')
+
+        assert response.status_code == 200
+        suppliers = json.loads(response.get_data())['suppliers']
+        assert [(supplier['id'], supplier['service_counts']) for supplier in suppliers] == [
+            (2, {'G-Cloud 6': 2}),
+            (0, {'G-Cloud 6': 1}),
+            (1, {}),
+        ]
+        assert suppliers[0]['contactInformation'][0]['email'] == '2@contact.com'
+
+    def test_invalid_ids(self):
+        response = self.client.get('/suppliers?ids=2,two')
+
+        assert response.status_code == 400
+
+
 class TestListSuppliersOnFramework(BaseApplicationTest, FixtureMixin):
 
     def setup(self):
@@ -745,6 +800,129 @@ class TestUpdateSupplier(BaseApplicationTest, JSONUpdateTestMixin, PutDeclaratio
         assert 'duplicate key value violates unique constraint' in response.get_data(as_text=True)
 
 
+class TestBulkUpdateSuppliers(BaseApplicationTest, PutDeclarationAndDetailsAndServicesMixin):
+    def setup(self):
+        super(TestBulkUpdateSuppliers, self).setup()
+
+        self.supplier_ids = []
+        for duns_number in ('333333333', '444444444'):
+            payload = load_example_listing("supplier_creation")
+            payload['dunsNumber'] = duns_number
+            response = self.client.post(
+                '/suppliers',
+                data=json.dumps({'suppliers': payload}),
+                content_type='application/json')
+            assert response.status_code == 201
+            self.supplier_ids.append(json.loads(response.get_data())['suppliers']['id'])
+        self.supplier_id = self.supplier_ids[0]
+
+    def bulk_update_request(self, updates, user='supplier@user.dmdev', content_type='application/x-ndjson'):
+        return self.client.post(
+            '/suppliers/bulk-update?updated_by={}'.format(user),
+            data="\n".join(update if isinstance(update, str) else json.dumps(update) for update in updates),
+            content_type=content_type,
+        )
+
+    def test_updates_suppliers_in_chunks(self):
+        # Test chunk size is 2
+        response = self.bulk_update_request([
+            {'id': self.supplier_ids[0], 'name': "First"},
+            {'id': self.supplier_ids[1], 'name': "Second"},
+            {'id': self.supplier_ids[0], 'description': "Again"},
+        ])
+
+        assert response.status_code == 200
+        data = json.loads(response.get_data())
+        assert data['meta'] == {'updated': 3, 'failed': 0}
+        assert data['results'] == [
+            {'line': 1, 'id': self.supplier_ids[0], 'updated': True},
+            {'line': 2, 'id': self.supplier_ids[1], 'updated': True},
+            {'line': 3, 'id': self.supplier_ids[0], 'updated': True},
+        ]
+
+        first, second = Supplier.query.filter(
+            Supplier.supplier_id.in_(self.supplier_ids)
+        ).order_by(Supplier.supplier_id).all()
+        assert (first.name, first.description) == ("First", "Again")
+        assert second.name == "Second"
+
+    def test_bulk_update_creates_audit_events(self):
+        self.bulk_update_request([{'id': self.supplier_id, 'name': "Name"}], user='Paula')
+
+        supplier = Supplier.query.filter(Supplier.supplier_id == self.supplier_id).one()
+        audit = AuditEvent.query.filter(AuditEvent.type == "supplier_update").one()
+
+        assert audit.object == supplier
+        assert audit.user == "Paula"
+        assert audit.data == {
+            'update': {'name': "Name"},
+            'supplierId': self.supplier_id,
+        }
+
+    def test_reports_failed_lines_and_applies_the_rest(self):
+        response = self.bulk_update_request([
+            "not json",
+            {'name': "No id"},
+            {'id': 999, 'name': "Missing"},
+            {'id': self.supplier_ids[0], 'registrationCountry': "Wales"},
+            {'id': self.supplier_ids[1], 'dunsNumber': "333333333"},
+            {'id': self.supplier_ids[1], 'name': "Still updated"},
+        ])
+
+        assert response.status_code == 200
+        data = json.loads(response.get_data())
+        assert data['meta'] == {'updated': 1, 'failed': 5}
+        assert [result.get('updated') for result in data['results']] == [None, None, None, None, None, True]
+        assert data['results'][0] == {'line': 1, 'error': "Invalid JSON"}
+        assert data['results'][2] == {'line': 3, 'id': 999, 'error': "Supplier not found"}
+        assert "Invalid registration country" in data['results'][3]['error']
+        assert 'duplicate key value violates unique constraint' in data['results'][4]['error']
+
+        first, second = Supplier.query.filter(
+            Supplier.supplier_id.in_(self.supplier_ids)
+        ).order_by(Supplier.supplier_id).all()
+        assert first.registration_country != "Wales"
+        assert (second.duns_number, second.name) == ("444444444", "Still updated")
+
+    def test_bulk_update_with_open_framework_application_updates_declaration(self):
+        framework = Framework(
+            id=100,
+            slug='g-cloud-10',
+            name='G-Cloud 10',
+            framework='g-cloud',
+            status='open',
+            has_direct_award=True,
+            has_further_competition=False)
+        db.session.add(framework)
+        db.session.commit()
+        self.updater_json = {'updated_by': 'Paula'}
+        self.framework_slug = 'g-cloud-10'
+        self._register_supplier_with_framework()
+        assert self._get_declaration() == {}
+
+        self.bulk_update_request([{'id': self.supplier_id, "organisationSize": "micro"}], user='Paula')
+
+        assert self._get_declaration() == {
+            'supplierCompanyRegistrationNumber': 'SC000111',
+            'supplierDunsNumber': '333333333',
+            'supplierOrganisationSize': 'micro',
+            'supplierRegisteredBuilding': '123 Fake Street',
+            'supplierRegisteredPostcode': 'F4 K1E',
+            'supplierRegisteredTown': 'London',
+            'supplierTradingName': 'Example Company Limited',
+        }
+        assert AuditEvent.query.filter(
+            AuditEvent.type == "answer_selection_questions",
+            AuditEvent.user == "Paula - (triggered from update_suppliers)",
+        ).count() == 1
+
+    def test_should_400_without_ndjson_content_type(self):
+        response = self.bulk_update_request([{'id': self.supplier_id, 'name': "Name"}], content_type='application/json')
+
+        assert response.status_code == 400
+        assert AuditEvent.query.filter(AuditEvent.type == "supplier_update").count() == 0
+
+
 class TestUpdateContactInformation(BaseApplicationTest, JSONUpdateTestMixin, PutDeclarationAndDetailsAndServicesMixin):
     method = "post"
     endpoint = "/suppliers/{self.supplier_id}/contact-information/{self.contact_id}"
@@ -1835,6 +2013,97 @@ class TestGetSupplierFrameworks(BaseApplicationTest):
         assert response.status_code == 404
 
 
+class TestGetSupplierDashboard(BaseApplicationTest, FixtureMixin):
+    def setup(self):
+        super(TestGetSupplierDashboard, self).setup()
+        self.setup_dummy_suppliers(2)
+        self.setup_dummy_briefs(2, status="closed")
+        db.session.add_all([
+            SupplierFramework(supplier_id=0, framework_id=1, declaration={"status": "complete"}),
+            SupplierFramework(supplier_id=0, framework_id=3, declaration={}),
+            SupplierFramework(supplier_id=1, framework_id=1, declaration={}),
+            BriefResponse(brief_id=1, supplier_id=0, submitted_at=datetime(2020, 1, 1), data={}),
+            BriefResponse(brief_id=2, supplier_id=0, data={}),
+            BriefResponse(brief_id=2, supplier_id=1, submitted_at=datetime(2020, 1, 1), data={}),
+            User(
+                id=456, email_address="supplier@example.com", name="Supplier User", password="password",
+                active=True, role="supplier", supplier_id=0, password_changed_at=datetime(2020, 1, 1),
+            ),
+        ])
+        db.session.commit()
+        self.setup_dummy_service("1000000000", supplier_id=0, framework_id=1)
+        self.setup_dummy_service("1000000001", supplier_id=0, framework_id=1, status='disabled')
+        self.setup_dummy_service("1000000002", supplier_id=0, framework_id=3)
+        self.setup_dummy_service("1000000003", supplier_id=1, framework_id=1)
+        db.session.add_all([
+            DraftService(
+                framework_id=1, lot_id=1, supplier_id=0, data={}, status=status, lot_one_service_limit=False,
+            )
+            for status in ('not-submitted', 'submitted')
+        ])
+        db.session.commit()
+
+    def get_json(self, url):
+        response = self.client.get(url)
+        assert response.status_code == 200
+        return json.loads(response.get_data())
+
+    def test_dashboard_matches_the_individual_endpoints(self):
+        dashboard = self.get_json('/suppliers/0/dashboard')
+
+        assert dashboard == {
+            'suppliers': self.get_json('/suppliers/0')['suppliers'],
+            'frameworkInterest': self.get_json('/suppliers/0/frameworks')['frameworkInterest'],
+            'briefResponses': self.get_json('/brief-responses?supplier_id=0')['briefResponses'],
+            'users': self.get_json('/users?supplier_id=0')['users'],
+        }
+
+    def test_dashboard_counts(self):
+        dashboard = self.get_json('/suppliers/0/dashboard')
+
+        assert dashboard['suppliers']['service_counts'] == {'G-Cloud 5': 1, 'G-Cloud 6': 1}
+        assert {
+            framework_interest['frameworkSlug']: (
+                framework_interest['drafts_count'],
+                framework_interest['complete_drafts_count'],
+                framework_interest['services_count'],
+            )
+            for framework_interest in dashboard['frameworkInterest']
+        } == {'g-cloud-6': (1, 1, 1), 'g-cloud-5': (0, 0, 1)}
+        assert [brief_response['briefId'] for brief_response in dashboard['briefResponses']] == [1]
+        assert [user['id'] for user in dashboard['users']] == [456]
+
+    def test_dashboard_does_not_count_drafts_copied_from_services_as_services(self):
+        db.session.add_all([
+            DraftService(
+                framework_id=1, lot_id=1, supplier_id=0, data={}, status='published', lot_one_service_limit=False,
+            )
+            for _ in range(2)
+        ])
+        db.session.commit()
+
+        dashboard = self.get_json('/suppliers/0/dashboard')
+
+        assert dashboard['suppliers']['service_counts'] == {'G-Cloud 5': 1, 'G-Cloud 6': 1}
+        assert dashboard['suppliers'] == self.get_json('/suppliers/0')['suppliers']
+        assert dashboard['frameworkInterest'] == self.get_json('/suppliers/0/frameworks')['frameworkInterest']
+
+    def test_dashboard_of_supplier_with_nothing_else(self):
+        db.session.add(Supplier(supplier_id=2, name=u"Supplier 2"))
+        db.session.commit()
+
+        assert self.get_json('/suppliers/2/dashboard') == {
+            'suppliers': self.get_json('/suppliers/2')['suppliers'],
+            'frameworkInterest': [],
+            'briefResponses': [],
+            'users': [],
+        }
+
+    def test_404_for_missing_supplier(self):
+        response = self.client.get('/suppliers/100/dashboard')
+        assert response.status_code == 404
+
+
 class TestRegisterFrameworkInterest(BaseApplicationTest, FixtureMixin, JSONUpdateTestMixin):
     method = "put"
     endpoint = "/suppliers/1/frameworks/digital-outcomes-and-specialists"
@@ -2873,6 +3142,56 @@ class TestSuppliersExport(BaseApplicationTest, FixtureMixin, PutDeclarationAndDe
         data = json.loads(self._return_suppliers_export_after_setting_framework_status().get_data())["suppliers"]
         assert data == []
 
+    def test_export_is_cached_on_disk_until_its_data_changes(self, tmpdir):
+        self.app.config['DM_API_EXPORT_CACHE_DIR'] = str(tmpdir)
+        self._setup_supplier_on_framework()
+        self._set_framework_status()
+        url = '/suppliers/export/{}'.format(self.framework_slug)
+
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip'})
+        assert response.status_code == 200
+        assert 'Content-Encoding' not in response.headers
+        data = json.loads(response.get_data())
+        assert len(tmpdir.listdir()) == 1
+
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip'})
+        assert response.status_code == 200
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(response.get_data())) == data
+
+        response = self.client.get(url)
+        assert response.status_code == 200
+        assert 'Content-Encoding' not in response.headers
+        assert json.loads(response.get_data()) == data
+
+        Supplier.query.filter(Supplier.supplier_id == self.supplier_id).update(
+            {Supplier.name: 'Renamed supplier'}, synchronize_session=False
+        )
+        db.session.commit()
+
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip'})
+        assert response.status_code == 200
+        assert 'Content-Encoding' not in response.headers
+        assert json.loads(response.get_data())['suppliers'][0]['supplier_name'] == 'Renamed supplier'
+        assert len(tmpdir.listdir()) == 1
+
+    def test_missing_application_row_is_recomputed_for_the_export(self):
+        self._setup_supplier_on_framework()
+        self._post_company_details_confirmed()
+        self._put_complete_declaration()
+        self._post_complete_draft_service()
+        db.session.execute("DELETE FROM supplier_framework_applications")
+        db.session.commit()
+
+        with mock.patch.object(self.app.logger, 'warning') as warning:
+            data = json.loads(self._return_suppliers_export_after_setting_framework_status().get_data())["suppliers"]
+
+        assert [row['supplier_id'] for row in data] == [self.supplier_id]
+        assert data[0]['application_status'] == 'application'
+        assert data[0]['declaration_status'] == 'complete'
+        assert warning.call_args[1]['extra']['supplier_id'] == self.supplier_id
+        assert db.session.execute("SELECT count(*) FROM supplier_framework_applications").scalar() == 1
+
     def test_400_response_if_bad_framework_name(self):
         self._setup_supplier_on_framework()
         response = self.client.get('/suppliers/export/{}'.format('cyber-outcomes-and-cyber-specialists'))
@@ -8,7 +8,7 @@ from flask import json
 from sqlalchemy.exc import DataError, IntegrityError
 
 from app import db, encryption
-from app.models import User, Supplier, BuyerEmailDomain, AuditEvent
+from app.models import User, Supplier, BuyerEmailDomain, AuditEvent, BriefResponse
 from tests.bases import BaseApplicationTest, JSONTestMixin, JSONUpdateTestMixin, WSGIApplicationWithEnvironment
 from tests.helpers import FixtureMixin, PutDeclarationAndDetailsAndServicesMixin
 
@@ -1533,6 +1533,69 @@ class TestUsersGet(BaseUserTest, FixtureMixin):
         assert "Invalid user role: incorrect" in data
 
 
+class TestUserBriefsSummary(BaseApplicationTest, FixtureMixin):
+    def setup(self):
+        super(TestUserBriefsSummary, self).setup()
+        self.setup_dummy_user(id=1, role='buyer')
+        self.setup_dummy_user(id=2, role='buyer')
+        self.setup_dummy_suppliers(3)
+        self.setup_dummy_brief(id=1, user_id=1, status='closed', data={'title': 'Closed brief'})
+        self.setup_dummy_brief(id=2, user_id=1, status='draft', data={'title': 'Draft brief'})
+        self.setup_dummy_brief(id=3, user_id=2, status='live', data={'title': 'Live brief'})
+        db.session.add_all([
+            BriefResponse(brief_id=1, supplier_id=0, submitted_at=datetime(2020, 1, 1), data={}),
+            BriefResponse(brief_id=1, supplier_id=1, submitted_at=datetime(2020, 1, 1), data={}),
+            BriefResponse(brief_id=1, supplier_id=2, data={}),
+            BriefResponse(brief_id=3, supplier_id=0, submitted_at=datetime(2020, 1, 1), data={}),
+        ])
+        db.session.commit()
+
+    def test_summary_of_buyers_briefs(self):
+        closed_brief = json.loads(self.client.get('/briefs/1').get_data())['briefs']
+
+        response = self.client.get('/users/1/briefs/summary')
+
+        assert response.status_code == 200
+        assert json.loads(response.get_data()) == {'briefs': [
+            {
+                'id': 1,
+                'title': 'Closed brief',
+                'status': 'closed',
+                'applicationsClosedAt': closed_brief['applicationsClosedAt'],
+                'submittedBriefResponsesCount': 2,
+            },
+            {
+                'id': 2,
+                'title': 'Draft brief',
+                'status': 'draft',
+                'applicationsClosedAt': None,
+                'submittedBriefResponsesCount': 0,
+            },
+        ]}
+
+    def test_summary_of_other_buyers_briefs(self):
+        response = self.client.get('/users/2/briefs/summary')
+
+        assert response.status_code == 200
+        assert [
+            (brief['id'], brief['status'], brief['submittedBriefResponsesCount'])
+            for brief in json.loads(response.get_data())['briefs']
+        ] == [(3, 'live', 1)]
+
+    def test_summary_of_user_without_briefs(self):
+        self.setup_dummy_user(id=3, role='buyer')
+
+        response = self.client.get('/users/3/briefs/summary')
+
+        assert response.status_code == 200
+        assert json.loads(response.get_data()) == {'briefs': []}
+
+    def test_404_for_missing_user(self):
+        response = self.client.get('/users/100/briefs/summary')
+
+        assert response.status_code == 404
+
+
 class TestUsersBooleanFilters(BaseUserTest):
 
     def setup(self):
@@ -1960,6 +2023,22 @@ class TestUsersExport(BaseUserTest, FixtureMixin, PutDeclarationAndDetailsAndSer
                 'published_service_count': 0
             })
 
+    def test_missing_application_row_is_recomputed_once_for_the_export(self):
+        self._setup()
+        self._post_company_details_confirmed()
+        self._put_complete_declaration()
+        self._post_complete_draft_service()
+        db.session.execute("DELETE FROM supplier_framework_applications")
+        db.session.commit()
+
+        with mock.patch.object(self.app.logger, 'warning') as warning:
+            data = json.loads(self._return_users_export_after_setting_framework_status().get_data())["users"]
+
+        assert len(data) == len(self.users)
+        assert {datum['application_status'] for datum in data} == {'application'}
+        assert warning.call_count == 1
+        assert db.session.execute("SELECT count(*) FROM supplier_framework_applications").scalar() == 1
+
     # Test users for supplier with completed declaration one draft and company details not confirmed
     def test_response_complete_declaration_one_draft_company_details_not_confirmed(self):
         self._setup()
@@ -14,7 +14,8 @@ from app.models import (
     BriefClarificationQuestion,
     ArchivedService, DraftService, Service,
     FrameworkLot,
-    ContactInformation
+    ContactInformation,
+    SupplierFrameworkApplication,
 )
 from tests.bases import BaseApplicationTest
 from tests.helpers import FixtureMixin
@@ -2429,6 +2430,98 @@ class TestFrameworkSupplierIdsMany(BaseApplicationTest, FixtureMixin):
         assert sorted(framework.get_supplier_ids_for_completed_service()) == [0, 2, 4]
 
 
+class TestSupplierFrameworkApplication(BaseApplicationTest, FixtureMixin):
+    def get_application(self):
+        db.session.expire_all()
+        return SupplierFrameworkApplication.query.filter(
+            SupplierFrameworkApplication.supplier_id == 0,
+            SupplierFrameworkApplication.framework_id == 1,
+        ).one_or_none()
+
+    def test_application_follows_declaration_drafts_and_services(self):
+        self.setup_dummy_suppliers(1)
+        supplier_framework = SupplierFramework(supplier_id=0, framework_id=1)
+        db.session.add(supplier_framework)
+        db.session.commit()
+
+        application = self.get_application()
+        assert application.declaration_status == 'unstarted'
+        assert application.has_completed_service is False
+        assert application.application_status == 'no_application'
+        assert application.published_service_counts == {}
+
+        supplier_framework.declaration = {'status': 'complete'}
+        supplier_framework.application_company_details_confirmed = True
+        db.session.add(supplier_framework)
+        lot = Lot.query.get(1)
+        db.session.add(DraftService(
+            service_id='1000000001', supplier_id=0, framework_id=1, lot=lot, status='submitted', data={},
+            lot_one_service_limit=lot.one_service_limit,
+        ))
+        db.session.commit()
+
+        application = self.get_application()
+        assert application.declaration_status == 'complete'
+        assert application.has_completed_service is True
+        assert application.application_status == 'application'
+
+        self.setup_dummy_service('1000000002', supplier_id=0, framework_id=1, lot_id=1)
+        self.setup_dummy_service('1000000003', supplier_id=0, framework_id=1, lot_id=1)
+        self.setup_dummy_service('1000000004', supplier_id=0, framework_id=1, lot_id=1, status='disabled')
+
+        application = self.get_application()
+        assert application.published_service_counts == {'1': 2}
+        assert application.get_published_service_count() == 2
+        assert application.get_published_service_count(1) == 2
+        assert application.get_published_service_count(2) == 0
+
+        DraftService.query.filter(DraftService.service_id == '1000000001').update(
+            {DraftService.status: 'not-submitted'}, synchronize_session=False
+        )
+        db.session.commit()
+
+        assert self.get_application().application_status == 'no_application'
+
+        Service.query.delete()
+        DraftService.query.delete()
+        db.session.delete(supplier_framework)
+        db.session.commit()
+
+        assert self.get_application() is None
+
+    def test_statements_writing_many_rows_refresh_application_once_finished(self):
+        self.setup_dummy_suppliers(1)
+        db.session.add(SupplierFramework(supplier_id=0, framework_id=1))
+        db.session.commit()
+        for i in range(3):
+            self.setup_dummy_service('100000000{}'.format(i), supplier_id=0, framework_id=1, lot_id=1)
+        assert self.get_application().published_service_counts == {'1': 3}
+
+        Service.query.filter(Service.supplier_id == 0).update(
+            {Service.status: 'disabled'}, synchronize_session=False
+        )
+        db.session.commit()
+
+        assert self.get_application().published_service_counts == {}
+        assert db.session.execute("SELECT count(*) FROM supplier_framework_application_refreshes").scalar() == 0
+
+    def test_updates_not_changing_what_application_is_derived_from_do_not_refresh_it(self):
+        self.setup_dummy_suppliers(1)
+        db.session.add(SupplierFramework(supplier_id=0, framework_id=1))
+        db.session.commit()
+        self.setup_dummy_service('1000000001', supplier_id=0, framework_id=1, lot_id=1)
+
+        # a refresh would write a new version of the row, with a new xmin
+        application_row_version_query = "SELECT xmin::text FROM supplier_framework_applications"
+        row_version = db.session.execute(application_row_version_query).scalar()
+        Service.query.filter(Service.supplier_id == 0).update(
+            {Service.status: 'published', Service.data: {'serviceName': 'renamed'}}, synchronize_session=False
+        )
+        db.session.commit()
+
+        assert db.session.execute(application_row_version_query).scalar() == row_version
+
+
 class TestFrameworkAgreements(BaseApplicationTest, FixtureMixin):
     def setup(self):
         super(TestFrameworkAgreements, self).setup()
@@ -2715,3 +2808,53 @@ class TestArchivedService(BaseApplicationTest, FixtureMixin):
         )
 
         assert model.serialize() == stub.response()
+
+    def archive_service(self, data):
+        last_archive = ArchivedService.query.filter(
+            ArchivedService.service_id == self.service_id
+        ).order_by(ArchivedService.id.desc()).first()
+
+        self.service.data = data
+        archived_service = ArchivedService.from_service(self.service, last_archive)
+        db.session.add(archived_service)
+        db.session.commit()
+        return archived_service.id
+
+    def test_archives_are_stored_as_deltas_against_a_snapshot(self):
+        data = {
+            "serviceName": "Cloud Pies",
+            "serviceSummary": " ".join(["Pies in the cloud"] * 20),
+            "price": "£1 per pie",
+        }
+        first_id = self.archive_service(data)
+        second_id = self.archive_service(dict(data, serviceName="Cloud Cakes"))
+        third_id = self.archive_service({"serviceName": "Cloud Cakes", "serviceSummary": data["serviceSummary"]})
+        db.session.expire_all()
+
+        first, second, third = (ArchivedService.query.get(archive_id) for archive_id in (first_id, second_id, third_id))
+        assert first.snapshot_id is None
+        assert first._data == data
+        assert second.snapshot_id == first_id
+        assert second._data is None
+        assert second.data_delta == {"set": {"serviceName": "Cloud Cakes"}, "unset": []}
+        # deltas are always against the snapshot, not the previous archive
+        assert third.snapshot_id == first_id
+        assert third.data_delta == {"set": {"serviceName": "Cloud Cakes"}, "unset": ["price"]}
+
+        assert second.data == dict(data, serviceName="Cloud Cakes")
+        assert third.data == {"serviceName": "Cloud Cakes", "serviceSummary": data["serviceSummary"]}
+        assert third.serialize()["serviceName"] == "Cloud Cakes"
+        assert "price" not in third.serialize()
+
+    def test_archive_is_a_new_snapshot_if_too_much_has_changed(self):
+        data = {"serviceName": "Cloud Pies", "serviceSummary": " ".join(["Pies in the cloud"] * 20)}
+        self.archive_service(data)
+        data = dict(data, serviceSummary=" ".join(["Cakes in the cloud"] * 20))
+        second_id = self.archive_service(data)
+        third_id = self.archive_service(dict(data, serviceName="Cloud Cakes"))
+        db.session.expire_all()
+
+        second, third = ArchivedService.query.get(second_id), ArchivedService.query.get(third_id)
+        assert second.snapshot_id is None
+        assert second.data == data
+        assert third.snapshot_id == second_id
@@ -0,0 +1,106 @@
+from datetime import datetime
+
+import pytest
+from dmapiclient.audit import AuditTypes
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+
+from app import db
+from app.audit_utils import archive_audit_event_partitions, get_audit_event_partitions, partition_audit_events
+from app.models import AuditEvent
+from app.utils import compare_sql_datetime_with_string
+from tests.bases import BaseApplicationTest
+
+
+class BaseAuditUtilsTest(BaseApplicationTest):
+    def add_audit_event(self, created_at, type=AuditTypes.supplier_update, acknowledged=False):
+        audit_event = AuditEvent(audit_type=type, user="rob", data={}, db_object=None)
+        audit_event.created_at = created_at
+        audit_event.acknowledged = acknowledged
+        db.session.add(audit_event)
+        db.session.commit()
+        return audit_event.id
+
+    def get_table_name(self, audit_event_id):
+        return db.session.execute(text(
+            "SELECT CAST(tableoid AS regclass) FROM audit_events WHERE id = :id"
+        ), {"id": audit_event_id}).scalar()
+
+
+class TestPartitionAuditEvents(BaseAuditUtilsTest):
+    def test_moves_events_of_months_that_have_ended_into_partitions(self):
+        ids = [
+            self.add_audit_event(datetime(2001, 1, 31, 23, 59)),
+            self.add_audit_event(datetime(2001, 2, 1)),
+            self.add_audit_event(datetime(2001, 3, 1)),
+        ]
+
+        assert partition_audit_events(datetime(2001, 3, 15)) == ["audit_events_y2001m01", "audit_events_y2001m02"]
+        db.session.commit()
+
+        assert {"audit_events_y2001m01", "audit_events_y2001m02"} <= set(get_audit_event_partitions())
+        assert [self.get_table_name(audit_event_id) for audit_event_id in ids] == [
+            "audit_events_y2001m01", "audit_events_y2001m02", "audit_events",
+        ]
+
+        # (the migrations' own audit events are left in the test database until the first test's teardown)
+        audit_events = AuditEvent.query.filter(AuditEvent.id.in_(ids))
+        assert [audit_event.id for audit_event in audit_events.order_by(AuditEvent.id)] == ids
+        assert [
+            audit_event.id for audit_event in audit_events.filter(
+                compare_sql_datetime_with_string(AuditEvent.created_at, "2001-02-01")
+            )
+        ] == [ids[1]]
+
+        AuditEvent.query.filter(AuditEvent.id == ids[0]).update({"acknowledged": True})
+        db.session.commit()
+        assert AuditEvent.query.get(ids[0]).acknowledged is True
+
+    def test_months_already_moved_stay_moved_when_a_later_month_fails(self):
+        ids = [
+            self.add_audit_event(datetime(2001, 5, 1)),
+            self.add_audit_event(datetime(2001, 6, 1)),
+        ]
+        # a table that isn't a partition, in the way of the partition for June
+        db.session.execute(text("CREATE TABLE audit_events_y2001m06 (id integer)"))
+        db.session.commit()
+
+        try:
+            with pytest.raises(ProgrammingError):
+                partition_audit_events(datetime(2001, 7, 1))
+            db.session.rollback()
+
+            assert [self.get_table_name(audit_event_id) for audit_event_id in ids] == [
+                "audit_events_y2001m05", "audit_events",
+            ]
+        finally:
+            db.session.rollback()
+            db.session.execute(text("DROP TABLE audit_events_y2001m06"))
+            db.session.commit()
+
+
+class TestArchiveAuditEventPartitions(BaseAuditUtilsTest):
+    def test_archives_partitions_with_no_unacknowledged_service_updates(self):
+        ids = [
+            self.add_audit_event(datetime(2002, 1, 1)),
+            self.add_audit_event(datetime(2002, 2, 1), type=AuditTypes.update_service),
+            self.add_audit_event(datetime(2002, 3, 1), type=AuditTypes.update_service, acknowledged=True),
+            self.add_audit_event(datetime(2002, 4, 1)),
+        ]
+        partition_audit_events(datetime(2002, 5, 1))
+        db.session.commit()
+
+        # (any partitions of earlier months left by other tests are archived too)
+        assert [
+            partition_name for partition_name in archive_audit_event_partitions(datetime(2002, 4, 1))
+            if partition_name.startswith("audit_events_y2002")
+        ] == ["audit_events_y2002m01", "audit_events_y2002m03"]
+        db.session.commit()
+
+        assert {"audit_events_y2002m01", "audit_events_y2002m03"} <= set(
+            get_audit_event_partitions("archived_audit_events")
+        )
+        assert [audit_event.id for audit_event in AuditEvent.query.order_by(AuditEvent.id)] == [ids[1], ids[3]]
+        assert [
+            audit_event.id for audit_event in AuditEvent.query.including_archived().order_by(AuditEvent.id)
+        ] == ids
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+from sqlalchemy import text
+
+from app import db
+from app.json_decoder import get_json_decoder, orjson_loads
+from tests.bases import BaseApplicationTest
+
+
+@pytest.mark.parametrize('document', (
+    'null',
+    '"string"',
+    '{"string": "a", "int": 1, "float": 1.5, "bool": true, "none": null, "list": [0.1, -2, false]}',
+    '{"escapes": "\\" \\\\ \\/ \\b \\f \\n \\r \\t \\u0001 \\u00e9 \\ud83d\\ude00", "unescaped": "£ – é 😀"}',
+    '{"duplicate": 1, "duplicate": 2}',
+    '[18446744073709551616, -9223372036854775809, 1e400]',
+    '{"lone surrogate": "\\ud800"}',
+    '  [ 1 ,\n 2 ]  ',
+))
+def test_orjson_loads_decodes_as_stdlib(document):
+    assert orjson_loads(document) == json.loads(document)
+
+
+def test_orjson_loads_raises_as_stdlib():
+    with pytest.raises(ValueError):
+        orjson_loads('{"not": json}')
+
+
+def test_get_json_decoder():
+    assert get_json_decoder('stdlib') is json.loads
+    assert get_json_decoder('orjson') is orjson_loads
+    with pytest.raises(ValueError):
+        get_json_decoder('not-a-decoder')
+
+
+class TestEngineJSONDecoder(BaseApplicationTest):
+    def test_engine_decodes_json_columns_with_configured_decoder(self):
+        assert db.engine.dialect._json_deserializer is get_json_decoder(self.app.config['DM_API_JSON_DECODER'])
+
+    def test_json_and_jsonb_values_are_decoded(self):
+        document = {"serviceName": "Service – é", "prices": [1.5, 2], "nested": {"empty": None}}
+
+        row = db.session.execute(text("SELECT CAST(:document AS json), CAST(:document AS jsonb)"), {
+            "document": json.dumps(document),
+        }).fetchone()
+
+        assert tuple(row) == (document, document)
@@ -0,0 +1,96 @@
+from datetime import date, datetime
+from decimal import Decimal
+import json
+import uuid
+
+from flask.json import JSONEncoder
+from markupsafe import Markup
+import pytest
+
+from app.json_encoder import get_json_encoder
+from tests.bases import BaseApplicationTest
+from tests.helpers import FixtureMixin
+
+OrjsonJSONEncoder = get_json_encoder('orjson', JSONEncoder)
+
+
+def encode(encoder, obj, **kwargs):
+    try:
+        return json.dumps(obj, cls=encoder, separators=(',', ':'), **kwargs)
+    except TypeError as e:
+        return TypeError, str(e)
+
+
+@pytest.mark.parametrize('obj', (
+    None,
+    "string",
+    {'string': "a", 'int': 1, 'float': 1.5, 'bool': True, 'none': None, 'list': [0.1, -2, False], 'tuple': (1, 2)},
+    {'b': {'d': 1, 'c': 2}, 'a': [{'f': 3, 'e': 4}]},
+    {"quotes": '"\\/', "control characters": "\x00\x01\x1f\b\f\n\r\t", "delete": "\x7f"},
+    {"non-ascii": "£ – é", "astral": "\U0001f600", "é": "key"},
+    {'datetime': datetime(2020, 1, 2, 3, 4, 5, 678901), 'date': date(2020, 1, 2)},
+    {'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'), 'markup': Markup("<b>bold</b>")},
+    {'decimal': Decimal('1.10')},
+    {'set': {1}},
+    {1: "int key", 10: "int key", 9: "int key"},
+    [2 ** 64, -2 ** 64],
+    [],
+    {},
+))
+@pytest.mark.parametrize('sort_keys', (True, False))
+@pytest.mark.parametrize('ensure_ascii', (True, False))
+def test_encodes_as_base_encoder(obj, sort_keys, ensure_ascii):
+    assert encode(OrjsonJSONEncoder, obj, sort_keys=sort_keys, ensure_ascii=ensure_ascii) == encode(
+        JSONEncoder, obj, sort_keys=sort_keys, ensure_ascii=ensure_ascii,
+    )
+
+
+def test_non_compact_encodings_are_made_by_base_encoder():
+    obj = {'b': [1, 2], 'a': "é"}
+
+    assert json.dumps(obj, cls=OrjsonJSONEncoder, indent=2) == json.dumps(obj, cls=JSONEncoder, indent=2)
+    assert json.dumps(obj, cls=OrjsonJSONEncoder) == json.dumps(obj, cls=JSONEncoder)
+
+
+def test_stdlib_encoder_is_base_encoder():
+    assert get_json_encoder('stdlib', JSONEncoder) is JSONEncoder
+
+
+def test_unknown_encoder():
+    with pytest.raises(ValueError):
+        get_json_encoder('not-an-encoder', JSONEncoder)
+
+
+class TestResponsesEncodedAsBefore(BaseApplicationTest, FixtureMixin):
+    def setup(self):
+        super(TestResponsesEncodedAsBefore, self).setup()
+        # compact encoding, as outside debug mode
+        self.app.debug = False
+        self.app.config['DM_API_RESPONSE_CACHE_BACKEND'] = None
+        # the encoder the app would use but for orjson
+        self.base_encoder = self.app.json_encoder.__bases__[-1]
+        self.setup_dummy_suppliers(3)
+        self.setup_dummy_services(10, supplier_id=1)
+        self.setup_dummy_user(id=1)
+        self.setup_dummy_briefs(2, status='live', title="Brief – £500")
+
+    def get_with_encoder(self, path, encoder):
+        self.app.json_encoder = get_json_encoder(encoder, self.base_encoder)
+        response = self.client.get(path)
+        assert response.status_code == 200
+        return response.get_data()
+
+    @pytest.mark.parametrize('path', (
+        '/services',
+        '/services/2000000001',
+        '/suppliers',
+        '/suppliers/1',
+        '/briefs',
+        '/briefs/1',
+        '/frameworks',
+        '/frameworks/g-cloud-6',
+        '/users/1',
+        '/audit-events',
+    ))
+    def test_response_is_unchanged(self, path):
+        assert self.get_with_encoder(path, 'orjson') == self.get_with_encoder(path, 'stdlib')
@@ -0,0 +1,127 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from app import db
+from app.models import Framework, Service, User
+from app.response_cache import FileSystemResponseCache, LRUResponseCache, get_table_generations
+from tests.bases import BaseApplicationTest
+from tests.helpers import FixtureMixin
+
+
+class TestLRUResponseCache:
+    def test_get_returns_none_for_missing_entry(self):
+        assert LRUResponseCache(2).get('missing') is None
+
+    def test_evicts_least_recently_used_entry(self):
+        cache = LRUResponseCache(2)
+        cache.set('a', {'body': 'a'})
+        cache.set('b', {'body': 'b'})
+        cache.get('a')
+        cache.set('c', {'body': 'c'})
+
+        assert cache.get('a') == {'body': 'a'}
+        assert cache.get('b') is None
+        assert cache.get('c') == {'body': 'c'}
+
+
+class TestFileSystemResponseCache:
+    def test_entries_are_shared_between_instances(self, tmpdir):
+        FileSystemResponseCache(str(tmpdir), 10).set('a', {'body': 'a', 'status': 200, 'headers': []})
+
+        assert FileSystemResponseCache(str(tmpdir), 10).get('a') == {'body': 'a', 'status': 200, 'headers': []}
+
+    def test_get_returns_none_for_missing_entry(self, tmpdir):
+        assert FileSystemResponseCache(str(tmpdir), 10).get('missing') is None
+
+    def test_oldest_entries_are_pruned(self, tmpdir):
+        cache = FileSystemResponseCache(str(tmpdir), 2)
+        for mtime, key in enumerate(('a', 'b')):
+            cache.set(key, {'body': key})
+            os.utime(os.path.join(str(tmpdir), key), (mtime, mtime))
+        cache.set('c', {'body': 'c'})
+
+        assert sorted(os.listdir(str(tmpdir))) == ['b', 'c']
+
+
+class TestGetTableGenerations(BaseApplicationTest, FixtureMixin):
+    def test_generation_changes_when_table_is_written_to(self):
+        before = get_table_generations(['frameworks', 'lots'])
+        Framework.query.filter(Framework.slug == 'g-cloud-7').update(
+            {'framework_agreement_details': {'frameworkAgreementVersion': 'v99'}}
+        )
+        db.session.commit()
+        after = get_table_generations(['frameworks', 'lots'])
+
+        assert after[0] > before[0]
+        assert after[1] == before[1]
+
+    def test_generation_only_changes_once_write_is_committed(self):
+        def generation_seen_by_another_transaction():
+            with db.engine.connect() as connection:
+                return connection.execute(
+                    "SELECT sum(bumps) FROM table_generations WHERE table_name = 'frameworks'"
+                ).scalar()
+
+        before = generation_seen_by_another_transaction()
+        Framework.query.filter(Framework.slug == 'g-cloud-7').update(
+            {'framework_agreement_details': {'frameworkAgreementVersion': 'v99'}}
+        )
+        assert generation_seen_by_another_transaction() == before
+
+        db.session.commit()
+        assert generation_seen_by_another_transaction() > before
+
+    def test_writes_fold_earlier_bumps(self):
+        for version in range(5):
+            Framework.query.filter(Framework.slug == 'g-cloud-7').update(
+                {'framework_agreement_details': {'frameworkAgreementVersion': 'v{}'.format(version)}}
+            )
+            db.session.commit()
+
+        assert db.session.execute(
+            "SELECT count(*) FROM table_generations WHERE table_name = 'frameworks'"
+        ).scalar() == 1
+
+    def test_users_generation_ignores_logins(self):
+        self.setup_dummy_user(id=1)
+        before = get_table_generations(['users'])
+
+        user = User.query.get(1)
+        user.logged_in_at = datetime.utcnow()
+        user.failed_login_count = 1
+        db.session.commit()
+        assert get_table_generations(['users']) == before
+
+        user.name = 'New name'
+        db.session.commit()
+        assert get_table_generations(['users']) > before
+
+    def test_users_generation_follows_login_columns_updated_with_others(self):
+        self.setup_dummy_user(id=1)
+        before = get_table_generations(['users'])
+
+        User.query.update(
+            {User.logged_in_at: datetime.utcnow(), User.user_research_opted_in: True}, synchronize_session=False
+        )
+        db.session.commit()
+
+        assert get_table_generations(['users']) > before
+
+    def test_service_statuses_generation_only_follows_status_changes(self):
+        self.setup_dummy_suppliers(2)
+        self.setup_dummy_service('1000000001')
+        before = get_table_generations(['service_statuses'])
+
+        Service.query.update({Service.data: {'serviceName': 'Renamed'}}, synchronize_session=False)
+        db.session.commit()
+        assert get_table_generations(['service_statuses']) == before
+
+        Service.query.update({Service.status: 'disabled'}, synchronize_session=False)
+        db.session.commit()
+        assert get_table_generations(['service_statuses']) > before
+
+    @pytest.mark.parametrize('table_names', (['not_a_table'], ['frameworks', 'not_a_table']))
+    def test_returns_none_for_untracked_tables(self, table_names):
+        assert get_table_generations(table_names) is None
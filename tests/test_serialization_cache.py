@@ -0,0 +1,97 @@
+import json
+
+from app import db
+from app.models import Service, Supplier
+from app.serialization_cache import LRUSerializationCache, get_serialization_cache
+from tests.bases import BaseApplicationTest
+from tests.helpers import FixtureMixin
+
+
+class TestLRUSerializationCache:
+    def test_get_returns_none_for_missing_entry(self):
+        cache = LRUSerializationCache(100)
+
+        assert cache.get('missing') is None
+        assert (cache.hits, cache.misses) == (0, 1)
+
+    def test_evicts_least_recently_used_entries_beyond_max_bytes(self):
+        entry_size = len(json.dumps({'id': 'a'}))
+        cache = LRUSerializationCache(entry_size * 2)
+        cache.set('a', {'id': 'a'})
+        cache.set('b', {'id': 'b'})
+        cache.get('a')
+        cache.set('c', {'id': 'c'})
+
+        assert cache.get('a') == {'id': 'a'}
+        assert cache.get('b') is None
+        assert cache.get('c') == {'id': 'c'}
+        assert cache.bytes == entry_size * 2
+        assert (cache.hits, cache.misses) == (3, 1)
+
+    def test_replacing_an_entry_replaces_its_size(self):
+        cache = LRUSerializationCache(100)
+        cache.set('a', {'id': 'a'})
+        cache.set('a', {'id': 'abc'})
+
+        assert cache.bytes == len(json.dumps({'id': 'abc'}))
+
+    def test_does_not_keep_entries_larger_than_max_bytes(self):
+        cache = LRUSerializationCache(5)
+        cache.set('a', {'id': 'a'})
+
+        assert cache.get('a') is None
+        assert cache.bytes == 0
+
+
+class TestCachedSerialization(BaseApplicationTest, FixtureMixin):
+    def setup(self):
+        super(TestCachedSerialization, self).setup()
+        self.app.config['DM_API_SERIALIZATION_CACHE_MAX_BYTES'] = 1024 * 1024
+        self.setup_dummy_suppliers(1)
+        self.setup_dummy_service("1234123412340001", supplier_id=0)
+
+    def get_service(self):
+        db.session.expire_all()
+        return Service.query.filter(Service.service_id == "1234123412340001").one()
+
+    def test_unchanged_service_serialization_is_cached(self):
+        first = self.get_service().serialize()
+        second = self.get_service().serialize()
+
+        assert first == second
+        assert (get_serialization_cache().hits, get_serialization_cache().misses) == (1, 1)
+
+    def test_callers_cannot_change_the_cached_serialization(self):
+        first = self.get_service().serialize()
+        first['links']['extra'] = 'link'
+        first['extra'] = 'value'
+
+        second = self.get_service().serialize()
+
+        assert 'extra' not in second
+        assert 'extra' not in second['links']
+
+    def test_updated_service_is_serialized_again(self):
+        self.get_service().serialize()
+
+        service = self.get_service()
+        service.update_from_json({'serviceName': 'Renamed service'})
+        assert service.serialize()['serviceName'] == 'Renamed service'
+        db.session.commit()
+
+        assert self.get_service().serialize()['serviceName'] == 'Renamed service'
+
+    def test_renamed_supplier_is_serialized_again(self):
+        self.get_service().serialize()
+
+        Supplier.query.filter(Supplier.supplier_id == 0).update({'name': 'Renamed supplier'})
+        db.session.commit()
+
+        assert self.get_service().serialize()['supplierName'] == 'Renamed supplier'
+
+    def test_cache_disabled(self):
+        self.app.config['DM_API_SERIALIZATION_CACHE_MAX_BYTES'] = 0
+
+        self.get_service().serialize()
+
+        assert get_serialization_cache() is None
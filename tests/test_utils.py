@@ -5,13 +5,17 @@ import pytest
 
 from dmapiclient import HTTPError
 from flask import current_app
+from sqlalchemy.exc import IntegrityError
 from werkzeug.exceptions import BadRequest, HTTPException
 
+from app import db
+from app.models import ContactInformation, Service, SupplierFramework
 from app.utils import (
     display_list,
     index_object,
     json_has_keys,
     json_has_matching_id,
+    json_diff,
     json_has_required_keys,
     keyfilter_json,
     link,
@@ -20,9 +24,12 @@ from app.utils import (
     purge_nulls_from_data,
     single_result_response,
     strip_whitespace_from_data,
+    streamed_list_result_response,
     compare_sql_datetime_with_string,
+    copy_rows,
 )
 from tests.bases import BaseApplicationTest
+from tests.helpers import FixtureMixin
 
 
 def test_link():
@@ -303,6 +310,106 @@ def test_json_has_keys():
         check(data, data_required_keys, data_optional_keys, result)
 
 
+class TestStreamedListResultResponse(BaseApplicationTest, FixtureMixin):
+    def setup(self):
+        super(TestStreamedListResultResponse, self).setup()
+        self.setup_dummy_suppliers(2)
+        self.setup_dummy_services(5, supplier_id=1)
+
+    def get_response_data(self, response):
+        with self.app.test_request_context("/"):
+            return json.loads(response().get_data(as_text=True))
+
+    @pytest.mark.parametrize("batch_size", (1, 2, 5, 10))
+    def test_streamed_response_is_the_same_as_the_list_result_response(self, batch_size):
+        services = Service.query.order_by(Service.service_id.desc())
+
+        streamed = self.get_response_data(lambda: streamed_list_result_response("services", services, batch_size))
+        self.app.config['DM_API_LIST_RESPONSE_BATCH_SIZE'] = None
+        unstreamed = self.get_response_data(lambda: list_result_response("services", services))
+
+        assert streamed == unstreamed
+        assert streamed["meta"] == {"total": 5}
+        assert [service["id"] for service in streamed["services"]] == [
+            "2000000004", "2000000003", "2000000002", "2000000001", "2000000000",
+        ]
+
+    def test_results_deleted_while_streaming_are_left_out_of_the_results_and_total(self):
+        services = Service.query.order_by(Service.service_id.desc())
+
+        with self.app.test_request_context("/"):
+            response = streamed_list_result_response("services", services, 2)
+            # after the primary keys of the results are fetched, before the whole of the first batch is loaded
+            Service.query.filter(Service.service_id.in_(["2000000004", "2000000003"])).delete(
+                synchronize_session=False
+            )
+            db.session.commit()
+            data = json.loads(response.get_data(as_text=True))
+
+        assert [service["id"] for service in data["services"]] == ["2000000002", "2000000001", "2000000000"]
+        assert data["meta"] == {"total": 3}
+
+    def test_list_result_response_streams_queries(self):
+        with self.app.test_request_context("/"):
+            response = list_result_response("services", Service.query)
+
+            assert response.is_streamed
+            assert len(json.loads(response.get_data(as_text=True))["services"]) == 5
+
+    def test_composite_primary_keys(self):
+        db.session.add_all([
+            SupplierFramework(supplier_id=supplier_id, framework_id=framework_id)
+            for supplier_id in (0, 1) for framework_id in (1, 3)
+        ])
+        db.session.commit()
+        supplier_frameworks = SupplierFramework.query.filter(SupplierFramework.framework_id == 1).order_by(
+            SupplierFramework.supplier_id.desc()
+        )
+
+        data = self.get_response_data(lambda: streamed_list_result_response(
+            "supplierFrameworks", supplier_frameworks, 1, {"with_users": False},
+        ))
+
+        assert [supplier_framework["supplierId"] for supplier_framework in data["supplierFrameworks"]] == [1, 0]
+        assert data["meta"] == {"total": 2}
+
+    def test_no_results(self):
+        services = Service.query.filter(Service.supplier_id == 0)
+
+        assert self.get_response_data(lambda: streamed_list_result_response("services", services, 2)) == {
+            "services": [],
+            "meta": {"total": 0},
+        }
+
+
+class TestCopyRows(BaseApplicationTest, FixtureMixin):
+    def setup(self):
+        super(TestCopyRows, self).setup()
+        self.setup_dummy_suppliers(1)
+
+    def test_copies_rows_into_the_table(self):
+        copy_rows(ContactInformation.__table__, ('id', 'supplier_id', 'contact_name', 'email'), [
+            (1001, 0, 'Jane, "JJ" Smith', 'jane@example.com'),
+            (1002, 0, 'No Phone', 'nophone@example.com'),
+        ])
+        db.session.commit()
+
+        contacts = ContactInformation.query.filter(ContactInformation.id > 1000).order_by(ContactInformation.id)
+        assert [(contact.contact_name, contact.phone_number) for contact in contacts] == [
+            ('Jane, "JJ" Smith', None),
+            ('No Phone', None),
+        ]
+
+    def test_errors_are_raised_as_sqlalchemy_errors(self):
+        contact_id = ContactInformation.query.first().id
+
+        with pytest.raises(IntegrityError):
+            copy_rows(ContactInformation.__table__, ('id', 'supplier_id', 'contact_name', 'email'), [
+                (contact_id, 0, 'Duplicate', 'duplicate@example.com'),
+            ])
+        db.session.rollback()
+
+
 class TestSqlCompareDateString:
 
     class Timestamp(datetime.datetime):
@@ -361,3 +468,24 @@ class TestSqlCompareDateString:
     def test_it_should_raise_value_error_if_date_string_is_not_valid(self, invalid_date_string):
         with pytest.raises(ValueError):
             compare_sql_datetime_with_string(mock.MagicMock(), invalid_date_string)
+
+
+class TestJSONDiff:
+    def test_equal_values_have_no_changes(self):
+        assert json_diff({"a": [1, {"b": 2}]}, {"a": [1, {"b": 2}]}) == []
+
+    def test_changes_are_found_within_nested_objects_and_lists(self):
+        assert json_diff(
+            {"a": 1, "b": {"c": [1, 2], "d": "x"}, "e": [1]},
+            {"b": {"c": [1, 3], "d": "x"}, "e": [1, 2], "f": None},
+        ) == [
+            {"op": "removed", "path": ["a"], "from": 1},
+            {"op": "changed", "path": ["b", "c", 1], "from": 2, "to": 3},
+            {"op": "changed", "path": ["e"], "from": [1], "to": [1, 2]},
+            {"op": "added", "path": ["f"], "to": None},
+        ]
+
+    def test_keys_limit_the_keys_compared(self):
+        assert json_diff({"a": 1, "b": 2}, {"a": 2, "b": 3}, keys={"b", "c"}) == [
+            {"op": "changed", "path": ["b"], "from": 2, "to": 3},
+        ]